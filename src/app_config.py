@@ -0,0 +1,204 @@
+import os
+import logging
+import threading
+from dataclasses import dataclass, field
+import yaml
+
+logger = logging.getLogger('AppConfig')
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CONFIG_PATH = os.path.join(PROJECT_ROOT, 'config', 'config.yaml')
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """Geprüfte Konfiguration aus config/config.yaml. Pfade sind absolut."""
+    pump_pins: tuple
+    database_path: str
+    image_folder: str = os.path.join(PROJECT_ROOT, 'images')
+    thumbnail_folder: str = os.path.join(PROJECT_ROOT, 'cache', 'thumbnails')
+    log_file: str = os.path.join(PROJECT_ROOT, 'logs', 'app.log')
+    log_level: str = 'INFO'
+    log_levels: dict = field(default_factory=dict) # Logger-Name -> Level
+    log_rotation: str = 'size' # 'size' oder 'time'
+    log_max_bytes: int = 1048576
+    log_backup_count: int = 3
+    log_rotate_when: str = 'midnight'
+    log_queue_size: int = 10000
+    database_storage: dict = field(default_factory=dict)
+    pour_log_write_behind: bool = False
+    pour_log_flush_interval_s: float = 30.0
+    pour_log_batch_size: int = 20
+    pour_log_buffer_size: int = 500
+    pour_log_retention_days: int = 0 # 0 = nicht archivieren
+    pour_log_archive_folder: str = os.path.join(PROJECT_ROOT, 'data', 'archive')
+    pour_log_archive_chunk_rows: int = 5000
+    gpio_backend: str = 'rpi'
+    simulation_speed: float = 100.0
+    thumbnail_size: int = 128
+    texture_cache_entries: int = 64
+    default_cleaning_duration_per_pump: float = 15.0
+    glass_sizes: dict = field(default_factory=lambda: {'Medium': 200.0}) # Reihenfolge wie in der Datei
+    technician_pin: str = '1234'
+
+    @property
+    def default_glass_size(self):
+        """Erste Glasgröße aus der Konfiguration (Standard)."""
+        return next(iter(self.glass_sizes))
+
+    def glass_volume(self, size_name, default=200.0):
+        """Volumen in ml für einen Glasgrößen-Namen."""
+        return self.glass_sizes.get(size_name, default)
+
+
+def _project_path(value):
+    return value if os.path.isabs(value) else os.path.join(PROJECT_ROOT, value)
+
+def _require(raw, key, types):
+    if key not in raw:
+        raise ValueError(f"Pflichteintrag '{key}' fehlt.")
+    if not isinstance(raw[key], types):
+        raise ValueError(f"'{key}' hat den falschen Typ ({type(raw[key]).__name__}).")
+    return raw[key]
+
+def _positive_number(raw, key, default):
+    value = raw.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(f"'{key}' muss eine positive Zahl sein, ist aber {value!r}.")
+    return value
+
+def _log_level(value, key):
+    name = str(value).upper()
+    if not isinstance(logging.getLevelName(name), int):
+        raise ValueError(f"'{key}' ist kein gültiges Log-Level: {value!r}")
+    return name
+
+def parse_config(raw):
+    """Prüft das geladene YAML-Dictionary und erzeugt daraus eine AppConfig.
+
+    Wirft ValueError mit einer verständlichen Meldung bei ungültigen Einträgen.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Die Konfigurationsdatei enthält kein Dictionary.")
+    pump_pins = _require(raw, 'pump_pins', list)
+    if not pump_pins or not all(isinstance(pin, int) and not isinstance(pin, bool) for pin in pump_pins):
+        raise ValueError(f"'pump_pins' muss eine nicht-leere Liste von GPIO-Nummern sein: {pump_pins!r}")
+    if len(set(pump_pins)) != len(pump_pins):
+        raise ValueError(f"'pump_pins' enthält doppelte Pins: {pump_pins!r}")
+    database_path = _require(raw, 'database_path', str)
+
+    glass_sizes = raw.get('glass_sizes') or {'Medium': 200}
+    if not isinstance(glass_sizes, dict):
+        raise ValueError("'glass_sizes' muss ein Dictionary Name -> ml sein.")
+    parsed_glass_sizes = {}
+    for name, volume in glass_sizes.items():
+        if isinstance(volume, bool) or not isinstance(volume, (int, float)) or volume <= 0:
+            raise ValueError(f"Ungültiges Volumen für Glasgröße '{name}': {volume!r}")
+        parsed_glass_sizes[str(name)] = float(volume)
+
+    database_storage = raw.get('database_storage') or {}
+    if not isinstance(database_storage, dict):
+        raise ValueError("'database_storage' muss ein Dictionary sein.")
+
+    pour_log = raw.get('pour_log') or {}
+    if not isinstance(pour_log, dict):
+        raise ValueError("'pour_log' muss ein Dictionary sein.")
+    write_behind = pour_log.get('write_behind', False)
+    if not isinstance(write_behind, bool):
+        raise ValueError(f"'pour_log.write_behind' muss true oder false sein, ist aber {write_behind!r}.")
+    batch_size = int(_positive_number(pour_log, 'batch_size', 20))
+    buffer_size = int(_positive_number(pour_log, 'buffer_size', 500))
+    if buffer_size < batch_size:
+        raise ValueError(f"'pour_log.buffer_size' ({buffer_size}) muss mindestens 'batch_size' ({batch_size}) sein.")
+    retention_days = pour_log.get('retention_days') or 0
+    if isinstance(retention_days, bool) or not isinstance(retention_days, int) or retention_days < 0:
+        raise ValueError(f"'pour_log.retention_days' muss eine ganze Zahl >= 0 sein, ist aber {retention_days!r}.")
+
+    log_settings = raw.get('logging') or {}
+    if not isinstance(log_settings, dict):
+        raise ValueError("'logging' muss ein Dictionary sein.")
+    log_levels = log_settings.get('levels') or {}
+    if not isinstance(log_levels, dict):
+        raise ValueError("'logging.levels' muss ein Dictionary Logger -> Level sein.")
+    log_rotation = str(log_settings.get('rotation', 'size')).lower()
+    if log_rotation not in ('size', 'time'):
+        raise ValueError(f"'logging.rotation' muss 'size' oder 'time' sein, ist aber {log_rotation!r}.")
+
+    gpio_name = str(raw.get('gpio_backend', 'rpi')).lower()
+    if gpio_name not in ('rpi', 'simulated', 'auto'):
+        raise ValueError(f"'gpio_backend' muss 'rpi', 'simulated' oder 'auto' sein, ist aber {gpio_name!r}.")
+
+    return AppConfig(
+        pump_pins=tuple(pump_pins),
+        database_path=_project_path(database_path),
+        image_folder=_project_path(raw.get('image_folder') or 'images/'),
+        thumbnail_folder=_project_path(raw.get('thumbnail_folder') or 'cache/thumbnails/'),
+        log_file=_project_path(raw.get('log_file') or 'logs/app.log'),
+        log_level=_log_level(log_settings.get('level', 'INFO'), 'logging.level'),
+        log_levels={str(name): _log_level(level, f"logging.levels.{name}") for name, level in log_levels.items()},
+        log_rotation=log_rotation,
+        log_max_bytes=int(_positive_number(log_settings, 'max_bytes', 1048576)),
+        log_backup_count=int(_positive_number(log_settings, 'backup_count', 3)),
+        log_rotate_when=str(log_settings.get('when', 'midnight')),
+        log_queue_size=int(_positive_number(log_settings, 'queue_size', 10000)),
+        database_storage=dict(database_storage),
+        pour_log_write_behind=write_behind,
+        pour_log_flush_interval_s=float(_positive_number(pour_log, 'flush_interval_s', 30)),
+        pour_log_batch_size=batch_size,
+        pour_log_buffer_size=buffer_size,
+        pour_log_retention_days=retention_days,
+        pour_log_archive_folder=_project_path(pour_log.get('archive_folder') or 'data/archive/'),
+        pour_log_archive_chunk_rows=int(_positive_number(pour_log, 'archive_chunk_rows', 5000)),
+        gpio_backend=gpio_name,
+        simulation_speed=float(_positive_number(raw, 'simulation_speed', 100)),
+        thumbnail_size=int(_positive_number(raw, 'thumbnail_size', 128)),
+        texture_cache_entries=int(_positive_number(raw, 'texture_cache_entries', 64)),
+        default_cleaning_duration_per_pump=float(_positive_number(raw, 'default_cleaning_duration_per_pump', 15)),
+        glass_sizes=parsed_glass_sizes,
+        technician_pin=str(raw.get('technician_pin', '1234')),
+    )
+
+
+# --- Geteilte, gecachte Instanz ---
+_lock = threading.Lock()
+_config = None
+_config_mtime = None
+
+def get_config():
+    """Die aktuelle Konfiguration (AppConfig) oder None, wenn sie nie gültig geladen werden konnte.
+
+    Die Datei wird nur neu gelesen, wenn sich ihre Änderungszeit geändert hat. Ist eine
+    geänderte Datei ungültig, bleibt die letzte gültige Konfiguration aktiv.
+    """
+    global _config, _config_mtime
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError as e:
+        if _config is None:
+            logger.error(f"Konfigurationsdatei nicht gefunden: {CONFIG_PATH} ({e})")
+        return _config
+    if mtime == _config_mtime:
+        return _config
+    with _lock:
+        if mtime == _config_mtime:
+            return _config
+        try:
+            with open(CONFIG_PATH, 'r') as f:
+                config = parse_config(yaml.safe_load(f))
+        except (ValueError, yaml.YAMLError) as e:
+            logger.error(f"Ungültige Konfiguration in {CONFIG_PATH}: {e}"
+                         f"{' - verwende weiter die letzte gültige Konfiguration.' if _config else ''}")
+            _config_mtime = mtime # nicht bei jedem Aufruf erneut parsen
+            return _config
+        except Exception as e:
+            logger.error(f"Fehler beim Laden der Konfiguration {CONFIG_PATH}: {e}")
+            return _config
+        if _config is not None:
+            logger.info("Konfiguration neu geladen (Datei wurde geändert).")
+            if config.pump_pins != _config.pump_pins or config.database_path != _config.database_path:
+                logger.warning("Geänderte Pumpen-Pins oder Datenbankpfad werden erst nach einem Neustart wirksam.")
+        else:
+            logger.info(f"Konfiguration geladen: {CONFIG_PATH}")
+        _config = config
+        _config_mtime = mtime
+        return _config
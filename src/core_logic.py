@@ -1,59 +1,29 @@
 import logging
 import yaml
 import os
+import datetime
+import threading
+from dataclasses import dataclass
+import app_config
 import database_manager as db # Stelle sicher, dass db importiert ist
 
-# --- Logging Setup ---
-log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# NumPy ist optional: ohne NumPy rechnet der Verfügbarkeitsindex mit Python-Ganzzahlen.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 logger = logging.getLogger('CoreLogic')
-logger.setLevel(logging.DEBUG)
-if not logger.handlers:
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(log_formatter)
-    logger.addHandler(stream_handler)
-# ---------------------
 
 # --- get_available_recipes ---
-# (Unverändert von oben)
 def get_available_recipes():
-    available_recipes = []
-    all_recipes = db.get_all_recipes()
-    all_pumps_info = db.get_all_pumps_info()
-    assigned_ingredient_ids = set()
-    for pump_info in all_pumps_info:
-        if pump_info[1] is not None:
-            assigned_ingredient_ids.add(pump_info[1])
-    logger.debug(f"Zugewiesene Zutaten-IDs: {assigned_ingredient_ids}")
-    if not assigned_ingredient_ids:
-        # logger.warning("Keine Zutaten den Pumpen zugewiesen...") # Weniger Warnungen
-        return []
-    for recipe in all_recipes:
-        recipe_id = recipe[0]
-        recipe_name = recipe[1]
-        required_ingredients_info = db.get_ingredients_for_recipe(recipe_id)
-        if not required_ingredients_info:
-            # logger.warning(f"Rezept '{recipe_name}' hat keine Zutaten...")
-            continue
-        required_ingredient_ids = set()
-        all_ingredients_found_in_db = True
-        for req_ing_info in required_ingredients_info:
-            ing_name = req_ing_info[0]
-            ingredient = db.get_ingredient_by_name(ing_name)
-            if ingredient:
-                required_ingredient_ids.add(ingredient[0])
-            else:
-                logger.error(f"Zutat '{ing_name}' für Rezept '{recipe_name}' nicht in Zutatenliste gefunden!")
-                all_ingredients_found_in_db = False
-                break
-        if not all_ingredients_found_in_db:
-            continue
-        logger.debug(f"Rezept '{recipe_name}': Benötigt IDs: {required_ingredient_ids}")
-        if required_ingredient_ids.issubset(assigned_ingredient_ids):
-            logger.debug(f"Rezept '{recipe_name}' ist verfügbar (basierend auf Zuweisung).")
-            available_recipes.append(recipe)
-        else:
-            missing_ids = required_ingredient_ids.difference(assigned_ingredient_ids)
-            logger.debug(f"Rezept '{recipe_name}' ist NICHT verfügbar. Fehlende Zutat-IDs: {missing_ids}")
+    """Rezepte, die mit der aktuellen Pumpenbelegung gemixt werden können.
+
+    Die Prüfung läuft komplett in SQLite (GROUP BY/HAVING über recipe_ingredients und pumps),
+    statt pro Rezept und Zutat einzeln nachzufragen.
+    Rückgabe: Liste von Tupeln (recipe_id, name, description, image_path, instructions).
+    """
+    available_recipes = db.get_makeable_recipes()
     logger.info(f"Insgesamt {len(available_recipes)} Rezepte potenziell verfügbar.")
     return available_recipes
 
@@ -62,20 +32,20 @@ def get_available_recipes():
 # (Unverändert von oben)
 def scale_recipe(recipe_id, target_total_volume_ml):
     logger.debug(f"Skaliere Rezept ID {recipe_id} auf {target_total_volume_ml}ml Gesamtvolumen.")
-    base_ingredients = db.get_ingredients_for_recipe(recipe_id)
+    base_ingredients = db.get_ingredient_ids_for_recipe(recipe_id)
     if not base_ingredients:
         logger.warning(f"Keine Basiszutaten für Rezept ID {recipe_id} gefunden...")
         return []
+    ingredient_table = db.get_ingredient_table()
     standard_total_volume_ml = 0
     ingredients_to_scale = []
-    for ing_name, amount, unit in base_ingredients:
+    for ing_id, amount, unit in base_ingredients:
+        ing_name = ingredient_table.name_for(ing_id)
         try: amount_f = float(amount)
         except (ValueError, TypeError): continue
         if unit.lower() == 'ml':
             standard_total_volume_ml += amount_f
-            ingredient = db.get_ingredient_by_name(ing_name)
-            if ingredient: ingredients_to_scale.append({'id': ingredient[0], 'name': ing_name, 'base_amount': amount_f, 'unit': unit})
-            else: logger.error(f"Konnte ID für Zutat '{ing_name}' beim Skalieren nicht finden.")
+            ingredients_to_scale.append({'id': ing_id, 'name': ing_name, 'base_amount': amount_f, 'unit': unit})
         else: logger.warning(f"Zutat '{ing_name}' mit Einheit '{unit}' kann nicht skaliert werden...")
     if standard_total_volume_ml <= 0:
         logger.warning(f"Standardrezept ID {recipe_id} hat kein Volumen...")
@@ -92,6 +62,452 @@ def scale_recipe(recipe_id, target_total_volume_ml):
     return scaled_ingredients
 
 
+# --- Ausgabepläne (Plan-Cache) ---
+# Ein Plan enthält alles, was zwischen Tastendruck und Pumpenstart berechnet werden muss:
+# skalierte Mengen, zugeordnete Pumpen und Laufzeiten. Er hängt nur von Rezept, Zielvolumen,
+# Belegung und Kalibrierung ab (nicht von den Restmengen) und wird daher je (recipe_id, Volumen)
+# zwischengespeichert, bis sich einer dieser Katalogbereiche ändert.
+PLAN_CATALOG_SECTIONS = ('ingredients', 'recipes', 'recipe_ingredients', 'pumps', 'calibration')
+PLAN_PREWARM_RECIPES = 10 # beliebteste Rezepte, deren Pläne beim Start vorberechnet werden
+PLAN_PREWARM_DAYS = 30    # Zeitraum der Beliebtheits-Statistik
+
+@dataclass(frozen=True)
+class PourPlan:
+    """Aufgelöster Ausgabeplan eines Rezepts für ein Zielvolumen."""
+    recipe_id: int
+    target_volume_ml: float
+    steps: tuple    # ((ingredient_id, ingredient_name, pump_index, ml, sekunden), ...)
+    missing: tuple  # ((ingredient_name, grund), ...) - Zutaten ohne Pumpe oder Kalibrierung
+    version: int    # Katalog-Version, auf der der Plan beruht
+
+    @property
+    def ok(self):
+        return bool(self.steps) and not self.missing
+
+    @property
+    def pump_ml(self):
+        """{pump_index: ml} - Eingabe für pc.start_parallel()."""
+        plan = {}
+        for _, _, pump_index, ml, _ in self.steps:
+            plan[pump_index] = plan.get(pump_index, 0.0) + ml
+        return plan
+
+    @property
+    def durations(self):
+        """{pump_index: sekunden}, bereits aus der Kalibrierung berechnet."""
+        durations = {}
+        for _, _, pump_index, _, seconds in self.steps:
+            durations[pump_index] = durations.get(pump_index, 0.0) + seconds
+        return durations
+
+    @property
+    def scaled_ingredients(self):
+        """Gleiche Form wie scale_recipe(): [(ing_id, ing_name, ml, 'ml'), ...]."""
+        return [(ing_id, ing_name, ml, 'ml') for ing_id, ing_name, _, ml, _ in self.steps]
+
+_plan_cache = {}   # (recipe_id, target_volume_ml) -> PourPlan
+_plan_cache_version = None
+_plan_cache_lock = threading.Lock()
+
+def _build_pour_plan(recipe_id, target_volume_ml, version):
+    scaled_ingredients = scale_recipe(recipe_id, target_volume_ml)
+    if not scaled_ingredients:
+        return None
+    pumps = {}
+    for p_idx, ing_id, _, _, calibration in db.get_all_pumps_info():
+        if ing_id is not None:
+            pumps[ing_id] = (p_idx, calibration)
+    steps, missing = [], []
+    for ing_id, ing_name, ml, _ in scaled_ingredients:
+        pump_index, calibration = pumps.get(ing_id, (None, None))
+        if pump_index is None:
+            missing.append((ing_name, "Keine Pumpe zugewiesen"))
+        elif not calibration or calibration <= 0:
+            missing.append((ing_name, f"Pumpe {pump_index} nicht kalibriert"))
+        elif ml > 0:
+            steps.append((ing_id, ing_name, pump_index, ml, ml / calibration))
+    return PourPlan(recipe_id, target_volume_ml, tuple(steps), tuple(missing), version)
+
+def get_pour_plan(recipe_id, target_volume_ml):
+    """Ausgabeplan aus dem Plan-Cache (bzw. neu berechnet). None, wenn das Rezept nicht skalierbar ist."""
+    global _plan_cache_version
+    key = (recipe_id, float(target_volume_ml))
+    version = db.get_catalog_version(*PLAN_CATALOG_SECTIONS)
+    with _plan_cache_lock:
+        if _plan_cache_version != version:
+            _plan_cache.clear()
+            _plan_cache_version = version
+        plan = _plan_cache.get(key)
+    if plan is not None:
+        logger.debug(f"Ausgabeplan für Rezept ID {recipe_id} / {target_volume_ml}ml aus dem Cache.")
+        return plan
+    plan = _build_pour_plan(recipe_id, key[1], version)
+    if plan is not None:
+        with _plan_cache_lock:
+            # Nur speichern, wenn sich der Katalog während der Berechnung nicht geändert hat
+            if _plan_cache_version == version == db.get_catalog_version(*PLAN_CATALOG_SECTIONS):
+                _plan_cache[key] = plan
+    return plan
+
+def export_pour_plans():
+    """Gültige Pläne des Plan-Caches als JSON-taugliche Liste (für den Menü-Snapshot)."""
+    version = db.get_catalog_version(*PLAN_CATALOG_SECTIONS)
+    with _plan_cache_lock:
+        if _plan_cache_version != version:
+            return []
+        plans = list(_plan_cache.values())
+    return [{'recipe_id': plan.recipe_id, 'target_volume_ml': plan.target_volume_ml,
+             'steps': [list(step) for step in plan.steps], 'missing': [list(item) for item in plan.missing]}
+            for plan in plans]
+
+def import_pour_plans(plans):
+    """Übernimmt exportierte Pläne in den Plan-Cache (nur aufrufen, wenn sie zum Katalog passen).
+
+    Rückgabe: Anzahl übernommener Pläne.
+    """
+    global _plan_cache_version
+    version = db.get_catalog_version(*PLAN_CATALOG_SECTIONS)
+    count = 0
+    with _plan_cache_lock:
+        if _plan_cache_version != version:
+            _plan_cache.clear()
+            _plan_cache_version = version
+        for item in plans:
+            try:
+                plan = PourPlan(item['recipe_id'], float(item['target_volume_ml']),
+                                tuple(tuple(step) for step in item['steps']),
+                                tuple(tuple(entry) for entry in item['missing']), version)
+            except (KeyError, TypeError, ValueError):
+                continue
+            _plan_cache.setdefault((plan.recipe_id, plan.target_volume_ml), plan)
+            count += 1
+    return count
+
+def prewarm_pour_plans(limit=PLAN_PREWARM_RECIPES):
+    """Berechnet die Pläne der beliebtesten Rezepte für alle Glasgrößen vor (z.B. beim Start).
+
+    Beliebtheit aus der Statistik der letzten PLAN_PREWARM_DAYS Tage, aufgefüllt mit
+    mixbaren Rezepten. Rückgabe: Anzahl vorberechneter Pläne.
+    """
+    config = app_config.get_config()
+    if config is None or limit <= 0:
+        return 0
+    since = datetime.date.today() - datetime.timedelta(days=PLAN_PREWARM_DAYS)
+    recipe_ids = [row[0] for row in db.get_recipe_totals(since=since) if row[0] is not None][:limit]
+    for row in db.get_makeable_recipes():
+        if len(recipe_ids) >= limit:
+            break
+        if row[0] not in recipe_ids:
+            recipe_ids.append(row[0])
+    count = 0
+    for recipe_id in recipe_ids:
+        for volume_ml in set(config.glass_sizes.values()):
+            if get_pour_plan(recipe_id, volume_ml) is not None:
+                count += 1
+    logger.info(f"{count} Ausgabepläne für {len(recipe_ids)} Rezepte vorberechnet.")
+    return count
+
+def prewarm_in_background(limit=PLAN_PREWARM_RECIPES):
+    """Startet prewarm_pour_plans() in einem Hintergrund-Thread."""
+    thread = threading.Thread(target=prewarm_pour_plans, args=(limit,), name='PlanPrewarm', daemon=True)
+    thread.start()
+    return thread
+
+def check_plan_availability(plan):
+    """Wie check_ingredient_availability(), aber für einen fertigen Plan (nur noch die Restmengen).
+
+    Returns:
+        tuple: (bool, dict) mit 'message' und bei Fehlern 'missing' [(name, required, available, unit, ort)].
+    """
+    if plan.missing:
+        missing = [(name, 0.0, 0.0, 'ml', reason) for name, reason in plan.missing]
+        message = "Nicht mixbar: " + "; ".join(f"{name} ({reason})" for name, reason in plan.missing)
+        logger.warning(message)
+        return False, {'missing': missing, 'message': message}
+    volumes = {p_idx: vol if vol is not None else 0.0 for p_idx, _, _, vol, _ in db.get_all_pumps_info()}
+    missing_or_low = []
+    for pump_index, required in plan.pump_ml.items():
+        available = volumes.get(pump_index, 0.0)
+        if available < required:
+            names = ", ".join(name for _, name, p_idx, _, _ in plan.steps if p_idx == pump_index)
+            missing_or_low.append((names, required, available, 'ml', f"Pumpe {pump_index}"))
+    if not missing_or_low:
+        return True, {'message': 'Alle Zutaten verfügbar.'}
+    message = "Nicht genug Zutaten verfügbar: " + "; ".join(
+        f"{name} ({req:.1f}{unit} benötigt, nur {avail:.1f}{unit} auf {loc})" for name, req, avail, unit, loc in missing_or_low)
+    logger.warning(message)
+    return False, {'missing': missing_or_low, 'message': message}
+
+
+# --- Verfügbarkeitsindex (ganzes Menü) ---
+# Jede Zutat bekommt eine Spalte (Bit), jedes Rezept eine Bitmaske seiner Zutaten und eine
+# dünn besetzte Zeile ml-Anteil je Zutat (Anteil am Standardvolumen, wie in scale_recipe).
+# "Mixbar mit dieser Belegung" ist dann ein Teilmengentest der Masken, "genug Vorrat für
+# dieses Glas" ein Vergleich aller Anteile * Zielvolumen mit dem Vorrat - für alle Rezepte
+# in einem Durchlauf. Der Index hängt nur von Zutaten und Rezepten ab, nicht von den Pumpen.
+INDEX_CATALOG_SECTIONS = ('ingredients', 'recipes', 'recipe_ingredients')
+
+class AvailabilityIndex:
+    """Rezept x Zutat als Bitmasken und ml-Anteile (mit NumPy vektorisiert, sonst Python-Ganzzahlen)."""
+
+    def __init__(self, recipe_ids, rows, version=None):
+        self.version = version
+        self.recipe_ids = list(recipe_ids)
+        self._rows = {recipe_id: position for position, recipe_id in enumerate(self.recipe_ids)}
+        self._columns = {}           # ingredient_id -> Bitposition
+        self._recipes_by_ingredient = {} # ingredient_id -> {Zeile, ...} (Rückwärtsindex)
+        entries = []                 # (Zeile, Spalte, Menge) der ml-Zutaten
+        masks = [0] * len(self.recipe_ids)
+        totals = [0.0] * len(self.recipe_ids)
+        for recipe_id, ingredient_id, amount, unit in rows:
+            row = self._rows.get(recipe_id)
+            if row is None:
+                continue
+            column = self._columns.setdefault(ingredient_id, len(self._columns))
+            self._recipes_by_ingredient.setdefault(ingredient_id, set()).add(row)
+            masks[row] |= 1 << column
+            if unit and unit.lower() == 'ml':
+                try: amount_f = float(amount)
+                except (ValueError, TypeError): continue
+                totals[row] += amount_f
+                entries.append((row, column, amount_f))
+        # Anteil am Standardvolumen; Rezepte ohne ml-Volumen sind nie ausschenkbar
+        entries = [(row, column, amount / totals[row]) for row, column, amount in entries if totals[row] > 0]
+        self._masks = masks
+        self._scalable = [total > 0 for total in totals]
+        self._row_entries = [[] for _ in self.recipe_ids] # je Zeile [(Spalte, Anteil), ...]
+        for row, column, fraction in entries:
+            self._row_entries[row].append((column, fraction))
+        if np is not None:
+            words = max(1, (len(self._columns) + 63) // 64)
+            self._np_masks = np.zeros((len(self.recipe_ids), words), dtype=np.uint64)
+            for row, mask in enumerate(masks):
+                for word in range(words):
+                    self._np_masks[row, word] = (mask >> (64 * word)) & 0xFFFFFFFFFFFFFFFF
+            self._np_entry_rows = np.array([e[0] for e in entries], dtype=np.int64)
+            self._np_entry_columns = np.array([e[1] for e in entries], dtype=np.int64)
+            self._np_entry_fractions = np.array([e[2] for e in entries], dtype=np.float64)
+            self._np_scalable = np.array(self._scalable, dtype=bool)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def _mask_of(self, ingredient_ids):
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            column = self._columns.get(ingredient_id)
+            if column is not None:
+                mask |= 1 << column
+        return mask
+
+    def _stock_columns(self, available_ml):
+        return {self._columns[ingredient_id]: ml or 0.0
+                for ingredient_id, ml in available_ml.items() if ingredient_id in self._columns}
+
+    def _subset_flags(self, available):
+        if np is not None:
+            words = self._np_masks.shape[1]
+            missing = np.array([~(available >> (64 * word)) & 0xFFFFFFFFFFFFFFFF for word in range(words)], dtype=np.uint64)
+            return ~(self._np_masks & missing).any(axis=1) & self._np_masks.any(axis=1)
+        return [mask != 0 and mask & ~available == 0 for mask in self._masks]
+
+    def _pourable_flags(self, target_volume_ml, available_ml):
+        flags = self._subset_flags(self._mask_of(available_ml))
+        target = float(target_volume_ml)
+        if np is not None:
+            stock = np.zeros(len(self._columns), dtype=np.float64)
+            for column, ml in self._stock_columns(available_ml).items():
+                stock[column] = ml
+            low = self._np_entry_fractions * target > stock[self._np_entry_columns]
+            short = np.bincount(self._np_entry_rows[low], minlength=len(self.recipe_ids)) > 0
+            return flags & self._np_scalable & ~short
+        flags = [ok and scalable for ok, scalable in zip(flags, self._scalable)]
+        stock = self._stock_columns(available_ml)
+        for row, row_entries in enumerate(self._row_entries):
+            if flags[row] and any(fraction * target > stock.get(column, 0.0) for column, fraction in row_entries):
+                flags[row] = False
+        return flags
+
+    def makeable(self, ingredient_ids):
+        """recipe_ids, deren Zutaten alle in ingredient_ids (z.B. der Pumpenbelegung) enthalten sind."""
+        flags = self._subset_flags(self._mask_of(ingredient_ids))
+        return {recipe_id for recipe_id, ok in zip(self.recipe_ids, flags) if ok}
+
+    def pourable(self, target_volume_ml, available_ml):
+        """recipe_ids, die bei target_volume_ml mit dem Vorrat {ingredient_id: ml} ausgeschenkt werden können.
+
+        Entspricht check_ingredient_availability() für jedes Rezept, aber in einem Durchlauf.
+        """
+        flags = self._pourable_flags(target_volume_ml, available_ml)
+        return {recipe_id for recipe_id, ok in zip(self.recipe_ids, flags) if ok}
+
+    def states(self, target_volume_ml, assigned, available_ml, recipe_ids=None):
+        """{recipe_id: ausschenkbar?} für alle Rezepte, deren Zutaten vollständig in assigned liegen.
+
+        Ohne recipe_ids ein vektorisierter Durchlauf über alle Rezepte, sonst nur die angegebenen.
+        """
+        if recipe_ids is None:
+            listed = self._subset_flags(self._mask_of(assigned))
+            pourable = self._pourable_flags(target_volume_ml, available_ml)
+            return {recipe_id: bool(ok) for recipe_id, listed_ok, ok in zip(self.recipe_ids, listed, pourable) if listed_ok}
+        assigned_mask = self._mask_of(assigned)
+        stock_mask = self._mask_of(available_ml)
+        stock = self._stock_columns(available_ml)
+        target = float(target_volume_ml)
+        states = {}
+        for recipe_id in recipe_ids:
+            row = self._rows.get(recipe_id)
+            if row is None or not self._masks[row] or self._masks[row] & ~assigned_mask:
+                continue
+            states[recipe_id] = (self._scalable[row] and not self._masks[row] & ~stock_mask
+                                 and all(fraction * target <= stock.get(column, 0.0) for column, fraction in self._row_entries[row]))
+        return states
+
+    def recipes_using(self, ingredient_ids):
+        """recipe_ids aller Rezepte, die eine der Zutaten enthalten (Rückwärtsindex)."""
+        rows = set()
+        for ingredient_id in ingredient_ids:
+            rows |= self._recipes_by_ingredient.get(ingredient_id, set())
+        return {self.recipe_ids[row] for row in rows}
+
+_availability_index = None
+_availability_index_lock = threading.Lock()
+
+def get_availability_index():
+    """Der Verfügbarkeitsindex zum aktuellen Katalog (neu aufgebaut, wenn sich Rezepte/Zutaten ändern)."""
+    global _availability_index
+    version = db.get_catalog_version(*INDEX_CATALOG_SECTIONS)
+    with _availability_index_lock:
+        index = _availability_index
+    if index is not None and index.version == version:
+        return index
+    rows = db.get_all_recipe_ingredient_rows()
+    if rows is None:
+        return index if index is not None else AvailabilityIndex([], [])
+    index = AvailabilityIndex([row[0] for row in db.get_all_recipes()], rows, version)
+    with _availability_index_lock:
+        _availability_index = index
+    logger.debug(f"Verfügbarkeitsindex aufgebaut: {len(index)} Rezepte, {len(index._columns)} Zutaten "
+                 f"({'NumPy' if np is not None else 'Python'}).")
+    return index
+
+def _pump_stock():
+    """(zugewiesene ingredient_ids, {ingredient_id: Restmenge ml}) aus der aktuellen Pumpenbelegung.
+
+    Vorrat je Zutat wie in check_ingredient_availability(): die Restmenge der zugewiesenen
+    Pumpe; Pumpen ohne Kalibrierung zählen nicht (der Ausgabeplan wäre unvollständig).
+    """
+    assigned, available_ml = set(), {}
+    for p_idx, ing_id, _, vol, calibration in db.get_all_pumps_info():
+        if ing_id is not None:
+            assigned.add(ing_id)
+            if calibration and calibration > 0:
+                available_ml[ing_id] = vol if vol is not None else 0.0
+            else:
+                available_ml.pop(ing_id, None)
+    return assigned, available_ml
+
+def get_pourable_recipe_ids(target_volume_ml):
+    """recipe_ids, die mit Belegung, Kalibrierung und Restmengen jetzt bei target_volume_ml gehen."""
+    _, available_ml = _pump_stock()
+    return get_availability_index().pourable(target_volume_ml, available_ml)
+
+
+# --- Inkrementelle Verfügbarkeit (Menü) ---
+@dataclass(frozen=True)
+class AvailabilityDiff:
+    """Änderung des Menüs seit dem letzten refresh() (recipe_ids)."""
+    added: frozenset    # neu mixbar (ins Menü aufnehmen)
+    removed: frozenset  # nicht mehr mixbar (aus dem Menü entfernen)
+    changed: frozenset  # weiterhin im Menü, aber ausschenkbar <-> ausgegraut gewechselt
+    version: int        # Menü-Version nach dieser Änderung
+    full: bool = False  # True, wenn alle Rezepte neu bewertet wurden
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+class AvailabilityTracker:
+    """Hält den Menüzustand {recipe_id: ausschenkbar?} und bewertet bei Änderungen nur betroffene Rezepte neu.
+
+    refresh() vergleicht die Pumpenbelegung und Restmengen mit dem letzten Stand; nur Rezepte,
+    die eine geänderte Zutat (alte oder neue Belegung, Vorrat) enthalten, werden über den
+    Rückwärtsindex neu geprüft. Ändern sich Rezepte/Zutaten oder das Zielvolumen, wird alles
+    in einem vektorisierten Durchlauf neu bewertet. Nicht-leere Diffs gehen an alle Listener.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._index = None
+        self._target_volume_ml = None
+        self._assigned = set()
+        self._available_ml = {}
+        self.states = {}  # recipe_id -> ausschenkbar? (nur mixbare Rezepte)
+        self.version = 0
+
+    def add_listener(self, callback):
+        """callback(diff) wird im Thread des refresh()-Aufrufers aufgerufen."""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def refresh(self, target_volume_ml=None):
+        """Gleicht den Menüzustand mit Katalog und Pumpen ab. Rückgabe: AvailabilityDiff."""
+        with self._lock:
+            index = get_availability_index()
+            target = float(target_volume_ml) if target_volume_ml is not None else self._target_volume_ml
+            if target is None:
+                target = 0.0
+            assigned, available_ml = _pump_stock()
+            full = index is not self._index or target != self._target_volume_ml
+            if full:
+                new_states = index.states(target, assigned, available_ml)
+                before, after = self.states, new_states
+            else:
+                changed_ingredients = assigned ^ self._assigned
+                changed_ingredients.update(ing_id for ing_id in available_ml.keys() | self._available_ml.keys()
+                                           if available_ml.get(ing_id) != self._available_ml.get(ing_id))
+                affected = index.recipes_using(changed_ingredients)
+                partial = index.states(target, assigned, available_ml, affected)
+                before = {recipe_id: self.states[recipe_id] for recipe_id in affected if recipe_id in self.states}
+                after = partial
+                new_states = dict(self.states)
+                for recipe_id in affected:
+                    new_states.pop(recipe_id, None)
+                new_states.update(partial)
+                logger.debug(f"Verfügbarkeit: {len(changed_ingredients)} Zutaten geändert, {len(affected)} Rezepte neu geprüft.")
+            added = after.keys() - before.keys()
+            removed = before.keys() - after.keys()
+            changed = {recipe_id for recipe_id in after.keys() & before.keys() if after[recipe_id] != before[recipe_id]}
+            self._index, self._target_volume_ml = index, target
+            self._assigned, self._available_ml = assigned, available_ml
+            self.states = new_states
+            if added or removed or changed:
+                self.version += 1
+                logger.info(f"Menü-Verfügbarkeit geändert: +{len(added)} -{len(removed)} ~{len(changed)} (Version {self.version}).")
+            diff = AvailabilityDiff(frozenset(added), frozenset(removed), frozenset(changed), self.version, full)
+            listeners = list(self._listeners) if diff else []
+        for callback in listeners:
+            callback(diff)
+        return diff
+
+    def menu(self):
+        """[(recipe_id, name, ausschenkbar?), ...] aller mixbaren Rezepte, nach Namen sortiert."""
+        with self._lock:
+            states = dict(self.states)
+        return [(row[0], row[1], states[row[0]]) for row in db.get_all_recipes() if row[0] in states]
+
+_availability_tracker = AvailabilityTracker()
+
+def get_availability_tracker():
+    return _availability_tracker
+
+
 # --- Verfügbarkeitsprüfung --- NEUE FUNKTION
 def check_ingredient_availability(scaled_ingredients):
     """
@@ -162,6 +578,8 @@ def check_ingredient_availability(scaled_ingredients):
 # --- Testblock ---
 # (if __name__ == '__main__': ... bleibt unverändert)
 if __name__ == '__main__':
+    import log_setup
+    log_setup.setup_logging()
     print("--- Teste Core Logic ---")
     logger.setLevel(logging.DEBUG)
     db.initialize_database()
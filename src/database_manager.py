@@ -1,126 +1,435 @@
 import sqlite3
 from sqlite3 import Error
-import yaml
 import os
+import sys
 import logging
+import threading
 import datetime # Für Zeitstempel im PourLog benötigt
+try:
+    import app_config
+except ImportError: # als Paket importiert (from src import database_manager)
+    from . import app_config
 
-# --- Logging Setup ---
-log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('DatabaseManager')
-logger.setLevel(logging.DEBUG) # DEBUG für ausführliche Test-Logs
-if not logger.handlers:
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(log_formatter)
-    logger.addHandler(stream_handler)
-# ---------------------
 
 DATABASE_PATH = None
 PUMP_COUNT = 8 # Feste Anzahl der Pumpen
 
+# Speicherprofil für SQLite (kann über 'database_storage' in config.yaml überschrieben werden)
+STORAGE_PROFILE = {
+    'journal_mode': 'WAL',     # WAL: Leser blockieren Schreiber nicht, weniger fsyncs
+    'synchronous': 'NORMAL',   # OFF / NORMAL / FULL / EXTRA
+    'cache_size_kb': 8192,     # Seiten-Cache pro Verbindung
+    'mmap_size_mb': 16,        # 0 = Memory-Mapped I/O aus
+}
+_VALID_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+_VALID_SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# Eine dauerhaft offene Verbindung pro Thread (statt connect/close bei jedem Aufruf)
+_thread_local = threading.local()
+_open_connections = []
+_connections_lock = threading.Lock()
+_pool_generation = 0 # wird von close_all_connections() erhöht; ältere Thread-Verbindungen sind ungültig
+
 # --- Config & Connection ---
 def load_db_config():
     global DATABASE_PATH
     if DATABASE_PATH is None:
-        # ... (Code unverändert von oben) ...
-        script_dir = os.path.dirname(__file__)
-        config_path = os.path.join(script_dir, '..', 'config', 'config.yaml')
-        logger.debug(f"Lade DB-Konfiguration von: {config_path}")
-        try:
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-                if 'database_path' in config:
-                    project_root = os.path.join(script_dir, '..')
-                    DATABASE_PATH = os.path.join(project_root, config['database_path'])
-                    logger.info(f"Datenbankpfad initialisiert: {DATABASE_PATH}")
-                    db_dir = os.path.dirname(DATABASE_PATH)
-                    if db_dir and not os.path.exists(db_dir):
-                        logger.info(f"Erstelle Datenbank-Verzeichnis: {db_dir}")
-                        os.makedirs(db_dir)
-                    return True
-                else:
-                    logger.error("Konfigurationsdatei fehlt 'database_path'.")
-                    return False
-        except FileNotFoundError:
-            logger.error(f"Konfigurationsdatei nicht gefunden: {config_path}")
-            return False
-        except Exception as e:
-            logger.error(f"Fehler beim Laden der DB-Konfiguration: {e}")
+        config = app_config.get_config()
+        if config is None:
+            logger.error("Keine gültige Konfiguration. Datenbankpfad nicht geladen.")
             return False
+        DATABASE_PATH = config.database_path
+        logger.info(f"Datenbankpfad initialisiert: {DATABASE_PATH}")
+        db_dir = os.path.dirname(DATABASE_PATH)
+        if db_dir and not os.path.exists(db_dir):
+            logger.info(f"Erstelle Datenbank-Verzeichnis: {db_dir}")
+            os.makedirs(db_dir)
+        load_storage_profile(config.database_storage)
+        load_pour_log_settings(config)
     return DATABASE_PATH is not None
 
+def load_pour_log_settings(config):
+    """Übernimmt die Write-Behind-Einstellungen für das Pour-Log."""
+    global POUR_LOG_WRITE_BEHIND, POUR_LOG_FLUSH_INTERVAL_S, POUR_LOG_BATCH_SIZE, POUR_LOG_BUFFER_SIZE
+    POUR_LOG_WRITE_BEHIND = config.pour_log_write_behind
+    POUR_LOG_FLUSH_INTERVAL_S = config.pour_log_flush_interval_s
+    POUR_LOG_BATCH_SIZE = config.pour_log_batch_size
+    POUR_LOG_BUFFER_SIZE = config.pour_log_buffer_size
+    if POUR_LOG_WRITE_BEHIND:
+        logger.info(f"Pour-Log im Write-Behind-Modus (alle {POUR_LOG_FLUSH_INTERVAL_S}s oder "
+                    f"{POUR_LOG_BATCH_SIZE} Einträge, max. {POUR_LOG_BUFFER_SIZE} im Speicher).")
+
+def load_storage_profile(storage_config):
+    """Übernimmt gültige Werte aus 'database_storage' in STORAGE_PROFILE."""
+    if not storage_config:
+        return
+    if not isinstance(storage_config, dict):
+        logger.warning(f"'database_storage' ist kein Dictionary ({storage_config!r}). Verwende Standardprofil.")
+        return
+    journal_mode = str(storage_config.get('journal_mode', STORAGE_PROFILE['journal_mode'])).upper()
+    if journal_mode in _VALID_JOURNAL_MODES:
+        STORAGE_PROFILE['journal_mode'] = journal_mode
+    else:
+        logger.warning(f"Ungültiger journal_mode '{journal_mode}' in Config ignoriert.")
+    synchronous = str(storage_config.get('synchronous', STORAGE_PROFILE['synchronous'])).upper()
+    if synchronous in _VALID_SYNCHRONOUS:
+        STORAGE_PROFILE['synchronous'] = synchronous
+    else:
+        logger.warning(f"Ungültiger synchronous-Wert '{synchronous}' in Config ignoriert.")
+    for key in ('cache_size_kb', 'mmap_size_mb'):
+        if key in storage_config:
+            try:
+                value = int(storage_config[key])
+                assert value >= 0
+                STORAGE_PROFILE[key] = value
+            except (ValueError, TypeError, AssertionError):
+                logger.warning(f"Ungültiger Wert für '{key}' in Config ignoriert: {storage_config[key]!r}")
+    logger.info(f"Speicherprofil: {STORAGE_PROFILE}")
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite-Verbindung, die bei close() offen bleibt und nur offene Transaktionen verwirft.
+
+    Die bestehenden Funktionen rufen weiterhin conn.close() auf; die Verbindung wird
+    dadurch nur an den Thread zurückgegeben. Geschlossen wird sie über close_all_connections().
+    """
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+
+def _apply_storage_profile(conn):
+    conn.execute("PRAGMA foreign_keys = ON")
+    journal_mode = conn.execute(f"PRAGMA journal_mode = {STORAGE_PROFILE['journal_mode']}").fetchone()[0]
+    conn.execute(f"PRAGMA synchronous = {STORAGE_PROFILE['synchronous']}")
+    # Negativer Wert = Größe in KiB statt in Seiten
+    conn.execute(f"PRAGMA cache_size = {-int(STORAGE_PROFILE['cache_size_kb'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(STORAGE_PROFILE['mmap_size_mb']) * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return journal_mode
+
 def create_connection():
+    """Gibt die persistente Verbindung des aktuellen Threads zurück (legt sie bei Bedarf an)."""
     if not load_db_config():
          logger.error("Kann Datenbankpfad nicht laden. Verbindung nicht möglich.")
          return None
-    conn = None
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None:
+        if _thread_local.path == DATABASE_PATH and _thread_local.generation == _pool_generation:
+            return conn
+        # Datenbankpfad geändert oder Pool geschlossen -> alte Verbindung verwerfen
+        _discard_connection(conn)
     try:
         # detect_types ist wichtig für TIMESTAMP
-        conn = sqlite3.connect(DATABASE_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-        conn.execute("PRAGMA foreign_keys = ON")
-        logger.debug(f"Verbindung zu SQLite DB '{DATABASE_PATH}' hergestellt (Version: {sqlite3.sqlite_version}). Foreign Keys aktiviert.")
+        # check_same_thread=False nur, damit close_all_connections() beim Beenden schließen darf;
+        # benutzt wird jede Verbindung ausschließlich von ihrem eigenen Thread.
+        conn = sqlite3.connect(DATABASE_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                               factory=PooledConnection, check_same_thread=False)
+        journal_mode = _apply_storage_profile(conn)
+        _thread_local.conn = conn
+        _thread_local.path = DATABASE_PATH
+        _thread_local.generation = _pool_generation
+        with _connections_lock:
+            _open_connections.append(conn)
+        logger.debug(f"Persistente Verbindung zu SQLite DB '{DATABASE_PATH}' für Thread '{threading.current_thread().name}' hergestellt "
+                     f"(Version: {sqlite3.sqlite_version}, journal_mode={journal_mode}, synchronous={STORAGE_PROFILE['synchronous']}).")
         return conn
     except Error as e:
         logger.error(f"Fehler beim Verbinden mit der Datenbank '{DATABASE_PATH}': {e}")
         return None
 
-# --- Table Creation ---
-def create_table(conn, create_table_sql):
+def _discard_connection(conn):
+    with _connections_lock:
+        if conn in _open_connections:
+            _open_connections.remove(conn)
     try:
-        # ... (Code unverändert von oben) ...
-        c = conn.cursor()
-        c.execute(create_table_sql)
-        logger.info(f"SQL ausgeführt (Tabelle erstellt/überprüft): {create_table_sql.split('(')[0]}...")
+        conn.really_close()
     except Error as e:
-        logger.error(f"Fehler beim Erstellen der Tabelle: {e}")
-
+        logger.warning(f"Fehler beim Schließen einer Verbindung: {e}")
+    if getattr(_thread_local, 'conn', None) is conn:
+        _thread_local.conn = None
+
+def close_all_connections():
+    """Schließt alle persistenten Verbindungen (z.B. beim Beenden der App)."""
+    global _pool_generation
+    with _connections_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+        _pool_generation += 1
+    for conn in connections:
+        try:
+            conn.really_close()
+        except Error as e:
+            logger.warning(f"Fehler beim Schließen einer Verbindung: {e}")
+    _thread_local.conn = None
+    logger.info(f"{len(connections)} Datenbankverbindung(en) geschlossen.")
+
+# --- Katalog-Cache ---
+# Rezepte, Zutaten und Pumpenbelegung ändern sich nur im Techniker-Menü, werden aber bei
+# jedem Screen-Wechsel und jedem Ausschank gelesen. Die Lesefunktionen bedienen sich daher
+# aus einem In-Process-Snapshot; die schreibenden Funktionen invalidieren bzw. patchen ihn.
+# Jede Änderung erhöht die Katalog-Version (monoton steigend).
+CATALOG_SECTIONS = ('ingredients', 'recipes', 'recipe_ingredients', 'pumps', 'volumes', 'calibration')
+_catalog_lock = threading.RLock()
+_catalog_version = 0
+_catalog_stamps = {section: 0 for section in CATALOG_SECTIONS} # Version der letzten Änderung je Bereich
+_catalog = {'ingredients': None, 'ingredient_table': None, 'recipes': None, 'recipe_ingredients': {}, 'pumps': None, 'makeable': None}
+
+# Welche zwischengespeicherten Daten bei einer Änderung eines Bereichs ungültig werden
+_CATALOG_DEPENDENCIES = {
+    'ingredients': ('ingredients', 'ingredient_table', 'makeable'),
+    'recipes': ('recipes', 'makeable'),
+    'recipe_ingredients': ('recipe_ingredients', 'makeable'),
+    'pumps': ('pumps', 'makeable'),
+    'volumes': (),     # wird gepatcht, nicht verworfen
+    'calibration': (), # wird gepatcht, nicht verworfen
+}
+
+def get_catalog_version(*sections):
+    """Aktuelle Katalog-Version; mit Bereichen: Version der letzten Änderung in einem dieser Bereiche."""
+    with _catalog_lock:
+        if not sections:
+            return _catalog_version
+        return max(_catalog_stamps[section] for section in sections)
+
+def _bump_catalog_version(*sections):
+    global _catalog_version
+    _catalog_version += 1
+    for section in sections:
+        _catalog_stamps[section] = _catalog_version
+    return _catalog_version
+
+def invalidate_catalog(*sections):
+    """Verwirft zwischengespeicherte Katalogdaten (ohne Argumente: alles)."""
+    sections = sections or CATALOG_SECTIONS
+    with _catalog_lock:
+        for section in sections:
+            for key in _CATALOG_DEPENDENCIES[section]:
+                _catalog[key] = {} if key == 'recipe_ingredients' else None
+        version = _bump_catalog_version(*sections)
+    logger.debug(f"Katalog invalidiert ({', '.join(sections)}) -> Version {version}")
+
+def _invalidate_recipe_ingredients(recipe_id):
+    with _catalog_lock:
+        _catalog['recipe_ingredients'].pop(recipe_id, None)
+        _catalog['makeable'] = None
+        _bump_catalog_version('recipe_ingredients')
+
+def _patch_cached_pump(pump_index, section, column, value):
+    """Ersetzt einen Wert in der gecachten Pumpenzeile, statt alle Pumpen neu zu laden."""
+    _patch_cached_pumps(section, column, {pump_index: value})
+
+def _patch_cached_pumps(section, column, values):
+    """Wie _patch_cached_pump für mehrere Pumpen ({pump_index: wert}), mit nur einer Versionserhöhung."""
+    with _catalog_lock:
+        pumps = _catalog['pumps']
+        if pumps is not None:
+            _catalog['pumps'] = [row[:column] + (values[row[0]],) + row[column + 1:] if row[0] in values else row
+                                 for row in pumps]
+        _bump_catalog_version(section)
+
+# SQLite COLLATE NOCASE faltet nur ASCII-Buchstaben; der Cache muss sich genauso verhalten
+_NOCASE_TABLE = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+def _nocase(text):
+    return text.translate(_NOCASE_TABLE)
+
+def _cached(key, loader, *args):
+    """Liefert Daten aus dem Katalog-Cache oder lädt sie über loader(*args) nach.
+
+    loader gibt bei Fehlern None zurück; Fehlerergebnisse werden nicht gespeichert.
+    """
+    with _catalog_lock:
+        store = _catalog[key] if not args else _catalog[key].get(args[0])
+        if store is not None:
+            return store
+        version = _catalog_version
+    rows = loader(*args)
+    if rows is None:
+        return None
+    with _catalog_lock:
+        # Nur speichern, wenn zwischenzeitlich nichts geändert wurde
+        if _catalog_version == version:
+            if args:
+                _catalog[key][args[0]] = rows
+            else:
+                _catalog[key] = rows
+    return rows
+
+class IngredientTable:
+    """Internierte Zutatentabelle: id <-> Name und Suche ohne Groß-/Kleinschreibung (wie COLLATE NOCASE).
+
+    Wird einmal aus der DB geladen und von add_ingredient() fortgeschrieben; Lookups kosten
+    einen Dictionary-Zugriff statt einer SQL-Abfrage.
+    """
 
-def ensure_recipe_image_columns(conn):
-    """Migration: Stellt sicher, dass die Rezepte-Tabelle die Bildspalten besitzt."""
-    try:
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(recipes)")
-        columns = [row[1] for row in cur.fetchall()]
-        if 'image_path' not in columns:
-            cur.execute("ALTER TABLE recipes ADD COLUMN image_path TEXT")
-            logger.info("Spalte 'image_path' zur Tabelle 'recipes' hinzugefügt.")
-        if 'image_blob' not in columns:
-            cur.execute("ALTER TABLE recipes ADD COLUMN image_blob BLOB")
-            logger.info("Spalte 'image_blob' zur Tabelle 'recipes' hinzugefügt.")
-        conn.commit()
-    except Error as e:
-        logger.error(f"Fehler beim Sicherstellen der Bildspalten in 'recipes': {e}")
+    def __init__(self, rows=()):
+        self._names = {}   # ingredient_id -> Name (interniert)
+        self._ids = {}     # gefalteter Name -> ingredient_id
+        for ingredient_id, name in rows:
+            self._add(ingredient_id, name)
+
+    def _add(self, ingredient_id, name):
+        name = sys.intern(name)
+        self._names[ingredient_id] = name
+        self._ids[_nocase(name)] = ingredient_id
+
+    def id_for(self, name):
+        return self._ids.get(_nocase(name)) if name is not None else None
+
+    def name_for(self, ingredient_id):
+        return self._names.get(ingredient_id)
+
+    def __contains__(self, ingredient_id):
+        return ingredient_id in self._names
+
+    def __len__(self):
+        return len(self._names)
+
+def _load_ingredient_table():
+    rows = _cached('ingredients', _query_all_ingredients)
+    return IngredientTable(rows) if rows is not None else None
+
+def get_ingredient_table():
+    """Die gemeinsame IngredientTable (bei DB-Fehlern eine leere Tabelle, die nicht gecacht wird)."""
+    return _cached('ingredient_table', _load_ingredient_table) or IngredientTable()
+
+def _add_cached_ingredient(ingredient_id, name):
+    """Trägt eine neu angelegte Zutat in Liste und Tabelle des Caches ein, statt beide zu verwerfen."""
+    with _catalog_lock:
+        rows = _catalog['ingredients']
+        if rows is not None:
+            _catalog['ingredients'] = sorted(rows + [(ingredient_id, name)], key=lambda row: _nocase(row[1]))
+        table = _catalog['ingredient_table']
+        if table is not None:
+            table._add(ingredient_id, name)
+        # Eine neue Zutat steckt noch in keinem Rezept -> 'makeable' bleibt gültig
+        _bump_catalog_version('ingredients')
+
+# --- Schema & Migrationen ---
+# Das Schema wird über PRAGMA user_version versioniert. Jede Migration läuft genau einmal in
+# einer eigenen Transaktion; ist die Datenbank aktuell, führt der Start keinerlei DDL aus.
+# Neue Schemaänderungen immer als neue Migration anhängen, bestehende nie verändern.
+
+def _add_missing_columns(cur, table, columns):
+    """Ergänzt fehlende Spalten ({name: typ}) in Datenbanken aus älteren Versionen."""
+    cur.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cur.fetchall()}
+    for name, column_type in columns.items():
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+            logger.info(f"Spalte '{name}' zur Tabelle '{table}' hinzugefügt.")
+
+def _migration_base_schema(cur):
+    cur.execute(""" CREATE TABLE IF NOT EXISTS ingredients (ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE COLLATE NOCASE); """)
+    cur.execute(""" CREATE TABLE IF NOT EXISTS pumps (pump_index INTEGER PRIMARY KEY, assigned_ingredient_id INTEGER, current_volume_ml REAL DEFAULT 0.0, calibration_ml_per_sec REAL DEFAULT 0.0, FOREIGN KEY (assigned_ingredient_id) REFERENCES ingredients (ingredient_id) ON DELETE SET NULL); """)
+    # Rezepte können optional ein Bild speichern. Entweder wird der Dateipfad
+    # in `image_path` abgelegt oder das Bild direkt als BLOB in `image_blob`.
+    # Es sollte jeweils nur eines der beiden Felder genutzt werden.
+    cur.execute(""" CREATE TABLE IF NOT EXISTS recipes (
+        recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+        description TEXT,
+        image_path TEXT,
+        image_blob BLOB,
+        instructions TEXT
+    ); """)
+    # Datenbanken von vor der Bild-Unterstützung
+    _add_missing_columns(cur, 'recipes', {'image_path': 'TEXT', 'image_blob': 'BLOB'})
+    cur.execute(""" CREATE TABLE IF NOT EXISTS recipe_ingredients (recipe_ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT, recipe_id INTEGER NOT NULL, ingredient_id INTEGER NOT NULL, amount REAL NOT NULL, unit TEXT DEFAULT 'ml', FOREIGN KEY (recipe_id) REFERENCES recipes (recipe_id) ON DELETE CASCADE, FOREIGN KEY (ingredient_id) REFERENCES ingredients (ingredient_id) ON DELETE CASCADE); """)
+    cur.execute(""" CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY COLLATE NOCASE, value TEXT); """)
+    cur.execute(""" CREATE TABLE IF NOT EXISTS pour_log (log_id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TIMESTAMP NOT NULL, recipe_id INTEGER, size_ml REAL, FOREIGN KEY (recipe_id) REFERENCES recipes (recipe_id) ON DELETE SET NULL); """)
+
+def _migration_pour_stats(cur):
+    # Rollup-Tabellen für Statistiken (ohne Fremdschlüssel, damit die Historie gelöschte Rezepte überlebt)
+    cur.execute(""" CREATE TABLE IF NOT EXISTS pour_stats_recipe_hourly (hour TEXT NOT NULL, recipe_id INTEGER NOT NULL, pours INTEGER NOT NULL DEFAULT 0, total_ml REAL NOT NULL DEFAULT 0.0, PRIMARY KEY (hour, recipe_id)) WITHOUT ROWID; """)
+    cur.execute(""" CREATE TABLE IF NOT EXISTS pour_stats_recipe_daily (day TEXT NOT NULL, recipe_id INTEGER NOT NULL, pours INTEGER NOT NULL DEFAULT 0, total_ml REAL NOT NULL DEFAULT 0.0, PRIMARY KEY (day, recipe_id)) WITHOUT ROWID; """)
+    cur.execute(""" CREATE TABLE IF NOT EXISTS pour_stats_ingredient_daily (day TEXT NOT NULL, ingredient_id INTEGER NOT NULL, total_ml REAL NOT NULL DEFAULT 0.0, PRIMARY KEY (day, ingredient_id)) WITHOUT ROWID; """)
+
+def _migration_hot_path_indexes(cur):
+    # Joins Rezept <-> Zutat <-> Pumpe und die zeitbasierten Log-Abfragen ohne Full Table Scan
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe ON recipe_ingredients(recipe_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient ON recipe_ingredients(ingredient_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pumps_assigned_ingredient ON pumps(assigned_ingredient_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_pour_log_timestamp ON pour_log(timestamp)")
+
+# Persistente Katalog-Revision: jede Änderung an Rezepten, Zutaten, Rezeptzutaten oder der
+# Pumpenbelegung/Kalibrierung erhöht settings.CatalogRevision per Trigger - auch über
+# Prozessgrenzen hinweg, z.B. um einen gespeicherten Menü-Snapshot zu prüfen. Restmengen
+# (current_volume_ml) zählen nicht dazu: sonst würde jeder Ausschank die Revision erhöhen
+# und den Snapshot neu schreiben lassen.
+CATALOG_REVISION_KEY = 'CatalogRevision'
+_CATALOG_REVISION_TABLES = ('recipes', 'ingredients', 'recipe_ingredients', 'pumps')
+_CATALOG_REVISION_UPDATE_COLUMNS = {'pumps': ('assigned_ingredient_id', 'calibration_ml_per_sec')}
+
+def _create_catalog_revision_trigger(cur, table, event):
+    columns = _CATALOG_REVISION_UPDATE_COLUMNS.get(table) if event == 'UPDATE' else None
+    timing = f"AFTER {event} OF {', '.join(columns)} ON {table}" if columns else f"AFTER {event} ON {table}"
+    cur.execute(f""" CREATE TRIGGER IF NOT EXISTS trg_catalog_revision_{table}_{event.lower()}
+                     {timing}
+                     BEGIN
+                         UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = '{CATALOG_REVISION_KEY}';
+                     END """)
+
+def _migration_catalog_revision(cur):
+    cur.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, '0')", (CATALOG_REVISION_KEY,))
+    for table in _CATALOG_REVISION_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            _create_catalog_revision_trigger(cur, table, event)
+
+def _migration_catalog_revision_pump_columns(cur):
+    # Version 4 hat den Update-Trigger für pumps auf alle Spalten gesetzt (auch Restmengen)
+    for table in _CATALOG_REVISION_UPDATE_COLUMNS:
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_catalog_revision_{table}_update")
+        _create_catalog_revision_trigger(cur, table, 'UPDATE')
+
+# (Zielversion, Beschreibung, Funktion) - Reihenfolge = Versionsnummer
+MIGRATIONS = [
+    (1, "Basisschema", _migration_base_schema),
+    (2, "Statistik-Rollups", _migration_pour_stats),
+    (3, "Indizes für Rezept-/Zutaten-Joins und Pour-Log", _migration_hot_path_indexes),
+    (4, "Persistente Katalog-Revision", _migration_catalog_revision),
+    (5, "Katalog-Revision ohne Pumpen-Restmengen", _migration_catalog_revision_pump_columns),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_database(conn):
+    """Bringt das Schema auf SCHEMA_VERSION. Rückgabe: True, wenn das Schema danach aktuell ist."""
+    version = get_schema_version(conn)
+    if version == SCHEMA_VERSION:
+        logger.debug(f"Datenbankschema aktuell (Version {version}).")
+        return True
+    if version > SCHEMA_VERSION:
+        logger.error(f"Datenbankschema (Version {version}) ist neuer als diese App (Version {SCHEMA_VERSION})!")
+        return False
+    for target_version, description, migration in MIGRATIONS:
+        if target_version <= version:
+            continue
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {int(target_version)}")
+            conn.commit()
+            logger.info(f"Datenbank-Migration {target_version} ({description}) ausgeführt.")
+        except Error as e:
+            conn.rollback()
+            logger.error(f"Datenbank-Migration {target_version} ({description}) fehlgeschlagen: {e}")
+            return False
+    return True
 
 def initialize_database():
     logger.info("Initialisiere Datenbank...")
     conn = create_connection()
     if conn is not None:
-        # SQL Statements (alle 6 wie vorher)
-        sql_create_ingredients_table = """ CREATE TABLE IF NOT EXISTS ingredients (ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE COLLATE NOCASE); """
-        sql_create_pumps_table = """ CREATE TABLE IF NOT EXISTS pumps (pump_index INTEGER PRIMARY KEY, assigned_ingredient_id INTEGER, current_volume_ml REAL DEFAULT 0.0, calibration_ml_per_sec REAL DEFAULT 0.0, FOREIGN KEY (assigned_ingredient_id) REFERENCES ingredients (ingredient_id) ON DELETE SET NULL); """
-        # Rezepte können optional ein Bild speichern. Entweder wird der Dateipfad
-        # in `image_path` abgelegt oder das Bild direkt als BLOB in `image_blob`.
-        # Es sollte jeweils nur eines der beiden Felder genutzt werden.
-        sql_create_recipes_table = """ CREATE TABLE IF NOT EXISTS recipes (
-            recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE COLLATE NOCASE,
-            description TEXT,
-            image_path TEXT,
-            image_blob BLOB,
-            instructions TEXT
-        ); """
-        sql_create_recipe_ingredients_table = """ CREATE TABLE IF NOT EXISTS recipe_ingredients (recipe_ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT, recipe_id INTEGER NOT NULL, ingredient_id INTEGER NOT NULL, amount REAL NOT NULL, unit TEXT DEFAULT 'ml', FOREIGN KEY (recipe_id) REFERENCES recipes (recipe_id) ON DELETE CASCADE, FOREIGN KEY (ingredient_id) REFERENCES ingredients (ingredient_id) ON DELETE CASCADE); """
-        sql_create_settings_table = """ CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY COLLATE NOCASE, value TEXT); """
-        sql_create_pour_log_table = """ CREATE TABLE IF NOT EXISTS pour_log (log_id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TIMESTAMP NOT NULL, recipe_id INTEGER, size_ml REAL, FOREIGN KEY (recipe_id) REFERENCES recipes (recipe_id) ON DELETE SET NULL); """
-
-        # Tabellen erstellen
-        create_table(conn, sql_create_ingredients_table)
-        create_table(conn, sql_create_pumps_table)
-        create_table(conn, sql_create_recipes_table)
-        ensure_recipe_image_columns(conn)
-        create_table(conn, sql_create_recipe_ingredients_table)
-        create_table(conn, sql_create_settings_table)
-        create_table(conn, sql_create_pour_log_table)
+        migrate_database(conn)
 
         # Initialisiere Pumpen-Einträge
         try:
@@ -132,33 +441,24 @@ def initialize_database():
         except Error as e:
             logger.error(f"Fehler beim Initialisieren der Pumpen-Einträge: {e}")
 
-        # Standardeinstellungen initialisieren
+        # Standardeinstellungen initialisieren: jeden Schlüssel einzeln, vorhandene Werte bleiben
+        # (die Tabelle ist nie leer, Migration 4 legt CatalogRevision an)
         try:
              c = conn.cursor()
-             c.execute("SELECT COUNT(*) FROM settings")
-             if c.fetchone()[0] == 0:
-                 logger.info("Initialisiere Standardeinstellungen...")
-                 # ... (Code unverändert von oben) ...
-                 if load_db_config():
-                    script_dir = os.path.dirname(__file__)
-                    config_path = os.path.join(script_dir, '..', 'config', 'config.yaml')
-                    try:
-                        with open(config_path, 'r') as f:
-                            config = yaml.safe_load(f)
-                            if 'technician_pin' in config:
-                                 c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", ('TechnicianPIN', config['technician_pin']))
-                            if 'glass_sizes' in config and config['glass_sizes']:
-                                 first_glass_name = list(config['glass_sizes'].keys())[0]
-                                 c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", ('SelectedGlassSize', first_glass_name))
-                            conn.commit()
-                            logger.info("Standardeinstellungen erfolgreich initialisiert.")
-                    except Exception as conf_e:
-                         logger.error(f"Fehler beim Lesen der Config für Standardeinstellungen: {conf_e}")
+             config = app_config.get_config()
+             if config is not None:
+                 defaults = (('TechnicianPIN', config.technician_pin),
+                             ('SelectedGlassSize', config.default_glass_size))
+                 c.executemany("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", defaults)
+                 conn.commit()
+                 if c.rowcount > 0:
+                     logger.info(f"{c.rowcount} Standardeinstellung(en) initialisiert.")
         except Error as e:
              logger.error(f"Fehler beim Initialisieren der Standardeinstellungen: {e}")
 
         conn.close()
-        logger.info("Datenbank-Initialisierung abgeschlossen. Verbindung geschlossen.")
+        invalidate_catalog()
+        logger.info("Datenbank-Initialisierung abgeschlossen.")
     else:
         logger.error("Datenbank-Initialisierung fehlgeschlagen: Keine Verbindung.")
 
@@ -170,17 +470,17 @@ def add_ingredient(name):
     sql = ''' INSERT INTO ingredients(name) VALUES(?) '''
     conn = create_connection()
     if conn is None: return None
+    existing_id = get_ingredient_table().id_for(name)
+    if existing_id is not None:
+        logger.warning(f"Zutat '{name}' existiert bereits mit ID {existing_id}. Füge nicht erneut hinzu.")
+        conn.close()
+        return existing_id
     try:
         cur = conn.cursor()
-        cur.execute("SELECT ingredient_id FROM ingredients WHERE name = ? COLLATE NOCASE", (name,))
-        existing = cur.fetchone()
-        if existing:
-            logger.warning(f"Zutat '{name}' existiert bereits mit ID {existing[0]}. Füge nicht erneut hinzu.")
-            conn.close()
-            return existing[0]
         cur.execute(sql, (name,))
         conn.commit()
         new_id = cur.lastrowid
+        _add_cached_ingredient(new_id, name)
         logger.info(f"Zutat '{name}' erfolgreich mit ID {new_id} hinzugefügt.")
         conn.close()
         return new_id
@@ -190,56 +490,42 @@ def add_ingredient(name):
         return None
 
 def get_ingredient_by_id(ingredient_id):
-    # ...
-    conn = create_connection()
-    if conn is None: return None
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM ingredients WHERE ingredient_id=?", (ingredient_id,))
-        row = cur.fetchone()
-        conn.close()
-        logger.debug(f"get_ingredient_by_id({ingredient_id}) -> {row}")
-        return row
-    except Error as e:
-        logger.error(f"Fehler beim Holen der Zutat mit ID {ingredient_id}: {e}")
-        conn.close()
-        return None
+    """Zutat (ingredient_id, name) aus der Zutatentabelle oder None."""
+    name = get_ingredient_table().name_for(ingredient_id)
+    return (ingredient_id, name) if name is not None else None
 
 def get_ingredient_by_name(name):
-    # ...
-    conn = create_connection()
-    if conn is None: return None
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM ingredients WHERE name=? COLLATE NOCASE", (name,))
-        row = cur.fetchone()
-        conn.close()
-        logger.debug(f"get_ingredient_by_name({name}) -> {row}")
-        return row
-    except Error as e:
-        logger.error(f"Fehler beim Holen der Zutat mit Namen '{name}': {e}")
-        conn.close()
-        return None
+    """Zutat (ingredient_id, name) aus der Zutatentabelle oder None (Groß-/Kleinschreibung egal)."""
+    table = get_ingredient_table()
+    ingredient_id = table.id_for(name)
+    return (ingredient_id, table.name_for(ingredient_id)) if ingredient_id is not None else None
 
-def get_all_ingredients():
-    # ...
+def _query_all_ingredients():
     conn = create_connection()
-    if conn is None: return []
+    if conn is None: return None
     try:
         cur = conn.cursor()
         cur.execute("SELECT * FROM ingredients ORDER BY name COLLATE NOCASE")
         rows = cur.fetchall()
         conn.close()
-        logger.debug(f"get_all_ingredients() -> {len(rows)} Zutaten gefunden.")
+        logger.debug(f"get_all_ingredients() -> {len(rows)} Zutaten aus DB geladen.")
         return rows
     except Error as e:
         logger.error(f"Fehler beim Holen aller Zutaten: {e}")
         conn.close()
-        return []
+        return None
+
+def get_all_ingredients():
+    rows = _cached('ingredients', _query_all_ingredients)
+    return list(rows) if rows is not None else []
 
 
 # ========== CRUD Recipes ==========
-# (unverändert)
+# Rezept-Abfragen für Listen/Details lesen bewusst keine Bildspalte image_blob mit;
+# Bilder werden nur bei Bedarf über get_recipe_image_blob()/iter_recipe_image_chunks() geladen.
+RECIPE_SUMMARY_COLUMNS = "recipe_id, name, description, image_path, instructions"
+IMAGE_CHUNK_SIZE = 64 * 1024
+
 def add_recipe(name, description=None, image_path=None, image_blob=None, instructions=None):
     """Fügt ein neues Rezept hinzu.
 
@@ -262,6 +548,7 @@ def add_recipe(name, description=None, image_path=None, image_blob=None, instruc
         cur.execute(sql, (name, description, image_path, image_blob, instructions))
         conn.commit()
         new_id = cur.lastrowid
+        invalidate_catalog('recipes')
         logger.info(f"Rezept '{name}' erfolgreich mit ID {new_id} hinzugefügt.")
         conn.close()
         return new_id
@@ -276,7 +563,7 @@ def get_recipe_by_id(recipe_id):
     if conn is None: return None
     try:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM recipes WHERE recipe_id=?", (recipe_id,))
+        cur.execute(f"SELECT {RECIPE_SUMMARY_COLUMNS} FROM recipes WHERE recipe_id=?", (recipe_id,))
         row = cur.fetchone()
         conn.close()
         logger.debug(f"get_recipe_by_id({recipe_id}) -> {row}")
@@ -315,6 +602,7 @@ def update_recipe(recipe_id, name=None, description=None, image_path=None, image
         params.append(recipe_id)
         cur.execute(f"UPDATE recipes SET {', '.join(fields)} WHERE recipe_id=?", params)
         conn.commit()
+        invalidate_catalog('recipes')
         logger.info(f"Rezept ID {recipe_id} aktualisiert: {', '.join(fields)}")
         conn.close()
         return True
@@ -345,6 +633,7 @@ def update_recipe_image(recipe_id, image_path_or_blob):
                 (image_path_or_blob, recipe_id),
             )
         conn.commit()
+        invalidate_catalog('recipes')
         logger.info(f"Bild für Rezept ID {recipe_id} aktualisiert.")
         conn.close()
         return True
@@ -359,7 +648,7 @@ def get_recipe_by_name(name):
     if conn is None: return None
     try:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM recipes WHERE name=? COLLATE NOCASE", (name,))
+        cur.execute(f"SELECT {RECIPE_SUMMARY_COLUMNS} FROM recipes WHERE name=? COLLATE NOCASE", (name,))
         row = cur.fetchone()
         conn.close()
         logger.debug(f"get_recipe_by_name({name}) -> {row}")
@@ -369,21 +658,80 @@ def get_recipe_by_name(name):
         conn.close()
         return None
 
-def get_all_recipes():
-    # ...
+def get_recipe_image_info(recipe_id):
+    """(image_path, image_blob_size) eines Rezepts, ohne das Bild selbst zu laden; None bei Fehler."""
     conn = create_connection()
-    if conn is None: return []
+    if conn is None: return None
     try:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM recipes ORDER BY name COLLATE NOCASE")
+        cur.execute("SELECT image_path, length(image_blob) FROM recipes WHERE recipe_id=?", (recipe_id,))
+        row = cur.fetchone()
+        conn.close()
+        if row is None:
+            logger.warning(f"Rezept ID {recipe_id} für Bildinfo nicht gefunden.")
+            return None
+        return (row[0], row[1] or 0)
+    except Error as e:
+        logger.error(f"Fehler beim Holen der Bildinfo für Rezept ID {recipe_id}: {e}")
+        conn.close()
+        return None
+
+def iter_recipe_image_chunks(recipe_id, chunk_size=IMAGE_CHUNK_SIZE):
+    """Liest das Bild-BLOB eines Rezepts stückweise (inkrementelles BLOB-I/O).
+
+    Liefert nichts, wenn das Rezept kein BLOB-Bild hat.
+    """
+    info = get_recipe_image_info(recipe_id)
+    if info is None or info[1] == 0:
+        return
+    blob_size = info[1]
+    conn = create_connection()
+    if conn is None: return
+    try:
+        if hasattr(conn, 'blobopen'):
+            # recipe_id ist INTEGER PRIMARY KEY und damit die rowid
+            with conn.blobopen('recipes', 'image_blob', recipe_id, readonly=True) as blob:
+                while True:
+                    chunk = blob.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        else:
+            # Python < 3.11: stückweise über substr() lesen
+            for offset in range(0, blob_size, chunk_size):
+                row = conn.execute("SELECT substr(image_blob, ?, ?) FROM recipes WHERE recipe_id=?",
+                                   (offset + 1, chunk_size, recipe_id)).fetchone()
+                if not row or not row[0]:
+                    break
+                yield row[0]
+    except Error as e:
+        logger.error(f"Fehler beim Lesen des Bildes für Rezept ID {recipe_id}: {e}")
+    finally:
+        conn.close()
+
+def get_recipe_image_blob(recipe_id):
+    """Komplettes Bild-BLOB eines Rezepts als bytes oder None."""
+    data = b"".join(iter_recipe_image_chunks(recipe_id))
+    return data or None
+
+def _query_all_recipes():
+    conn = create_connection()
+    if conn is None: return None
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {RECIPE_SUMMARY_COLUMNS} FROM recipes ORDER BY name COLLATE NOCASE")
         rows = cur.fetchall()
         conn.close()
-        logger.debug(f"get_all_recipes() -> {len(rows)} Rezepte gefunden.")
+        logger.debug(f"get_all_recipes() -> {len(rows)} Rezepte aus DB geladen.")
         return rows
     except Error as e:
         logger.error(f"Fehler beim Holen aller Rezepte: {e}")
         conn.close()
-        return []
+        return None
+
+def get_all_recipes():
+    rows = _cached('recipes', _query_all_recipes)
+    return list(rows) if rows is not None else []
 
 
 # ========== Funktionen für RecipeIngredients ==========
@@ -398,6 +746,7 @@ def add_ingredient_to_recipe(recipe_id, ingredient_id, amount, unit='ml'):
         cur = conn.cursor()
         cur.execute(sql, (recipe_id, ingredient_id, amount, unit))
         conn.commit()
+        _invalidate_recipe_ingredients(recipe_id)
         logger.info(f"Zutat ID {ingredient_id} ({amount}{unit}) zu Rezept ID {recipe_id} hinzugefügt.")
         conn.close()
         return True
@@ -406,26 +755,89 @@ def add_ingredient_to_recipe(recipe_id, ingredient_id, amount, unit='ml'):
         conn.close()
         return False
 
-def get_ingredients_for_recipe(recipe_id):
-    # ...
-    sql = """ SELECT i.name, ri.amount, ri.unit
+def _query_ingredients_for_recipe(recipe_id):
+    sql = """ SELECT ri.ingredient_id, i.name, ri.amount, ri.unit
               FROM recipe_ingredients ri
               JOIN ingredients i ON ri.ingredient_id = i.ingredient_id
               WHERE ri.recipe_id = ?
               ORDER BY i.name COLLATE NOCASE """
     conn = create_connection()
-    if conn is None: return []
+    if conn is None: return None
     try:
         cur = conn.cursor()
         cur.execute(sql, (recipe_id,))
         rows = cur.fetchall()
         conn.close()
-        logger.debug(f"get_ingredients_for_recipe({recipe_id}) -> {len(rows)} Zutaten gefunden.")
+        logger.debug(f"get_ingredients_for_recipe({recipe_id}) -> {len(rows)} Zutaten aus DB geladen.")
         return rows
     except Error as e:
         logger.error(f"Fehler beim Holen der Zutaten für Rezept ID {recipe_id}: {e}")
         conn.close()
-        return []
+        return None
+
+def get_ingredients_for_recipe(recipe_id):
+    """[(ingredient_name, amount, unit), ...] eines Rezepts."""
+    rows = _cached('recipe_ingredients', _query_ingredients_for_recipe, recipe_id)
+    return [(name, amount, unit) for _, name, amount, unit in rows] if rows is not None else []
+
+def get_ingredient_ids_for_recipe(recipe_id):
+    """[(ingredient_id, amount, unit), ...] eines Rezepts - ohne Namensauflösung, für die heißen Pfade."""
+    rows = _cached('recipe_ingredients', _query_ingredients_for_recipe, recipe_id)
+    return [(ingredient_id, amount, unit) for ingredient_id, _, amount, unit in rows] if rows is not None else []
+
+
+def _query_makeable_recipes():
+    """Alle Rezepte, deren Zutaten vollständig an Pumpen zugewiesen sind (eine einzige Abfrage).
+
+    Gibt Tupel (recipe_id, name, description, image_path, instructions) sortiert nach Namen zurück.
+    """
+    # Pro Rezept: Anzahl Zutaten == Anzahl Zutaten, die an einer Pumpe hängen
+    sql = """ SELECT r.recipe_id, r.name, r.description, r.image_path, r.instructions
+              FROM recipes r
+              JOIN recipe_ingredients ri ON ri.recipe_id = r.recipe_id
+              JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
+              LEFT JOIN (SELECT DISTINCT assigned_ingredient_id AS ingredient_id
+                         FROM pumps
+                         WHERE assigned_ingredient_id IS NOT NULL) ap ON ap.ingredient_id = ri.ingredient_id
+              GROUP BY r.recipe_id
+              HAVING COUNT(ap.ingredient_id) = COUNT(*)
+              ORDER BY r.name COLLATE NOCASE """
+    conn = create_connection()
+    if conn is None: return None
+    try:
+        cur = conn.cursor()
+        cur.execute(sql)
+        rows = cur.fetchall()
+        conn.close()
+        logger.debug(f"get_makeable_recipes() -> {len(rows)} Rezepte verfügbar.")
+        return rows
+    except Error as e:
+        logger.error(f"Fehler beim Ermitteln der verfügbaren Rezepte: {e}")
+        conn.close()
+        return None
+
+def get_makeable_recipes():
+    rows = _cached('makeable', _query_makeable_recipes)
+    return list(rows) if rows is not None else []
+
+def get_all_recipe_ingredient_rows():
+    """Alle Rezeptzutaten als [(recipe_id, ingredient_id, amount, unit), ...] nach recipe_id (eine Abfrage).
+
+    Nicht gecacht - gedacht für Indizes, die selbst über get_catalog_version() zwischengespeichert werden.
+    """
+    sql = """ SELECT recipe_id, ingredient_id, amount, unit FROM recipe_ingredients ORDER BY recipe_id """
+    conn = create_connection()
+    if conn is None: return None
+    try:
+        cur = conn.cursor()
+        cur.execute(sql)
+        rows = cur.fetchall()
+        conn.close()
+        return rows
+    except Error as e:
+        logger.error(f"Fehler beim Holen aller Rezeptzutaten: {e}")
+        conn.close()
+        return None
 
 
 # ========== CRUD Funktionen für Pumps ==========
@@ -442,6 +854,7 @@ def assign_ingredient_to_pump(pump_index, ingredient_id):
         cur = conn.cursor()
         cur.execute(sql, (ingredient_id, pump_index))
         conn.commit()
+        invalidate_catalog('pumps')
         if ingredient_id:
              ing_info = get_ingredient_by_id(ingredient_id)
              ing_name = ing_info[1] if ing_info else "Unbekannte ID"
@@ -467,6 +880,7 @@ def update_pump_volume(pump_index, volume_ml):
         cur = conn.cursor()
         cur.execute(sql, (volume_ml, pump_index))
         conn.commit()
+        _patch_cached_pump(pump_index, 'volumes', 3, volume_ml)
         logger.info(f"Volumen für Pumpe {pump_index} auf {volume_ml:.2f}ml gesetzt.")
         conn.close()
         return True
@@ -487,6 +901,7 @@ def update_pump_calibration(pump_index, ml_per_sec):
         cur = conn.cursor()
         cur.execute(sql, (ml_per_sec, pump_index))
         conn.commit()
+        _patch_cached_pump(pump_index, 'calibration', 4, ml_per_sec)
         logger.info(f"Kalibrierung für Pumpe {pump_index} auf {ml_per_sec:.2f}ml/sec gesetzt.")
         conn.close()
         return True
@@ -496,47 +911,39 @@ def update_pump_calibration(pump_index, ml_per_sec):
         return False
 
 def get_pump_info(pump_index):
-    # ...
+    """(pump_index, ingredient_id, ingredient_name, current_volume_ml, calibration_ml_per_sec) aus dem Katalog-Cache."""
     if not (0 <= pump_index < PUMP_COUNT):
          logger.error(f"Ungültiger Pumpenindex für get_pump_info: {pump_index}")
          return None
-    sql = """ SELECT p.pump_index, p.assigned_ingredient_id, i.name, p.current_volume_ml, p.calibration_ml_per_sec
-              FROM pumps p
-              LEFT JOIN ingredients i ON p.assigned_ingredient_id = i.ingredient_id
-              WHERE p.pump_index = ? """
-    conn = create_connection()
-    if conn is None: return None
-    try:
-        cur = conn.cursor()
-        cur.execute(sql, (pump_index,))
-        row = cur.fetchone()
-        conn.close()
-        logger.debug(f"get_pump_info({pump_index}) -> {row}")
-        return row
-    except Error as e:
-        logger.error(f"Fehler beim Holen der Infos für Pumpe {pump_index}: {e}")
-        conn.close()
-        return None
-
-def get_all_pumps_info():
-    # ...
+    for row in get_all_pumps_info():
+        if row[0] == pump_index:
+            logger.debug(f"get_pump_info({pump_index}) -> {row}")
+            return row
+    logger.debug(f"get_pump_info({pump_index}) -> None")
+    return None
+
+def _query_all_pumps_info():
     sql = """ SELECT p.pump_index, p.assigned_ingredient_id, i.name, p.current_volume_ml, p.calibration_ml_per_sec
               FROM pumps p
               LEFT JOIN ingredients i ON p.assigned_ingredient_id = i.ingredient_id
               ORDER BY p.pump_index """
     conn = create_connection()
-    if conn is None: return []
+    if conn is None: return None
     try:
         cur = conn.cursor()
         cur.execute(sql)
         rows = cur.fetchall()
         conn.close()
-        logger.debug(f"get_all_pumps_info() -> {len(rows)} Pumpen-Infos gefunden.")
+        logger.debug(f"get_all_pumps_info() -> {len(rows)} Pumpen-Infos aus DB geladen.")
         return rows
     except Error as e:
         logger.error(f"Fehler beim Holen aller Pumpen-Infos: {e}")
         conn.close()
-        return []
+        return None
+
+def get_all_pumps_info():
+    rows = _cached('pumps', _query_all_pumps_info)
+    return list(rows) if rows is not None else []
 
 
 # ========== CRUD Funktionen für Settings ========== NEU
@@ -561,6 +968,14 @@ def get_setting(key, default=None):
         conn.close()
         return default
 
+def get_catalog_revision():
+    """Persistente Katalog-Revision (siehe _migration_catalog_revision) oder None bei Fehlern."""
+    value = get_setting(CATALOG_REVISION_KEY)
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
 def set_setting(key, value):
     """ Setzt oder aktualisiert einen Wert in der Settings-Tabelle. """
     # INSERT OR REPLACE: Fügt ein, wenn key neu; ersetzt, wenn key existiert
@@ -582,17 +997,136 @@ def set_setting(key, value):
 
 # ========== CRUD Funktionen für PourLog ========== NEU
 
-def add_pour_log_entry(recipe_id, size_ml):
-    """ Fügt einen Eintrag zum Pour-Log hinzu. """
-    sql = ''' INSERT INTO pour_log(timestamp, recipe_id, size_ml) VALUES(?,?,?) '''
+# Write-Behind: Log-Einträge werden im Speicher gesammelt und vom Flusher-Thread gebündelt
+# geschrieben (Einstellungen unter 'pour_log' in config.yaml, übernommen in load_db_config()).
+POUR_LOG_WRITE_BEHIND = False
+POUR_LOG_FLUSH_INTERVAL_S = 30.0
+POUR_LOG_BATCH_SIZE = 20
+POUR_LOG_BUFFER_SIZE = 500
+
+_POUR_LOG_INSERT_SQL = ''' INSERT INTO pour_log(timestamp, recipe_id, size_ml) VALUES(?,?,?) '''
+_pour_log_buffer = []                   # [(timestamp, recipe_id, size_ml, ingredient_ml), ...], älteste zuerst
+_pour_log_cond = threading.Condition()
+_pour_log_flush_lock = threading.Lock() # Schreiben + Entfernen aus dem Puffer sind für Leser atomar
+_pour_log_flusher = None
+_pour_log_stopping = False
+
+def _pour_log_timestamp():
+    # Gleiche Textform, die sqlite3 beim Speichern von datetime-Objekten erzeugt
+    return datetime.datetime.now().isoformat(" ")
+
+# Rollups: Stunden-/Tages-Buckets sind Präfixe des Zeitstempels ('YYYY-MM-DD HH' / 'YYYY-MM-DD')
+_RECIPE_HOURLY_UPSERT_SQL = """ INSERT INTO pour_stats_recipe_hourly(hour, recipe_id, pours, total_ml) VALUES(substr(?, 1, 13), ?, 1, ?)
+                                ON CONFLICT(hour, recipe_id) DO UPDATE SET pours = pours + 1, total_ml = total_ml + excluded.total_ml """
+_RECIPE_DAILY_UPSERT_SQL = """ INSERT INTO pour_stats_recipe_daily(day, recipe_id, pours, total_ml) VALUES(substr(?, 1, 10), ?, 1, ?)
+                               ON CONFLICT(day, recipe_id) DO UPDATE SET pours = pours + 1, total_ml = total_ml + excluded.total_ml """
+_INGREDIENT_DAILY_UPSERT_SQL = """ INSERT INTO pour_stats_ingredient_daily(day, ingredient_id, total_ml) VALUES(substr(?, 1, 10), ?, ?)
+                                   ON CONFLICT(day, ingredient_id) DO UPDATE SET total_ml = total_ml + excluded.total_ml """
+
+def _write_pour_log_entries(cur, entries):
+    """Schreibt Log-Einträge samt Rollups in die laufende Transaktion von cur.
+
+    entries: [(timestamp, recipe_id, size_ml, ingredient_ml), ...] mit ingredient_ml als
+    Tupel ((ingredient_id, ml), ...). Rückgabe: log_id des letzten Eintrags.
+    """
+    cur.executemany(_POUR_LOG_INSERT_SQL, [entry[:3] for entry in entries])
+    # lastrowid wird von executemany nicht gesetzt; last_insert_rowid() gilt für die Verbindung
+    log_id = cur.execute("SELECT last_insert_rowid()").fetchone()[0]
+    recipe_rows = [entry[:3] for entry in entries if entry[1] is not None]
+    cur.executemany(_RECIPE_HOURLY_UPSERT_SQL, recipe_rows)
+    cur.executemany(_RECIPE_DAILY_UPSERT_SQL, recipe_rows)
+    cur.executemany(_INGREDIENT_DAILY_UPSERT_SQL, [(timestamp, ingredient_id, ml)
+                                                   for timestamp, _, _, ingredient_ml in entries
+                                                   for ingredient_id, ml in ingredient_ml])
+    return log_id
+
+def _buffer_pour_log_entry(recipe_id, size_ml, ingredient_ml=()):
+    """Legt einen Log-Eintrag in den Puffer; ist er voll, wird im aufrufenden Thread geschrieben."""
+    global _pour_log_flusher
+    entry = (_pour_log_timestamp(), recipe_id, size_ml, tuple(ingredient_ml))
+    with _pour_log_cond:
+        full = len(_pour_log_buffer) >= POUR_LOG_BUFFER_SIZE
+    if full:
+        logger.warning(f"Pour-Log-Puffer voll ({POUR_LOG_BUFFER_SIZE} Einträge), schreibe sofort.")
+        flush_pour_log()
+    with _pour_log_cond:
+        _pour_log_buffer.append(entry)
+        if len(_pour_log_buffer) >= POUR_LOG_BATCH_SIZE:
+            _pour_log_cond.notify()
+        if not _pour_log_stopping and (_pour_log_flusher is None or not _pour_log_flusher.is_alive()):
+            _pour_log_flusher = threading.Thread(target=_pour_log_flusher_loop, name='PourLogFlusher', daemon=True)
+            _pour_log_flusher.start()
+    logger.debug(f"Pour-Log-Eintrag gepuffert: Rezept ID {recipe_id}, {size_ml}ml.")
+    return True
+
+def _pour_log_flusher_loop():
+    while True:
+        with _pour_log_cond:
+            if not _pour_log_stopping and len(_pour_log_buffer) < POUR_LOG_BATCH_SIZE:
+                _pour_log_cond.wait(POUR_LOG_FLUSH_INTERVAL_S)
+            stopping = _pour_log_stopping
+        flush_pour_log()
+        if stopping:
+            break
+
+def flush_pour_log():
+    """Schreibt alle gepufferten Log-Einträge mit einem executemany in einer Transaktion.
+
+    Rückgabe: Anzahl geschriebener Einträge (0 auch bei Fehlern; die Einträge bleiben dann im Puffer).
+    """
+    with _pour_log_flush_lock:
+        with _pour_log_cond:
+            batch = list(_pour_log_buffer)
+        if not batch:
+            return 0
+        conn = create_connection()
+        if conn is None: return 0
+        try:
+            _write_pour_log_entries(conn.cursor(), batch)
+            conn.commit()
+        except Error as e:
+            logger.error(f"Fehler beim Schreiben von {len(batch)} gepufferten Pour-Log-Einträgen: {e}")
+            conn.close()
+            return 0
+        conn.close()
+        with _pour_log_cond:
+            del _pour_log_buffer[:len(batch)]
+    logger.info(f"{len(batch)} gepufferte Pour-Log-Einträge geschrieben.")
+    return len(batch)
+
+def stop_pour_log_writer(timeout=5.0):
+    """Beendet den Flusher-Thread und schreibt alle noch gepufferten Einträge (beim App-Ende aufrufen)."""
+    global _pour_log_flusher, _pour_log_stopping
+    with _pour_log_cond:
+        _pour_log_stopping = True
+        flusher = _pour_log_flusher
+        _pour_log_flusher = None
+        _pour_log_cond.notify_all()
+    if flusher is not None and flusher.is_alive():
+        flusher.join(timeout)
+    flush_pour_log() # Falls der Flusher nicht (mehr) lief
+    with _pour_log_cond:
+        _pour_log_stopping = False
+        remaining = len(_pour_log_buffer)
+    if remaining:
+        logger.error(f"{remaining} Pour-Log-Einträge konnten beim Beenden nicht geschrieben werden!")
+
+def add_pour_log_entry(recipe_id, size_ml, ingredient_ml=()):
+    """ Fügt einen Eintrag zum Pour-Log hinzu und aktualisiert die Statistik-Rollups.
+
+    ingredient_ml: optional ((ingredient_id, ml), ...) für die Zutaten-Statistik.
+    Im Write-Behind-Modus wird der Eintrag nur gepuffert und True zurückgegeben
+    (die log_id entsteht erst beim Schreiben).
+    """
+    if POUR_LOG_WRITE_BEHIND:
+        return _buffer_pour_log_entry(recipe_id, size_ml, ingredient_ml)
     conn = create_connection()
     if conn is None: return False
     try:
-        now = datetime.datetime.now() # Aktueller Zeitstempel
+        now = _pour_log_timestamp() # Aktueller Zeitstempel
         cur = conn.cursor()
-        cur.execute(sql, (now, recipe_id, size_ml))
+        log_id = _write_pour_log_entries(cur, [(now, recipe_id, size_ml, tuple(ingredient_ml))])
         conn.commit()
-        log_id = cur.lastrowid
         logger.info(f"Pour Log Eintrag {log_id} hinzugefügt: Rezept ID {recipe_id}, Größe {size_ml}ml um {now}.")
         conn.close()
         return log_id
@@ -602,8 +1136,72 @@ def add_pour_log_entry(recipe_id, size_ml):
         conn.close()
         return None
 
+_pour_commit_lock = threading.Lock()
+
+def commit_pour(recipe_id, size_ml, dispensed, log_entry=True):
+    """Verbucht einen Ausschank in einer einzigen Transaktion.
+
+    dispensed: {pump_index: abgegebene ml}. Die Restmengen werden in SQL abgezogen
+    (kein Lesen-Ändern-Schreiben in Python), dazu kommt der Pour-Log-Eintrag, sofern
+    log_entry gesetzt ist (abgebrochene Drinks werden nur abgebucht). Im Write-Behind-Modus
+    wird der Log-Eintrag gepuffert statt in derselben Transaktion geschrieben.
+    Rückgabe: (log_id, {pump_index: neue Restmenge}) oder None bei Fehlern; log_id ist None,
+    wenn (noch) kein Eintrag geschrieben wurde.
+    """
+    for pump_index, ml in dispensed.items():
+        if not (0 <= pump_index < PUMP_COUNT):
+            logger.error(f"Ungültiger Pumpenindex beim Verbuchen des Ausschanks: {pump_index}")
+            return None
+        if ml < 0:
+            logger.error(f"Negative Abgabemenge für Pumpe {pump_index}: {ml}")
+            return None
+    # Zutatenmengen für die Statistik aus der (gecachten) Pumpenbelegung
+    pump_ingredients = {row[0]: row[1] for row in get_all_pumps_info()}
+    ingredient_totals = {}
+    for pump_index, ml in dispensed.items():
+        ingredient_id = pump_ingredients.get(pump_index)
+        if ingredient_id is not None:
+            ingredient_totals[ingredient_id] = ingredient_totals.get(ingredient_id, 0.0) + ml
+    ingredient_ml = tuple(ingredient_totals.items())
+    conn = create_connection()
+    if conn is None: return None
+    pump_indices = sorted(dispensed)
+    write_log_now = log_entry and not POUR_LOG_WRITE_BEHIND
+    # Das Lock hält Commit und Cache-Update zusammen, damit der Cache nie einen älteren Stand übernimmt
+    with _pour_commit_lock:
+        try:
+            cur = conn.cursor()
+            # Schreibsperre sofort holen, damit parallele Commits nacheinander laufen
+            cur.execute("BEGIN IMMEDIATE")
+            cur.executemany("UPDATE pumps SET current_volume_ml = COALESCE(current_volume_ml, 0.0) - ? WHERE pump_index = ?",
+                            [(dispensed[i], i) for i in pump_indices])
+            log_id = None
+            if write_log_now:
+                log_id = _write_pour_log_entries(cur, [(_pour_log_timestamp(), recipe_id, size_ml, ingredient_ml)])
+            new_volumes = {}
+            if pump_indices:
+                placeholders = ','.join('?' * len(pump_indices))
+                cur.execute(f"SELECT pump_index, current_volume_ml FROM pumps WHERE pump_index IN ({placeholders})", pump_indices)
+                new_volumes = dict(cur.fetchall())
+            conn.commit()
+        except Error as e:
+            logger.error(f"Fehler beim Verbuchen des Ausschanks (Rezept ID {recipe_id}): {e}")
+            conn.close() # verwirft die offene Transaktion
+            return None
+        conn.close()
+        if new_volumes:
+            _patch_cached_pumps('volumes', 3, new_volumes)
+    if log_entry and not write_log_now:
+        _buffer_pour_log_entry(recipe_id, size_ml, ingredient_ml)
+    logger.info(f"Ausschank verbucht: Rezept ID {recipe_id}, {size_ml}ml, Pumpen {pump_indices}"
+                f"{f', Log-Eintrag {log_id}' if log_id else ''}.")
+    return log_id, new_volumes
+
 def get_pour_log(limit=50):
-    """ Holt die letzten N Einträge aus dem Pour-Log. """
+    """ Holt die letzten N Einträge aus dem Pour-Log.
+
+    Noch nicht geschriebene Einträge aus dem Write-Behind-Puffer sind enthalten (mit log_id None).
+    """
     # JOIN mit recipes, um den Rezeptnamen mitzuliefern
     sql = """ SELECT pl.log_id, pl.timestamp, pl.recipe_id, r.name, pl.size_ml
               FROM pour_log pl
@@ -613,11 +1211,20 @@ def get_pour_log(limit=50):
     conn = create_connection()
     if conn is None: return []
     try:
-        cur = conn.cursor()
-        cur.execute(sql, (limit,))
-        rows = cur.fetchall()
+        # Während eines Flushes stünden Einträge sonst doppelt (Puffer + DB) im Ergebnis
+        with _pour_log_flush_lock:
+            with _pour_log_cond:
+                pending = list(_pour_log_buffer)
+            cur = conn.cursor()
+            cur.execute(sql, (limit,))
+            rows = cur.fetchall()
         conn.close()
-        logger.debug(f"get_pour_log(limit={limit}) -> {len(rows)} Einträge gefunden.")
+        if pending:
+            recipe_names = {row[0]: row[1] for row in get_all_recipes()}
+            pending_rows = [(None, datetime.datetime.fromisoformat(timestamp), recipe_id, recipe_names.get(recipe_id), size_ml)
+                            for timestamp, recipe_id, size_ml, _ in pending]
+            rows = sorted(pending_rows + rows, key=lambda row: row[1], reverse=True)[:limit]
+        logger.debug(f"get_pour_log(limit={limit}) -> {len(rows)} Einträge gefunden ({len(pending)} gepuffert).")
         # Gibt Liste von Tupeln zurück [(log_id, time, r_id, r_name, size), ...]
         return rows
     except Error as e:
@@ -626,6 +1233,108 @@ def get_pour_log(limit=50):
         return []
 
 
+# ========== Statistik (Rollups) ==========
+# Die Rollup-Tabellen werden beim Schreiben jedes Log-Eintrags mitgeführt; Abfragen laufen
+# daher über Stunden-/Tages-Buckets statt über alle Ausschänke. Gepufferte Einträge
+# (Write-Behind) erscheinen erst nach dem nächsten Flush.
+
+def _bucket_bounds(since, until, length):
+    """Wandelt since/until (date, datetime oder ISO-String) in Bucket-Präfixe der Länge length."""
+    bounds = []
+    for value in (since, until):
+        if value is None:
+            bounds.append(None)
+        elif isinstance(value, (datetime.date, datetime.datetime)):
+            bounds.append(value.isoformat(" ")[:length] if isinstance(value, datetime.datetime) else value.isoformat())
+        else:
+            bounds.append(str(value)[:length])
+    return bounds
+
+def _query_stats(sql, bucket_column, since, until, length, tail):
+    since_key, until_key = _bucket_bounds(since, until, length)
+    conditions, params = [], []
+    if since_key is not None:
+        conditions.append(f"{bucket_column} >= ?")
+        params.append(since_key)
+    if until_key is not None:
+        conditions.append(f"{bucket_column} < ?")
+        params.append(until_key)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = create_connection()
+    if conn is None: return []
+    try:
+        cur = conn.cursor()
+        cur.execute(f"{sql} {where} {tail}", params)
+        rows = cur.fetchall()
+        conn.close()
+        return rows
+    except Error as e:
+        logger.error(f"Fehler beim Holen der Statistik: {e}")
+        conn.close()
+        return []
+
+def get_recipe_stats(since=None, until=None, hourly=False):
+    """Ausschänke je Rezept und Tag (bzw. Stunde), until exklusiv.
+
+    Rückgabe: [(bucket, recipe_id, recipe_name, pours, total_ml), ...] nach bucket sortiert.
+    """
+    table, column, length = ('pour_stats_recipe_hourly', 'hour', 13) if hourly else ('pour_stats_recipe_daily', 'day', 10)
+    sql = f""" SELECT s.{column}, s.recipe_id, r.name, s.pours, s.total_ml
+               FROM {table} s LEFT JOIN recipes r ON s.recipe_id = r.recipe_id """
+    return _query_stats(sql, f"s.{column}", since, until, length, f"ORDER BY s.{column}, s.recipe_id")
+
+def get_recipe_totals(since=None, until=None):
+    """Summe je Rezept im Zeitraum (Tages-Buckets): [(recipe_id, recipe_name, pours, total_ml), ...], beliebteste zuerst."""
+    sql = """ SELECT s.recipe_id, r.name, SUM(s.pours), SUM(s.total_ml)
+              FROM pour_stats_recipe_daily s LEFT JOIN recipes r ON s.recipe_id = r.recipe_id """
+    return _query_stats(sql, "s.day", since, until, 10, "GROUP BY s.recipe_id ORDER BY SUM(s.pours) DESC, s.recipe_id")
+
+def get_ingredient_usage(since=None, until=None):
+    """Verbrauch je Zutat im Zeitraum: [(ingredient_id, ingredient_name, total_ml), ...], höchster zuerst."""
+    sql = """ SELECT s.ingredient_id, i.name, SUM(s.total_ml)
+              FROM pour_stats_ingredient_daily s LEFT JOIN ingredients i ON s.ingredient_id = i.ingredient_id """
+    return _query_stats(sql, "s.day", since, until, 10, "GROUP BY s.ingredient_id ORDER BY SUM(s.total_ml) DESC")
+
+def rebuild_pour_stats():
+    """Baut alle Rollup-Tabellen aus pour_log neu auf (einmalig für bestehende Historie).
+
+    pour_log speichert keine Mengen je Zutat; der Zutatenverbrauch wird daher aus den
+    aktuellen Rezeptanteilen (Einheit ml) geschätzt. Rückgabe: Anzahl verarbeiteter
+    Log-Einträge oder None bei Fehlern.
+    """
+    flush_pour_log()
+    conn = create_connection()
+    if conn is None: return None
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        for table in ('pour_stats_recipe_hourly', 'pour_stats_recipe_daily', 'pour_stats_ingredient_daily'):
+            cur.execute(f"DELETE FROM {table}")
+        cur.execute(""" INSERT INTO pour_stats_recipe_hourly(hour, recipe_id, pours, total_ml)
+                        SELECT substr(timestamp, 1, 13), recipe_id, COUNT(*), COALESCE(SUM(size_ml), 0.0)
+                        FROM pour_log WHERE recipe_id IS NOT NULL GROUP BY 1, 2 """)
+        cur.execute(""" INSERT INTO pour_stats_recipe_daily(day, recipe_id, pours, total_ml)
+                        SELECT substr(hour, 1, 10), recipe_id, SUM(pours), SUM(total_ml)
+                        FROM pour_stats_recipe_hourly GROUP BY 1, 2 """)
+        cur.execute(""" INSERT INTO pour_stats_ingredient_daily(day, ingredient_id, total_ml)
+                        SELECT s.day, ri.ingredient_id, SUM(s.total_ml * ri.amount / t.recipe_ml)
+                        FROM pour_stats_recipe_daily s
+                        JOIN recipe_ingredients ri ON ri.recipe_id = s.recipe_id AND lower(ri.unit) = 'ml'
+                        JOIN (SELECT recipe_id, SUM(amount) AS recipe_ml FROM recipe_ingredients
+                              WHERE lower(unit) = 'ml' GROUP BY recipe_id HAVING SUM(amount) > 0) t ON t.recipe_id = s.recipe_id
+                        GROUP BY 1, 2 """)
+        cur.execute("SELECT COUNT(*) FROM pour_log")
+        count = cur.fetchone()[0]
+        conn.commit()
+        conn.close()
+        logger.info(f"Statistik aus {count} Pour-Log-Einträgen neu aufgebaut.")
+        return count
+    except Error as e:
+        logger.error(f"Fehler beim Neuaufbau der Statistik: {e}")
+        conn.close()
+        return None
+
+
 # --- Code zum direkten Testen dieses Moduls ---
 # (Funktionen zum Testen der einzelnen Teile)
 def test_ingredients():
@@ -778,6 +1487,12 @@ def test_pour_log(): # NEU
 
 
 if __name__ == '__main__':
+    import log_setup
+    log_setup.setup_logging()
+    if '--rebuild-pour-stats' in sys.argv:
+        # Einmalig nach dem Update: Statistiken aus der vorhandenen Historie aufbauen
+        initialize_database()
+        sys.exit(0 if rebuild_pour_stats() is not None else 1)
     print("--- Teste Database Manager Modul (FINAL) ---")
     logger.setLevel(logging.DEBUG) # Sicherstellen, dass DEBUG aktiv ist
     initialize_database()
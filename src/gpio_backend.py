@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger('GPIOBackend')
+
+# Gemeinsame Schnittstelle aller Backends (entspricht dem benutzten Teil von RPi.GPIO):
+#   Konstanten BCM, OUT, HIGH, LOW
+#   setmode(mode), setwarnings(flag), setup(pin, mode, initial=LOW), output(pin, value), cleanup()
+#   monotonic() -> Sekunden auf der Uhr des Backends
+#   speed       -> Faktor Backend-Zeit / Echtzeit (1.0 bei echter Hardware)
+
+BACKEND_RPI = 'rpi'
+BACKEND_SIMULATED = 'simulated'
+BACKEND_AUTO = 'auto' # RPi.GPIO, wenn vorhanden, sonst Simulation in Echtzeit
+DEFAULT_SIMULATION_SPEED = 100.0
+
+
+class RPiGPIOBackend:
+    """Echte Hardware über RPi.GPIO (nur auf dem Raspberry Pi verfügbar)."""
+
+    name = BACKEND_RPI
+    speed = 1.0
+
+    def __init__(self):
+        import RPi.GPIO as GPIO # ImportError, wenn nicht auf dem Pi
+        self._gpio = GPIO
+        self.BCM = GPIO.BCM
+        self.OUT = GPIO.OUT
+        self.HIGH = GPIO.HIGH
+        self.LOW = GPIO.LOW
+
+    def setmode(self, mode):
+        self._gpio.setmode(mode)
+
+    def setwarnings(self, flag):
+        self._gpio.setwarnings(flag)
+
+    def setup(self, pin, mode, initial=0):
+        self._gpio.setup(pin, mode, initial=initial)
+
+    def output(self, pin, value):
+        self._gpio.output(pin, value)
+
+    def cleanup(self):
+        self._gpio.cleanup()
+
+    def monotonic(self):
+        return time.monotonic()
+
+
+class VirtualClock:
+    """Monotone Uhr, die um den Faktor speed schneller als die Echtzeit läuft."""
+
+    def __init__(self, speed=DEFAULT_SIMULATION_SPEED):
+        if speed <= 0:
+            raise ValueError(f"Simulationsgeschwindigkeit muss > 0 sein: {speed}")
+        self.speed = float(speed)
+        self._real_start = time.monotonic()
+
+    def monotonic(self):
+        return (time.monotonic() - self._real_start) * self.speed
+
+    def sleep(self, seconds):
+        """Schläft seconds Sekunden virtuelle Zeit."""
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+class SimulatedGPIOBackend:
+    """GPIO-Simulation für Entwicklungsrechner und CI.
+
+    Zeichnet alle Pin-Wechsel mit virtuellem Zeitstempel auf. Die virtuelle Uhr läuft
+    standardmäßig 100x schneller als die Echtzeit, ein 10-s-Ausschank dauert also 0,1 s.
+    """
+
+    name = BACKEND_SIMULATED
+    BCM = 11
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self, speed=DEFAULT_SIMULATION_SPEED):
+        self.clock = VirtualClock(speed)
+        self.speed = self.clock.speed
+        self.mode = None
+        self._lock = threading.Lock()
+        self._pins = {}        # pin -> aktueller Pegel
+        self._transitions = [] # (virtuelle Zeit, pin, pegel)
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode, initial=0):
+        with self._lock:
+            self._pins[pin] = initial
+
+    def output(self, pin, value):
+        with self._lock:
+            if pin not in self._pins:
+                raise RuntimeError(f"Pin {pin} wurde nicht mit setup() als Ausgang konfiguriert.")
+            if self._pins[pin] != value:
+                self._pins[pin] = value
+                self._transitions.append((self.clock.monotonic(), pin, value))
+
+    def cleanup(self):
+        with self._lock:
+            for pin, value in self._pins.items():
+                if value != self.LOW:
+                    self._transitions.append((self.clock.monotonic(), pin, self.LOW))
+            self._pins.clear()
+
+    def monotonic(self):
+        return self.clock.monotonic()
+
+    # --- Auswertung ---
+    def get_pin_state(self, pin):
+        with self._lock:
+            return self._pins.get(pin)
+
+    def get_transitions(self):
+        """Liste aller Pin-Wechsel [(virtuelle Zeit, pin, pegel), ...]."""
+        with self._lock:
+            return list(self._transitions)
+
+    def get_on_durations(self):
+        """Summierte Einschaltdauer (virtuelle Sekunden) je Pin."""
+        durations = {}
+        switched_on = {}
+        for timestamp, pin, value in self.get_transitions():
+            if value == self.HIGH:
+                switched_on[pin] = timestamp
+            elif pin in switched_on:
+                durations[pin] = durations.get(pin, 0.0) + timestamp - switched_on.pop(pin)
+        return durations
+
+    def clear_transitions(self):
+        with self._lock:
+            self._transitions.clear()
+
+
+class GPIOBackendError(RuntimeError):
+    """Das ausdrücklich konfigurierte GPIO-Backend ist nicht verfügbar."""
+
+
+def create_backend(name=BACKEND_RPI, simulation_speed=DEFAULT_SIMULATION_SPEED):
+    """Erzeugt das konfigurierte Backend.
+
+    'rpi' ohne nutzbares RPi.GPIO löst GPIOBackendError aus: sonst würden Ausschänke
+    verbucht, ohne dass eine Pumpe läuft. Nur 'auto' weicht auf die Simulation aus.
+    """
+    name = (name or BACKEND_RPI).lower()
+    if name == BACKEND_SIMULATED:
+        logger.warning(f"GPIO-Simulation aktiv (Geschwindigkeit {simulation_speed}x). Es werden KEINE Pumpen geschaltet!")
+        return SimulatedGPIOBackend(simulation_speed)
+    if name not in (BACKEND_RPI, BACKEND_AUTO):
+        raise GPIOBackendError(f"Unbekanntes GPIO-Backend '{name}'.")
+    try:
+        return RPiGPIOBackend()
+    except (ImportError, RuntimeError) as e:
+        if name == BACKEND_RPI:
+            raise GPIOBackendError(f"RPi.GPIO nicht verfügbar: {e}") from e
+        logger.critical(f"RPi.GPIO nicht verfügbar ({e}). Weiche auf GPIO-Simulation (Echtzeit) aus - Pumpen laufen NICHT!")
+        return SimulatedGPIOBackend(speed=1.0)
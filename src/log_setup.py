@@ -0,0 +1,194 @@
+import os
+import re
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+import app_config
+
+# Zentrales Logging: Module holen sich nur noch logging.getLogger('Name'), Handler gibt es
+# ausschließlich hier. Aufrufer (UI-Thread, Pumpen-Timing) legen Einträge nur in eine
+# begrenzte Queue; Konsole und Logdatei schreibt ein eigener Listener-Thread.
+#
+# Rückkopplung: Kivy ersetzt sys.stderr durch einen Logger ('stderr: ...' als kivy-WARNING).
+# Ein Handler, der auf dieses sys.stderr schreibt, loggt jede Zeile erneut - das hat die
+# alten logs/app.log.* mit "kivy - WARNING - stderr: ... - kivy - WARNING - stderr: ..."
+# gefüllt. Deshalb schreibt die Konsole auf sys.__stderr__, und bereits formatierte
+# Logzeilen, die über stderr zurückkommen, werden verworfen und gezählt.
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LISTENER_THREAD_NAME = 'LogListener'
+
+# Eine schon formatierte Logzeile (eigenes Format oder Kivy-Format "[WARNING] [Base   ] ...")
+_LOG_LINE_PATTERN = re.compile(r' - [\w.]+ - (?:DEBUG|INFO|WARNING|ERROR|CRITICAL) - '
+                               r'|\[(?:TRACE|DEBUG|INFO|WARNING|ERROR|CRITICAL)\s*\] ')
+
+_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_stats = {'records': {}, 'dropped': 0, 'loop_suppressed': 0, 'errors': 0,
+          'bytes_written': 0, 'handler_seconds': 0.0, 'queue_high_water': 0}
+
+
+def _count(key, amount=1):
+    with _lock:
+        _stats[key] += amount
+
+
+class StderrLoopFilter(logging.Filter):
+    """Verwirft von Kivy aus stderr übernommene Einträge, die selbst schon Logzeilen sind."""
+
+    def filter(self, record):
+        if record.name.startswith('kivy') and isinstance(record.msg, str) and record.msg.startswith('stderr:'):
+            if _LOG_LINE_PATTERN.search(record.getMessage()):
+                _count('loop_suppressed')
+                return False
+        return True
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, der bei voller Queue verwirft (statt zu blockieren) und mitzählt."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._local = threading.local()
+
+    def emit(self, record):
+        if getattr(self._local, 'emitting', False):
+            _count('loop_suppressed') # Logging aus dem Logging heraus (z.B. über stderr)
+            return
+        self._local.emitting = True
+        try:
+            super().emit(record)
+        finally:
+            self._local.emitting = False
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _count('dropped')
+            return
+        with _lock:
+            records = _stats['records']
+            records[record.levelname] = records.get(record.levelname, 0) + 1
+            _stats['queue_high_water'] = max(_stats['queue_high_water'], self.queue.qsize())
+
+    def handleError(self, record):
+        _count('errors') # nie nach stderr ausweichen (Rückkopplung)
+
+
+class _MeteredMixin:
+    """Misst Zeit und geschriebene Bytes der Handler im Listener-Thread."""
+
+    def format(self, record):
+        message = super().format(record)
+        _count('bytes_written', len(message.encode('utf-8', 'replace')) + 1)
+        return message
+
+    def emit(self, record):
+        started = time.perf_counter()
+        super().emit(record)
+        _count('handler_seconds', time.perf_counter() - started)
+
+    def handleError(self, record):
+        _count('errors')
+
+
+class _ConsoleHandler(_MeteredMixin, logging.StreamHandler):
+    pass
+
+class _SizeRotatingFileHandler(_MeteredMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+class _TimeRotatingFileHandler(_MeteredMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+def _file_handler(config):
+    try:
+        os.makedirs(os.path.dirname(config.log_file), exist_ok=True)
+        if config.log_rotation == 'time':
+            return _TimeRotatingFileHandler(config.log_file, when=config.log_rotate_when,
+                                            backupCount=config.log_backup_count, encoding='utf-8', delay=True)
+        return _SizeRotatingFileHandler(config.log_file, maxBytes=config.log_max_bytes,
+                                        backupCount=config.log_backup_count, encoding='utf-8', delay=True)
+    except (OSError, ValueError) as e:
+        print(f"FEHLER: Logdatei {config.log_file} nicht nutzbar, nur Konsole: {e}", file=sys.__stderr__)
+        return None
+
+
+def setup_logging(config=None):
+    """Richtet das zentrale Logging ein (einmalig; weitere Aufrufe tun nichts).
+
+    Muss vor dem Import von Kivy laufen. config: AppConfig, sonst app_config.get_config().
+    Ohne gültige Konfiguration wird nur auf die Konsole geloggt (Level INFO).
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    # Kivy >= 2.2: keine eigenen Handler und kein Umleiten von stderr, Kivy loggt über root
+    os.environ.setdefault('KIVY_LOG_MODE', 'PYTHON')
+    if config is None:
+        config = app_config.get_config()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [_ConsoleHandler(sys.__stderr__)]
+    if config is not None:
+        file_handler = _file_handler(config)
+        if file_handler is not None:
+            handlers.append(file_handler)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    loop_filter = StderrLoopFilter()
+    _queue_handler = BoundedQueueHandler(queue.Queue(config.log_queue_size if config else 10000))
+    _queue_handler.addFilter(loop_filter)
+    logging.getLogger('kivy').addFilter(loop_filter) # auch Kivys eigene Handler (ältere Kivy-Versionen)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(config.log_level if config else logging.INFO)
+    for name, level in (config.log_levels if config else {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener._thread.name = LISTENER_THREAD_NAME
+    atexit.register(shutdown_logging)
+    if config is not None:
+        rotation = (f"{config.log_max_bytes} Bytes" if config.log_rotation == 'size'
+                    else f"'{config.log_rotate_when}'")
+        logging.getLogger('Logging').info(
+            f"Logging eingerichtet: {config.log_file} (Rotation {rotation}, {config.log_backup_count} Sicherungen), "
+            f"Level {config.log_level}, Queue {config.log_queue_size}.")
+
+
+def get_stats():
+    """Zähler des Loggings: Einträge je Level, verworfen (Queue voll), unterdrückte Schleifen,
+    Handler-Fehler, geschriebene Bytes, Zeit in den Handlern (s) und höchster Queue-Füllstand."""
+    with _lock:
+        stats = dict(_stats)
+        stats['records'] = dict(_stats['records'])
+    stats['queue_size'] = _queue_handler.queue.qsize() if _queue_handler is not None else 0
+    return stats
+
+def shutdown_logging():
+    """Schreibt die restlichen Einträge und beendet den Listener-Thread (auch per atexit)."""
+    global _listener
+    if _listener is None:
+        return
+    stats = get_stats()
+    logging.getLogger('Logging').info(
+        f"Logging beendet: {sum(stats['records'].values())} Einträge, {stats['dropped']} verworfen, "
+        f"{stats['loop_suppressed']} Schleifen unterdrückt, {stats['errors']} Fehler, "
+        f"{stats['bytes_written']} Bytes in {stats['handler_seconds']:.2f}s.")
+    listener, _listener = _listener, None
+    listener.stop()
+    logging.getLogger().removeHandler(_queue_handler) # danach nur noch Pythons Notfall-Ausgabe
+    for handler in listener.handlers:
+        handler.close()
@@ -1,30 +1,44 @@
 # -*- coding: utf-8 -*-
+# Startzeit vor allen anderen Imports (für den Startbericht)
+import time
+_PROCESS_START = time.perf_counter()
+
+# Zentrales Logging vor Kivy einrichten (Queue + Listener-Thread, Schutz vor stderr-Schleifen)
+import log_setup
+log_setup.setup_logging()
+
 # Kivy Imports
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen, SlideTransition
 from kivy.lang import Builder
 from kivy.clock import Clock
-from kivy.uix.button import Button
+from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.spinner import Spinner
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.properties import NumericProperty, StringProperty, BooleanProperty, ListProperty, DictProperty
 from kivy.metrics import dp
 
 # Standard Python Imports
-import yaml
 import os
 import sys
 import atexit
 import traceback
-import time
+import datetime
 
 # Project Module Imports
 try:
     # Ebene 0
+    import app_config
     import database_manager as db
     import pump_controller as pc
     import core_logic as core
+    import thumbnail_cache
+    import pour_jobs
+    import startup
+    import menu_snapshot
+    # pour_archive wird erst im Hintergrund-Start importiert
     print("INFO: Eigene Module (db, pc, core) erfolgreich importiert.")
 # Error handling for module imports
 except ImportError as e:
@@ -33,202 +47,355 @@ except ImportError as e:
     print("Stelle sicher, dass alle .py Dateien im 'src' Ordner sind und keine Syntaxfehler enthalten.")
     sys.exit(1) # Exit if essential modules are missing
 
-# --- No central logging setup here for now ---
-# Using basic print for feedback during debugging
+# Logging: siehe log_setup (in config.yaml unter 'logging' einstellbar)
 print("INFO: Cocktail App startet...")
+startup.begin(_PROCESS_START)
+startup.report.mark('Imports')
 
 
 # --- Screen Class Definitions ---
 
+# Katalogbereiche, deren Änderung einen Neuaufbau des Menüs erfordert; Belegung und
+# Restmengen kommen als Diff vom AvailabilityTracker
+MENU_CATALOG_SECTIONS = ('ingredients', 'recipes', 'recipe_ingredients')
+
+class CocktailRow(RecycleDataViewBehavior, BoxLayout): # Ebene 0
+    """Wiederverwendete Zeile des Cocktail-Menüs (Vorschaubild + Button), befüllt aus einem Daten-Dict."""
+    recipe_id = NumericProperty(-1)
+    recipe_name = StringProperty("")
+    thumbnail = StringProperty("", allownone=True)
+    pourable = BooleanProperty(True)
+
+    def refresh_view_attrs(self, rv, index, data):
+        # Code: Ebene 2 (8 spaces)
+        super().refresh_view_attrs(rv, index, data)
+        # Vorschaubild: nur fertige Thumbnails aus dem Textur-Cache, nie das Originalbild im UI-Thread dekodieren
+        image = self.ids.get('thumbnail')
+        if image is None: return
+        screen = App.get_running_app().root.get_screen('main')
+        texture = screen.texture_cache.get(data.get('thumbnail')) if screen.texture_cache and data.get('thumbnail') else None
+        image.texture = texture
+        image.opacity = 1 if texture is not None else 0
+
+
 class MainScreen(Screen): # Ebene 0
     """
     Hauptbildschirm: Zeigt verfügbare Cocktails an.
     """
+    is_pouring = BooleanProperty(False)
+    status_text = StringProperty("")
+    pour_job = None # JobHandle des laufenden Ausschanks
+    texture_cache = None # LRU-Cache für Vorschaubild-Texturen (wird beim ersten Populate angelegt)
+    _tracking = False      # Listener beim AvailabilityTracker angemeldet?
+    _menu_executor = None  # eigener Worker, damit das Menü nicht hinter einem Ausschank wartet
+    _menu_job = None
+    _current_menu_token = None # Versions-Token der angezeigten Menüdaten
+    _snapshot = None           # beim Start angezeigter, noch nicht geprüfter Menü-Snapshot
+    _snapshot_revision = None  # Katalog-Revision des zuletzt geschriebenen Snapshots
+    _menu_shown = False        # für den Startbericht
+    _menu_rebuild_version = 0  # Tracker-Version eines vollen Diffs, den erst der Worker übernimmt
+
     # Methode: Ebene 1 (4 spaces)
     def on_enter(self, *args):
         """Called when the screen becomes visible."""
         # Code: Ebene 2 (8 spaces)
-        print("INFO: MainScreen betreten. Plane Populate...")
+        print("INFO: MainScreen betreten. Prüfe Menü...")
         # Schedule the population slightly delayed to ensure KV rules are applied
         Clock.schedule_once(self.populate_cocktails, 0)
         return super().on_enter(*args)
 
     # Methode: Ebene 1 (4 spaces)
     def populate_cocktails(self, dt):
-        """Fetches available cocktails and creates buttons for them."""
-        # Code: Ebene 2 (8 spaces)
-        print(f"INFO: populate_cocktails (nach {dt:.4f}s Verzögerung) wird ausgeführt.")
-        cocktail_list_widget = self.ids.get('cocktail_list_grid')
-        if not cocktail_list_widget:
-            print("FEHLER: GridLayout 'cocktail_list_grid' nicht im KV gefunden!")
+        """Aktualisiert das Cocktail-Menü im Hintergrund; neu aufgebaut wird nur bei geändertem Katalog.
+
+        Der Worker gleicht die Verfügbarkeit ab (Änderungen kommen als Diff über den Listener)
+        und baut die Menüdaten nur neu, wenn sich das Versions-Token (Rezepte/Zutaten, Glasgröße)
+        geändert hat. Die fertige Liste wird im UI-Thread mit einer Zuweisung getauscht.
+        """
+        # Code: Ebene 2 (8 spaces)
+        if self.texture_cache is None:
+            self.texture_cache = thumbnail_cache.TextureCache()
+        if not self._tracking:
+            core.get_availability_tracker().add_listener(self._on_availability_diff)
+            self._tracking = True
+        if self._menu_job is not None and not self._menu_job.done():
+            return # Aktualisierung läuft bereits
+        if self._menu_executor is None:
+            self._menu_executor = pour_jobs.PourJobExecutor(thread_name='MenuWorker')
+        # Widget-Zustand hier im UI-Thread lesen und dem Worker übergeben
+        snapshot, self._snapshot = self._snapshot, None
+        current_token = self._current_menu_token
+        self._menu_job = self._menu_executor.submit("Menü aktualisieren",
+                                                    lambda job: self._build_menu(job, snapshot, current_token),
+                                                    on_complete=self._on_menu_built, on_error=self._on_menu_error)
+
+    def show_snapshot(self, snapshot):
+        """Zeigt den gespeicherten Menü-Snapshot sofort an (noch ohne Datenbank); geprüft wird im Worker."""
+        cocktail_list = self.ids.get('cocktail_list')
+        if not cocktail_list: return
+        if self.texture_cache is None:
+            self.texture_cache = thumbnail_cache.TextureCache()
+        cocktail_list.data = snapshot['entries']
+        self._snapshot = snapshot
+        self._snapshot_revision = snapshot['catalog_revision'] # liegt schon so auf der Karte
+        self._menu_shown = True
+        startup.report.mark('Menü sichtbar')
+        print(f"INFO: Menü aus Snapshot angezeigt ({len(snapshot['entries'])} Cocktails).")
+
+    def _menu_token(self, target_volume_ml):
+        return (db.get_catalog_version(*MENU_CATALOG_SECTIONS), target_volume_ml)
+
+    def _build_menu(self, job, snapshot, current_token):
+        """Läuft im Worker-Thread; liest keinen Widget-Zustand.
+
+        snapshot: noch ungeprüfter Menü-Snapshot oder None, current_token: Token der angezeigten Daten.
+        Rückgabe: (token, Menüdaten oder None = beibehalten, Katalog-Revision, Tracker-Version).
+        """
+        started = time.perf_counter()
+        startup.wait_ready(startup.STAGE_DATABASE) # Schema-Prüfung läuft beim Start im Hintergrund
+        _, target_volume_ml = self.current_glass()
+        revision = db.get_catalog_revision() # vor dem Aufbau lesen: eine spätere Änderung macht den Snapshot ungültig
+        tracker = core.get_availability_tracker()
+        tracker.refresh(target_volume_ml)
+        availability_version = tracker.version
+        token = self._menu_token(target_volume_ml)
+        if snapshot is not None and menu_snapshot.is_current(snapshot, target_volume_ml, revision):
+            # Angezeigter Snapshot passt zur DB; nur die Verfügbarkeit kann veraltet sein
+            plans = core.import_pour_plans(snapshot['plans'])
+            print(f"INFO: Menü-Snapshot ist aktuell (Revision {revision}), {plans} Pläne übernommen.")
+            states = tracker.states
+            data = [dict(entry, pourable=bool(states.get(entry['recipe_id'], False))) for entry in snapshot['entries']]
+            if all(entry['pourable'] == old['pourable'] for entry, old in zip(data, snapshot['entries'])):
+                data = None
+            return token, data, revision, availability_version
+        if token == current_token:
+            return token, None, revision, availability_version
+        data = [self._menu_entry(recipe_id, recipe_name, pourable)
+                for recipe_id, recipe_name, pourable in tracker.menu()] # nach Namen sortiert
+        print(f"INFO: Menüdaten für {len(data)} Cocktails in {(time.perf_counter() - started) * 1000:.1f}ms berechnet.")
+        return token, data, revision, availability_version
+
+    def _on_menu_built(self, job, result):
+        token, data, revision, availability_version = result
+        cocktail_list = self.ids.get('cocktail_list')
+        if not cocktail_list:
+            print("FEHLER: RecycleView 'cocktail_list' nicht im KV gefunden!")
             return
-
-        cocktail_list_widget.clear_widgets() # Remove old buttons
-        available_recipes = core.get_available_recipes() # Get available recipes from core logic
-
-        if not available_recipes:
-            print("INFO: Keine verfügbaren Cocktails gefunden.")
-            # Optionally add a label indicating no cocktails are available
-            cocktail_list_widget.height = dp(50) # Set minimum height
+        if data is not None:
+            cocktail_list.data = data # Tausch in einem Schritt
+            if not self._menu_shown:
+                self._menu_shown = True
+                startup.report.mark('Menü sichtbar')
+            print(f"INFO: {len(data)} Cocktails im Menü.")
+        self._current_menu_token = token
+        if revision is not None and revision != self._snapshot_revision:
+            # Katalog seit dem letzten Snapshot geändert (z.B. im Techniker-Menü): neu schreiben
+            self._snapshot_revision = revision
+            entries = [dict(entry) for entry in cocktail_list.data]
+            self._menu_executor.submit("Menü-Snapshot", lambda job: menu_snapshot.write_snapshot(
+                entries, token[1], revision, core.export_pour_plans()))
+        if self._menu_rebuild_version > availability_version:
+            self.populate_cocktails(0) # voller Diff kam nach dem Aufbau an
+
+    def write_snapshot(self):
+        """Schreibt den aktuellen Menüstand als Snapshot (beim Beenden), sofern er zum Katalog passt."""
+        cocktail_list = self.ids.get('cocktail_list')
+        if not cocktail_list or self._current_menu_token is None:
+            return False
+        target_volume_ml = self._current_menu_token[1]
+        if self._menu_token(target_volume_ml) != self._current_menu_token:
+            return False # Rezepte/Zutaten geändert, Menü noch nicht neu aufgebaut
+        return menu_snapshot.write_snapshot([dict(entry) for entry in cocktail_list.data], target_volume_ml,
+                                            db.get_catalog_revision(), core.export_pour_plans())
+
+    def _on_menu_error(self, job, error):
+        print(f"FEHLER: Menü konnte nicht aufgebaut werden: {error}")
+
+    def _menu_entry(self, recipe_id, recipe_name, pourable):
+        """Daten-Dict einer Menüzeile (Schlüssel = Properties von CocktailRow)."""
+        thumbnail_path = thumbnail_cache.get_thumbnail_path(recipe_id, callback=self._on_thumbnail_ready)
+        return {'recipe_id': recipe_id, 'recipe_name': recipe_name, 'thumbnail': thumbnail_path or '', 'pourable': bool(pourable)}
+
+    def _on_availability_diff(self, diff):
+        """Listener des AvailabilityTracker (beliebiger Thread); Änderungen im UI-Thread übernehmen."""
+        Clock.schedule_once(lambda dt: self.apply_availability_diff(diff), 0)
+
+    def apply_availability_diff(self, diff):
+        """Übernimmt nur die geänderten Einträge in die Menüdaten, statt sie neu aufzubauen.
+
+        Volle Diffs (neuer Katalog oder neue Glasgröße) ändern auch das Menü-Token; die Liste
+        baut dann allein der Worker neu (_on_menu_built), nicht der UI-Thread.
+        """
+        if diff.full:
+            self._menu_rebuild_version = max(self._menu_rebuild_version, diff.version)
+            if self._menu_job is None or self._menu_job.done():
+                self.populate_cocktails(0)
             return
-
-        print(f"INFO: Füge {len(available_recipes)} Cocktails zur Liste hinzu...")
-        button_height = dp(60) # Height for each button
-
-        # Schleife: Ebene 2 (8 spaces)
-        for recipe in available_recipes:
-            # Code in Schleife: Ebene 3 (12 spaces)
-            recipe_id, recipe_name, _, _, _ = recipe # Unpack recipe data
-            # Create a button for each cocktail
-            btn = Button(text=recipe_name,
-                         size_hint_y=None,
-                         height=button_height,
-                         font_size='20sp')
-            btn.recipe_id = recipe_id # Store recipe ID in the button instance
-            btn.bind(on_press=self.cocktail_selected) # Bind the on_press event
-            cocktail_list_widget.add_widget(btn)
-
-        # Code nach Schleife: Ebene 2 (8 spaces)
-        # Update GridLayout height based on content
-        spacing_y = cocktail_list_widget.spacing[1] if isinstance(cocktail_list_widget.spacing, (list, tuple)) else cocktail_list_widget.spacing
-        cocktail_list_widget.height = len(available_recipes) * (button_height + spacing_y) - spacing_y if len(available_recipes) > 0 else 0
+        cocktail_list = self.ids.get('cocktail_list')
+        if not cocktail_list or not cocktail_list.data and not diff.added:
+            return
+        states = core.get_availability_tracker().states
+        data = [entry for entry in cocktail_list.data if entry['recipe_id'] not in diff.removed]
+        for entry in data:
+            if entry['recipe_id'] in diff.changed or entry['recipe_id'] in diff.added:
+                entry['pourable'] = bool(states.get(entry['recipe_id'], False))
+        if diff.added:
+            # Neue Einträge an der alphabetisch richtigen Stelle einfügen
+            present = {entry['recipe_id'] for entry in data}
+            entries = {entry['recipe_id']: entry for entry in data}
+            data = [entries[recipe_id] if recipe_id in present else self._menu_entry(recipe_id, recipe_name, pourable)
+                    for recipe_id, recipe_name, pourable in core.get_availability_tracker().menu()
+                    if recipe_id in present or recipe_id in diff.added]
+        cocktail_list.data = data
+        print(f"INFO: Menü aktualisiert: +{len(diff.added)} -{len(diff.removed)} ~{len(diff.changed)} Cocktails.")
+
+    def current_glass(self):
+        """(Name der gewählten Glasgröße, Zielvolumen in ml) aus Einstellung und config.yaml."""
+        selected_size_name = db.get_setting('SelectedGlassSize', default='Medium')
+        target_volume_ml = 200.0 # Default fallback volume
+        config = app_config.get_config()
+        if config is not None:
+            target_volume_ml = config.glass_volume(selected_size_name, target_volume_ml)
+        return selected_size_name, target_volume_ml
+
+    def refresh_availability(self):
+        """Gleicht das Menü mit Pumpen und Restmengen ab; Änderungen kommen als Diff über den Listener."""
+        _, target_volume_ml = self.current_glass()
+        core.get_availability_tracker().refresh(target_volume_ml)
+
+    def _on_thumbnail_ready(self, recipe_id, thumbnail_path):
+        """Wird vom Thumbnail-Worker aufgerufen; Anzeige im UI-Thread nachholen."""
+        if thumbnail_path:
+            Clock.schedule_once(lambda dt: self._show_thumbnail(recipe_id, thumbnail_path), 0)
+
+    def _show_thumbnail(self, recipe_id, thumbnail_path):
+        cocktail_list = self.ids.get('cocktail_list')
+        if not cocktail_list: return
+        for entry in cocktail_list.data:
+            if entry['recipe_id'] == recipe_id:
+                entry['thumbnail'] = thumbnail_path
+                cocktail_list.refresh_from_data() # nur die sichtbaren Zeilen werden neu befüllt
+                return
+        # Eintrag nicht (mehr) im Menü: nichts zu tun
 
     # Methode: Ebene 1 (4 spaces)
     def cocktail_selected(self, instance):
         """Called when a cocktail button is pressed."""
         # Code: Ebene 2 (8 spaces)
         recipe_id = instance.recipe_id
-        recipe_name = instance.text
+        recipe_name = instance.recipe_name
+        if self.is_pouring:
+            print(f"INFO: Es wird bereits gemixt, '{recipe_name}' ignoriert.")
+            return
+        if not (startup.is_ready(startup.STAGE_DATABASE) and startup.is_ready(startup.STAGE_GPIO)):
+            print(f"INFO: Start noch nicht abgeschlossen, '{recipe_name}' ignoriert.")
+            self.status_text = "Maschine startet noch..."
+            return
+        if not pc.pumps_ready():
+            print(f"FEHLER: GPIO nicht eingerichtet, '{recipe_name}' wird nicht ausgeschenkt.")
+            self.status_text = "Pumpensteuerung nicht verfügbar."
+            return
         print(f"INFO: Cocktail '{recipe_name}' (ID: {recipe_id}) ausgewählt!")
 
-        # 1. Get current glass size setting from DB
-        selected_size_name = db.get_setting('SelectedGlassSize', default='Medium')
-        print(f"INFO: Aktuell gewählte Glasgröße: '{selected_size_name}'")
-
-        # 2. Determine target volume from config file
-        target_volume_ml = 200.0 # Default fallback volume
-        # try Block: Ebene 2 (8 spaces) - Corrected indentation
-        try:
-            # Code im try: Ebene 3 (12 spaces)
-            # Construct path relative to this script (main.py in src/)
-            script_dir = os.path.dirname(__file__)
-            config_path = os.path.join(script_dir, '..', 'config', 'config.yaml')
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-            if 'glass_sizes' in config and isinstance(config['glass_sizes'], dict):
-                glass_sizes = config['glass_sizes']
-                # Convert volume to float, use default if size name not found or invalid
-                target_volume_ml = float(glass_sizes.get(selected_size_name, 200.0))
-            print(f"INFO: Zielvolumen für '{selected_size_name}': {target_volume_ml}ml")
-        except Exception as e: # except Block: Ebene 2 (8 spaces)
-             # Code im except: Ebene 3 (12 spaces)
-             print(f"FEHLER Config laden: {e}")
-             # target_volume_ml keeps the default value from above
+        # 1./2. Glasgröße aus der DB, Zielvolumen aus der Config (gecacht, kein Dateizugriff beim Ausschank)
+        selected_size_name, target_volume_ml = self.current_glass()
+        print(f"INFO: Zielvolumen für '{selected_size_name}': {target_volume_ml}ml")
 
         # Code: Ebene 2 (8 spaces)
-        # 3. Scale recipe ingredients
-        scaled_ingredients = []
-        if target_volume_ml > 0:
-            # Code im if: Ebene 3 (12 spaces)
-            print(f"INFO: Berechne skalierte Mengen für {target_volume_ml}ml...")
-            scaled_ingredients = core.scale_recipe(recipe_id, target_volume_ml)
-            if scaled_ingredients:
-                # Code im if: Ebene 4 (16 spaces)
-                print(f"--- Benötigte Zutaten für {recipe_name} ({selected_size_name} / {target_volume_ml}ml) ---")
-                # List comprehension for printing scaled ingredients
-                [print(f"  - {ing_name}: {amount:.1f} {unit} (ID: {ing_id})") for ing_id, ing_name, amount, unit in scaled_ingredients]
-                print("---------------------------------------------------------------")
-            else: # else: Ebene 3 (12 spaces)
-                 # Code im else: Ebene 4 (16 spaces)
-                 print(f"FEHLER: Skalierung fehlgeschlagen.")
-        else: # else: Ebene 2 (8 spaces)
-             # Code im else: Ebene 3 (12 spaces)
-             print(f"FEHLER: Kein gültiges Zielvolumen.");
+        # 3. Ausgabeplan (skalierte Mengen, Pumpen, Laufzeiten) - meist schon im Plan-Cache
+        if target_volume_ml <= 0:
+            print(f"FEHLER: Kein gültiges Zielvolumen.")
+            return
+        plan = core.get_pour_plan(recipe_id, target_volume_ml)
+        if plan is None:
+            print(f"FEHLER: Skalierung fehlgeschlagen.")
+            self.status_text = f"Fehler: {recipe_name} kann nicht skaliert werden."
+            return
+        print(f"--- Ausgabeplan für {recipe_name} ({selected_size_name} / {target_volume_ml}ml) ---")
+        [print(f"  - {ing_name}: {ml:.1f} ml über Pumpe {p_idx} ({seconds:.2f}s)") for _, ing_name, p_idx, ml, seconds in plan.steps]
+        print("---------------------------------------------------------------")
 
         # Code: Ebene 2 (8 spaces)
         # 4. Check ingredient availability (volume)
-        if scaled_ingredients:
+        is_available, details = core.check_plan_availability(plan)
+        if not is_available:
             # Code im if: Ebene 3 (12 spaces)
-            print("INFO: Prüfe Verfügbarkeit der Zutaten...")
-            is_available, details = core.check_ingredient_availability(scaled_ingredients)
-
-            if is_available:
-                # Code im if: Ebene 4 (16 spaces)
-                print(f"INFO: {details['message']}")
-                print("INFO: Starte Mixvorgang...")
-                mix_success = True # Flag to track success
-                pump_map = details['pump_map'] # Get mapping {ing_id: pump_index}
-                dispensed_amounts = {} # Track dispensed amounts {pump_index: dispensed_ml}
-
-                # --- Actual Dispensing Loop ---
-                # TODO: Run this loop in a separate thread to avoid blocking UI!
-                # Schleife: Ebene 4 (16 spaces)
-                for ing_id, ing_name, scaled_amount, unit in scaled_ingredients:
-                    # Code in Schleife: Ebene 5 (20 spaces)
-                    pump_idx_to_use = pump_map.get(ing_id)
-                    if pump_idx_to_use is not None:
-                        # Code im if: Ebene 6 (24 spaces)
-                        print(f"    -> Gebe {scaled_amount:.1f}ml von '{ing_name}' über Pumpe {pump_idx_to_use} aus...")
-                        # Call pump controller to dispense the calculated amount
-                        dispense_success = pc.dispense_ml(pump_idx_to_use, scaled_amount)
-                        if not dispense_success:
-                            print(f"FEHLER: Abgabe von '{ing_name}' fehlgeschlagen!")
-                            mix_success = False
-                            break # Abort mixing on error
-                        else:
-                            # Record amount dispensed for this pump
-                            dispensed_amounts[pump_idx_to_use] = dispensed_amounts.get(pump_idx_to_use, 0) + scaled_amount
-                    else: # else: Ebene 5 (20 spaces)
-                         # This case should ideally not happen if check_availability passed
-                         # Code im else: Ebene 6 (24 spaces)
-                         print(f"FEHLER: Keine Pumpe für Zutat {ing_name} gefunden obwohl verfügbar?");
-                         mix_success = False
-                         break
-                # Code nach Schleife: Ebene 4 (16 spaces)
-                # --- After Mixing ---
-                if mix_success:
-                    # Code im if: Ebene 5 (20 spaces)
-                    print("INFO: Mixvorgang erfolgreich. Aktualisiere DB...")
-                    volume_update_success = True
-                    # Schleife: Ebene 5 (20 spaces)
-                    # Update database volume for each used pump
-                    for pump_idx, dispensed_ml in dispensed_amounts.items():
-                        # Code in Schleife: Ebene 6 (24 spaces)
-                        pump_info_before = db.get_pump_info(pump_idx)
-                        if pump_info_before:
-                            # Code im if: Ebene 7 (28 spaces)
-                            old_volume = pump_info_before[3] if pump_info_before[3] is not None else 0.0
-                            new_volume = old_volume - dispensed_ml
-                            print(f"    -> Pumpe {pump_idx}: Alt={old_volume:.1f}ml, Abgegeben={dispensed_ml:.1f}ml, Neu={new_volume:.1f}ml")
-                            if not db.update_pump_volume(pump_idx, new_volume):
-                                print(f"FEHLER: Volumen Update Pumpe {pump_idx}!");
-                                volume_update_success = False # Mark failure but continue trying others
-                        else: # else: Ebene 6 (24 spaces)
-                             # Code im else: Ebene 7 (28 spaces)
-                             print(f"FEHLER: Konnte alte Volumeninfo Pumpe {pump_idx} nicht laden.");
-                             volume_update_success = False
-                    # Code nach Schleife: Ebene 5 (20 spaces)
-                    if not volume_update_success:
-                        print("WARNUNG: Fehler beim Aktualisieren einiger Restmengen.")
-
-                    # Add entry to pour log
-                    log_id = db.add_pour_log_entry(recipe_id, target_volume_ml)
-                    if log_id:
-                        print(f"INFO: Cocktail im Logbuch (ID: {log_id}).")
-                    else:
-                        print("FEHLER: Konnte nicht ins Logbuch schreiben.")
-                else: # else: Ebene 4 (16 spaces)
-                    # Code im else: Ebene 5 (20 spaces)
-                    print("FEHLER: Mixvorgang abgebrochen.")
-            else: # else: Ebene 3 (12 spaces)
-                 # Code im else: Ebene 4 (16 spaces)
-                 print(f"FEHLER: {details['message']} -> Mixen nicht möglich.")
-        else: # else: Ebene 2 (8 spaces)
-             # Code im else: Ebene 3 (12 spaces)
-             print("INFO: Mixen übersprungen.");
+            print(f"FEHLER: {details['message']} -> Mixen nicht möglich.")
+            self.status_text = "Nicht genug Zutaten vorhanden."
+            return
+
+        # Mixvorgang im Hintergrund, damit die Oberfläche bedienbar bleibt
+        print("INFO: Starte Mixvorgang...")
+        dispense_plan = plan.pump_ml # {pump_index: ml}
+        durations = plan.durations   # {pump_index: s}
+        self.is_pouring = True
+        self.status_text = f"{recipe_name} wird gemixt..."
+        self.pour_job = pour_jobs.get_executor().submit(
+            f"Ausschank {recipe_name}",
+            lambda job: self._run_pour(job, recipe_id, recipe_name, target_volume_ml, dispense_plan, durations),
+            on_progress=self._on_pour_progress,
+            on_complete=self._on_pour_complete,
+            on_error=self._on_pour_error)
+
+    def _run_pour(self, job, recipe_id, recipe_name, target_volume_ml, dispense_plan, durations=None):
+        """Läuft im Hintergrund-Thread: Pumpen steuern und Ausschank in der DB verbuchen."""
+        run = pc.start_parallel(dispense_plan, durations)
+        if run is None:
+            raise RuntimeError("Ausgabeplan ungültig, keine Pumpe gestartet.")
+        job.add_cancel_hook(run.cancel)
+        job.report_progress(f"{recipe_name} wird gemixt...")
+        actual_durations = run.wait()
+
+        # Tatsächlich geflossene Menge aus Laufzeit und Kalibrierung
+        dispensed_amounts = {} # {pump_index: dispensed_ml}
+        for pump_idx, run_seconds in actual_durations.items():
+            pump_info = db.get_pump_info(pump_idx)
+            rate = pump_info[4] if pump_info and pump_info[4] else 0.0
+            dispensed_amounts[pump_idx] = run_seconds * rate if rate > 0 else dispense_plan[pump_idx]
+            print(f"    -> Pumpe {pump_idx}: {run_seconds:.2f}s gelaufen, ca. {dispensed_amounts[pump_idx]:.1f}ml (Plan: {dispense_plan[pump_idx]:.1f}ml)")
+
+        print("INFO: Mixvorgang beendet. Aktualisiere DB...")
+        # Restmengen und Logbuch in einer Transaktion; abgebrochene Drinks nicht ins Logbuch,
+        # die Restmengen werden aber trotzdem verbucht
+        result = db.commit_pour(recipe_id, target_volume_ml, dispensed_amounts, log_entry=not job.cancelled)
+        if result is None:
+            print("FEHLER: Konnte Ausschank nicht in der DB verbuchen.")
+        else:
+            log_id, new_volumes = result
+            for pump_idx, new_volume in new_volumes.items():
+                print(f"    -> Pumpe {pump_idx}: Abgegeben={dispensed_amounts[pump_idx]:.1f}ml, Neu={new_volume:.1f}ml")
+            if log_id:
+                print(f"INFO: Cocktail im Logbuch (ID: {log_id}).")
+        if job.cancelled:
+            return {'recipe_name': recipe_name, 'cancelled': True}
+        return {'recipe_name': recipe_name, 'cancelled': False}
+
+    def _on_pour_progress(self, job, message):
+        self.status_text = message
+
+    def _on_pour_complete(self, job, result):
+        self.is_pouring = False
+        self.pour_job = None
+        self.refresh_availability() # Restmengen haben sich geändert
+        if result is None:
+            self.status_text = "Mixvorgang abgebrochen."
+        elif result['cancelled']:
+            print("FEHLER: Mixvorgang abgebrochen.")
+            self.status_text = f"{result['recipe_name']} abgebrochen."
+        else:
+            print("INFO: Mixvorgang erfolgreich.")
+            self.status_text = f"{result['recipe_name']} ist fertig. Prost!"
+
+    def _on_pour_error(self, job, error):
+        self.is_pouring = False
+        self.pour_job = None
+        print(f"FEHLER: Mixvorgang fehlgeschlagen: {error}")
+        self.status_text = f"Fehler beim Mixen: {error}"
 
 
 class ServiceMenuScreen(Screen): # Ebene 0
+    status_text = StringProperty("")
+
     # Methoden: Ebene 1 (4 spaces)
     def on_enter(self, *args):
         # Code: Ebene 2 (8 spaces)
@@ -287,6 +454,8 @@ class PumpAssignmentScreen(Screen): # Ebene 0
         # if Block: Ebene 2 (8 spaces)
         if db.assign_ingredient_to_pump(pump_index, selected_ingredient_id):
             print(f"INFO: Zuweisung Pumpe {pump_index} gespeichert.")
+            # Nur Rezepte mit alter oder neuer Zutat neu bewerten; das Menü bekommt den Diff
+            core.get_availability_tracker().refresh()
         else:
             print(f"FEHLER: Zuweisung Pumpe {pump_index} nicht gespeichert!")
 
@@ -350,9 +519,28 @@ class CalibrationScreen(Screen): # Ebene 0
 
     def _run_pump(self, dt):
         # Code: Ebene 2 (8 spaces)
-        duration = 10.0; print(f"INFO: Starte Kalibrierlauf Pumpe {self.selected_pump_index} für {duration}s"); pc.dispense_duration(self.selected_pump_index, duration); print(f"INFO: Kalibrierlauf Pumpe {self.selected_pump_index} beendet.")
+        duration = 10.0; pump_index = self.selected_pump_index
+        pour_jobs.get_executor().submit(f"Kalibrierung Pumpe {pump_index}",
+                                        lambda job: self._calibration_job(job, pump_index, duration),
+                                        on_complete=self._on_calibration_done, on_error=self._on_calibration_error)
+
+    def _calibration_job(self, job, pump_index, duration):
+        """Läuft im Hintergrund-Thread."""
+        print(f"INFO: Starte Kalibrierlauf Pumpe {pump_index} für {duration}s")
+        run = pc.start_duration(pump_index, duration)
+        if run is None:
+            raise RuntimeError(f"Pumpe {pump_index + 1} konnte nicht gestartet werden.")
+        job.add_cancel_hook(run.cancel)
+        actual = run.wait()[pump_index]
+        print(f"INFO: Kalibrierlauf Pumpe {pump_index} beendet ({actual:.2f}s).")
+        return actual
+
+    def _on_calibration_done(self, job, actual_duration):
         self.is_running = False; self.ids.start_calibration_button.disabled = False; self.ids.calibration_pump_spinner.disabled = False; self.ids.measured_volume_input.disabled = False; self.ids.save_calibration_button.disabled = False; self.status_text = f"Lauf beendet. Menge (ml) eingeben & speichern."
 
+    def _on_calibration_error(self, job, error):
+        self.is_running = False; self.ids.start_calibration_button.disabled = False; self.ids.calibration_pump_spinner.disabled = False; self.status_text = f"Fehler: {error}"
+
     def save_calibration(self):
         # Code: Ebene 2 (8 spaces)
         if self.selected_pump_index == -1: self.status_text = "Fehler: Keine Pumpe ausgewählt."; return;
@@ -404,23 +592,43 @@ class CleaningScreen(Screen): # Ebene 0
         self.is_running = True
         self.ids.start_cleaning_button.disabled = True
         self.status_text = f"Reinigung läuft (ca. {pc.PUMP_COUNT * duration_per_pump:.0f}s)..."
-        Clock.schedule_once(lambda dt: self._run_cleaning(duration_per_pump), 0.1)
+        pour_jobs.get_executor().submit("Reinigung",
+                                        lambda job: self._run_cleaning(job, duration_per_pump),
+                                        on_progress=self._on_cleaning_progress,
+                                        on_complete=self._on_cleaning_done,
+                                        on_error=self._on_cleaning_error)
 
-    def _run_cleaning(self, duration_per_pump):
+    def _run_cleaning(self, job, duration_per_pump):
+        """Läuft im Hintergrund-Thread; Statusmeldungen gehen über report_progress an die UI."""
         # Code: Ebene 2 (8 spaces)
         print(f"INFO: Starte Reinigungszyklus ({duration_per_pump}s pro Pumpe)...")
         # Schleife: Ebene 2 (8 spaces)
         for i in range(pc.PUMP_COUNT):
             # Code in Schleife: Ebene 3 (12 spaces)
-            self.status_text = f"Reinige Pumpe {i+1}/{pc.PUMP_COUNT}..."
+            if job.cancelled: break
+            job.report_progress(f"Reinige Pumpe {i+1}/{pc.PUMP_COUNT}...")
             print(f"INFO: Reinige Pumpe {i}...")
-            pc.dispense_duration(i, duration_per_pump)
+            run = pc.start_duration(i, duration_per_pump)
+            if run is None: continue
+            job.add_cancel_hook(run.cancel)
+            run.wait()
             print(f"INFO: Pumpe {i} fertig.")
         # Code nach Schleife: Ebene 2 (8 spaces)
+        print("INFO: Reinigungszyklus beendet.")
+        return not job.cancelled
+
+    def _on_cleaning_progress(self, job, message):
+        self.status_text = message
+
+    def _on_cleaning_done(self, job, completed):
         self.is_running = False
         self.ids.start_cleaning_button.disabled = False
-        self.status_text = "Reinigungszyklus abgeschlossen."
-        print("INFO: Reinigungszyklus beendet.")
+        self.status_text = "Reinigungszyklus abgeschlossen." if completed else "Reinigung abgebrochen."
+
+    def _on_cleaning_error(self, job, error):
+        self.is_running = False
+        self.ids.start_cleaning_button.disabled = False
+        self.status_text = f"Fehler bei der Reinigung: {error}"
 
 
 class PinEntryScreen(Screen): # Ebene 0
@@ -466,7 +674,34 @@ class PinEntryScreen(Screen): # Ebene 0
 
 
 class TechnicianMenuScreen(Screen): # Ebene 0
-    pass # Ebene 1
+    status_text = StringProperty("") # Ebene 1
+
+
+class StatisticsScreen(Screen): # Ebene 0
+    """Ausschank-Statistik aus den Rollup-Tabellen (Aufwand je Tag, nicht je Ausschank)."""
+    PERIODS = {'Heute': 0, '7 Tage': 6, '30 Tage': 29, 'Gesamt': None} # Tage vor heute
+    period_options = ListProperty(list(PERIODS))
+    recipe_stats_text = StringProperty("")
+    ingredient_stats_text = StringProperty("")
+    status_text = StringProperty("")
+
+    def on_enter(self, *args):
+        self.load_statistics(self.ids.stats_period_spinner.text if self.ids else '7 Tage')
+        return super().on_enter(*args)
+
+    def load_statistics(self, period_name):
+        days_back = self.PERIODS.get(period_name, 6)
+        since = None if days_back is None else datetime.date.today() - datetime.timedelta(days=days_back)
+        recipe_totals = db.get_recipe_totals(since=since)
+        ingredient_usage = db.get_ingredient_usage(since=since)
+        total_pours = sum(pours for _, _, pours, _ in recipe_totals)
+        self.recipe_stats_text = "\n".join(
+            f"{name or f'(gelöscht, ID {recipe_id})'}: {pours}x, {total_ml / 1000:.2f} l"
+            for recipe_id, name, pours, total_ml in recipe_totals[:10]) or "Keine Ausschänke."
+        self.ingredient_stats_text = "\n".join(
+            f"{name or f'(gelöscht, ID {ingredient_id})'}: {total_ml / 1000:.2f} l"
+            for ingredient_id, name, total_ml in ingredient_usage[:10]) or "-"
+        self.status_text = f"{period_name}: {total_pours} Drinks"
 
 
 # NEUE Klasse für den Einstellungs-Screen
@@ -516,20 +751,11 @@ class SettingsScreen(Screen): # Ebene 0
 
         # Lade Glasgrößen-Optionen aus Config für Spinner
         options = ["Medium"] # Default Fallback
-        try: # Ebene 2
-            # Code im try: Ebene 3 (12 spaces)
-            script_dir = os.path.dirname(__file__)
-            config_path = os.path.join(script_dir, '..', 'config', 'config.yaml')
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-            if 'glass_sizes' in config and isinstance(config['glass_sizes'], dict):
-                options = list(config['glass_sizes'].keys())
-            else:
-                print("WARNUNG: glass_sizes nicht in Config gefunden.")
-        except Exception as e: # Ebene 2
-             # Code im except: Ebene 3 (12 spaces)
-             print(f"FEHLER Config laden für Glasgrößen: {e}")
-        # Code: Ebene 2 (8 spaces)
+        config = app_config.get_config()
+        if config is not None:
+            options = list(config.glass_sizes)
+        else:
+            print("WARNUNG: Keine gültige Konfiguration, verwende Standard-Glasgröße.")
         self.glass_size_options = options
         if self.ids.setting_glass_spinner: self.ids.setting_glass_spinner.values = options
 
@@ -608,42 +834,130 @@ class SettingsScreen(Screen): # Ebene 0
             pass
 
 
+# Techniker-Screens: Regeln in technician.kv, Instanz erst beim ersten Aufruf
+LAZY_SCREENS = {
+    'pump_assignment': PumpAssignmentScreen,
+    'calibration': CalibrationScreen,
+    'cleaning': CleaningScreen,
+    'settings': SettingsScreen,
+    'statistics': StatisticsScreen,
+}
+TECHNICIAN_KV_FILE = os.path.join(os.path.dirname(__file__), 'technician.kv')
+
 # Der Screen Manager
 class WindowManager(ScreenManager): # Ebene 0
-    pass # Ebene 1
+    _technician_kv_loaded = False
+    _pending_screen = None # Techniker-Screen, der auf den Datenbank-Start wartet
+    _waiting_screen = None # Screen, der solange den Hinweis anzeigt
+
+    # Methoden: Ebene 1 (4 spaces)
+    def on_current(self, instance, value):
+        # Code: Ebene 2 (8 spaces)
+        if value in LAZY_SCREENS and not self.has_screen(value):
+            # Techniker-Screens lesen beim Betreten die DB; deren Start muss abgeschlossen sein.
+            # Nicht im UI-Thread darauf warten, sondern den Wechsel verschieben.
+            if not startup.is_ready(startup.STAGE_DATABASE):
+                self._defer_lazy_screen(value)
+                return
+            self._create_lazy_screen(value)
+        return super().on_current(instance, value)
+
+    def _defer_lazy_screen(self, name):
+        screen = self.current_screen
+        if screen is not None and hasattr(screen, 'status_text'):
+            screen.status_text = "Start läuft noch, bitte warten..."
+            self._waiting_screen = screen # Hinweis dort später wieder entfernen
+        print(f"INFO: Screen '{name}' wartet auf den Datenbank-Start.")
+        if self._pending_screen is None:
+            Clock.schedule_interval(self._open_pending_screen, 0.2)
+        self._pending_screen = name
+
+    def _open_pending_screen(self, dt):
+        if not startup.is_ready(startup.STAGE_DATABASE):
+            return True
+        name, self._pending_screen = self._pending_screen, None
+        if self._waiting_screen is not None:
+            self._waiting_screen.status_text = ""
+            self._waiting_screen = None
+        if self.current == name: # inzwischen nicht woanders hin navigiert
+            self._create_lazy_screen(name)
+            super().on_current(self, name)
+        return False
+
+    def _create_lazy_screen(self, name):
+        started = time.perf_counter()
+        if not WindowManager._technician_kv_loaded:
+            Builder.load_file(TECHNICIAN_KV_FILE)
+            WindowManager._technician_kv_loaded = True
+        self.add_widget(LAZY_SCREENS[name](name=name))
+        print(f"INFO: Screen '{name}' in {(time.perf_counter() - started) * 1000:.1f}ms aufgebaut.")
 
 # Die Haupt-App Klasse
 class CocktailApp(App): # Ebene 0
+    _stopped = False
+
     # Methoden: Ebene 1 (4 spaces)
     def build(self):
         # Code: Ebene 2 (8 spaces)
-        print("INFO: build() - Initialisiere Datenbank...")
-        db.initialize_database()
-        print("INFO: build() - Initialisiere Pumpen-GPIOs...")
-        if not pc.setup_pumps(): print("WARNUNG: GPIO Setup fehlgeschlagen.")
+        # Gestaffelter Start: erst das Hauptmenü zeichnen, DB und GPIO im Hintergrund vorbereiten
+        print("INFO: build() - Starte Datenbank- und GPIO-Initialisierung im Hintergrund...")
+        startup.run_in_background([
+            (startup.STAGE_DATABASE, self._init_database),
+            (startup.STAGE_GPIO, pc.setup_pumps),
+        ])
         atexit.register(self.on_stop)
         print("INFO: build() - Lade KV Datei explizit...")
         # try Block: Ebene 2 (8 spaces)
         try:
              # Code im try: Ebene 3 (12 spaces)
              kv_file = os.path.join(os.path.dirname(__file__), 'cocktail.kv')
-             # Explicitly load the KV file and return the root widget
-             widget = Builder.load_file(kv_file)
+             # Explicitly load the KV file and return the root widget (Techniker-Screens: technician.kv, lazy)
+             with startup.report.stage('KV Hauptmenü'):
+                 widget = Builder.load_file(kv_file)
              print(f"INFO: build() - KV-Datei '{kv_file}' explizit geladen. Root ist: {widget}")
+             # Menü aus dem Snapshot der letzten Sitzung, noch bevor die Datenbank geöffnet ist
+             with startup.report.stage('Menü-Snapshot'):
+                 snapshot = menu_snapshot.load_snapshot()
+             if snapshot is not None:
+                 widget.get_screen('main').show_snapshot(snapshot)
              return widget
         except Exception as e: # Ebene 2
              # Code im except: Ebene 3 (12 spaces)
              print(f"FEHLER: Konnte KV Datei nicht laden: {e}"); traceback.print_exc(); return None
 
+    def _init_database(self):
+        """Hintergrund-Startstufe: Schema prüfen/migrieren, danach Archivierung und Plan-Vorberechnung anstoßen."""
+        db.initialize_database()
+        import pour_archive
+        # Einmaliges VACUUM jetzt: Ausschänke sind erst nach dieser Stufe möglich
+        pour_archive.convert_to_incremental_vacuum()
+        pour_archive.archive_in_background() # Alte Logbuch-Einträge gemäß retention_days auslagern
+        core.prewarm_in_background() # Ausgabepläne der beliebtesten Drinks vorberechnen
+
     def on_start(self): # Ebene 1
         # Code: Ebene 2 (8 spaces)
         print("INFO: on_start() - App Fenster ist erstellt.")
-        pass # Nothing needed here currently
+        Clock.schedule_once(lambda dt: startup.report.mark('Erstes Bild'), 0)
+        startup.report.log_when_complete('Erstes Bild', 'Menü sichtbar', startup.STAGE_DATABASE, startup.STAGE_GPIO)
 
     def on_stop(self): # Ebene 1
         # Code: Ebene 2 (8 spaces)
+        # Läuft über Kivy und zusätzlich per atexit (Absturz); nur das erste Mal aufräumen
+        if self._stopped:
+            return
+        self._stopped = True
         print("INFO: Cocktail App wird beendet. Räume GPIOs auf.")
+        pour_jobs.shutdown()
+        main_screen = self.root.get_screen('main') if self.root else None
+        if main_screen is not None and main_screen._menu_executor is not None:
+            main_screen._menu_executor.shutdown()
         pc.cleanup_gpio()
+        thumbnail_cache.stop_worker()
+        db.stop_pour_log_writer() # gepufferte Logbuch-Einträge sicher schreiben
+        if main_screen is not None:
+            main_screen.write_snapshot() # schneller Kaltstart beim nächsten Einschalten
+        db.close_all_connections()
+        log_setup.shutdown_logging() # Rest der Log-Queue schreiben
 
 # --- App starten ---
 if __name__ == '__main__': # Ebene 0
@@ -0,0 +1,95 @@
+import os
+import json
+import logging
+import datetime
+import app_config
+import database_manager as db
+
+logger = logging.getLogger('MenuSnapshot')
+
+# Menü-Snapshot: eine kleine JSON-Datei neben der Datenbank, damit das Hauptmenü nach dem
+# Einschalten gezeichnet werden kann, bevor die Datenbank geöffnet ist. Inhalt:
+#   format            - SNAPSHOT_FORMAT, andere Versionen werden ignoriert
+#   catalog_revision  - settings.CatalogRevision beim Schreiben (Prüfung im Hintergrund)
+#   target_volume_ml  - Glasvolumen, für das die Verfügbarkeit gilt
+#   menu              - [[recipe_id, name, thumbnail_path], ...] in Menü-Reihenfolge
+#   availability      - Bitmap (Hex) über menu: Bit i gesetzt = Eintrag i ausschenkbar
+#   plans             - exportierter Plan-Cache (core.export_pour_plans)
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_FILE = 'menu_snapshot.json'
+
+
+def snapshot_path():
+    config = app_config.get_config()
+    if config is None:
+        return None
+    return os.path.join(os.path.dirname(config.database_path), SNAPSHOT_FILE)
+
+def write_snapshot(entries, target_volume_ml, catalog_revision, plans=()):
+    """Schreibt den Snapshot atomar (temporäre Datei, fsync, rename).
+
+    entries: Menüdaten wie in MainScreen ([{'recipe_id', 'recipe_name', 'thumbnail', 'pourable'}, ...]).
+    Rückgabe: True bei Erfolg.
+    """
+    path = snapshot_path()
+    if path is None or catalog_revision is None:
+        return False
+    availability = 0
+    for position, entry in enumerate(entries):
+        if entry.get('pourable'):
+            availability |= 1 << position
+    snapshot = {'format': SNAPSHOT_FORMAT,
+                'catalog_revision': catalog_revision,
+                'target_volume_ml': target_volume_ml,
+                'written_at': datetime.datetime.now().isoformat(" ", "seconds"),
+                'menu': [[entry['recipe_id'], entry['recipe_name'], entry.get('thumbnail') or ''] for entry in entries],
+                'availability': format(availability, 'x'),
+                'plans': list(plans)}
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Menü-Snapshot konnte nicht geschrieben werden ({path}): {e}")
+        return False
+    logger.info(f"Menü-Snapshot geschrieben: {len(entries)} Einträge, {len(snapshot['plans'])} Pläne, Revision {catalog_revision}.")
+    return True
+
+def load_snapshot(path=None):
+    """Liest den Snapshot mit einem einzigen Dateizugriff (ohne Datenbank).
+
+    Rückgabe: dict mit 'entries' (Menüdaten für die RecycleView), 'catalog_revision',
+    'target_volume_ml' und 'plans' - oder None, wenn keiner vorhanden/lesbar ist.
+    """
+    path = path or snapshot_path()
+    if path is None:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        snapshot = json.loads(raw)
+        if snapshot.get('format') != SNAPSHOT_FORMAT:
+            logger.info(f"Menü-Snapshot hat ein anderes Format ({snapshot.get('format')}), wird ignoriert.")
+            return None
+        availability = int(snapshot['availability'], 16)
+        entries = [{'recipe_id': recipe_id, 'recipe_name': name, 'thumbnail': thumbnail,
+                    'pourable': bool(availability >> position & 1)}
+                   for position, (recipe_id, name, thumbnail) in enumerate(snapshot['menu'])]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Menü-Snapshot unlesbar ({path}): {e}")
+        return None
+    logger.debug(f"Menü-Snapshot geladen: {len(entries)} Einträge, Revision {snapshot['catalog_revision']}.")
+    return {'entries': entries, 'catalog_revision': snapshot['catalog_revision'],
+            'target_volume_ml': snapshot['target_volume_ml'], 'plans': snapshot.get('plans') or []}
+
+def is_current(snapshot, target_volume_ml, catalog_revision=None):
+    """Passt der Snapshot zur Datenbank (Katalog-Revision) und zur gewählten Glasgröße?"""
+    if catalog_revision is None:
+        catalog_revision = db.get_catalog_revision()
+    return (catalog_revision is not None and snapshot['catalog_revision'] == catalog_revision
+            and float(snapshot['target_volume_ml']) == float(target_volume_ml))
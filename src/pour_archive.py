@@ -0,0 +1,195 @@
+import os
+import sys
+import glob
+import gzip
+import json
+import logging
+import datetime
+import threading
+from sqlite3 import Error
+import app_config
+import database_manager as db
+
+logger = logging.getLogger('PourArchive')
+
+# Archivdateien: pour_log_<erste log_id>-<letzte log_id>.jsonl.gz, eine JSON-Zeile pro Ausschank.
+# Die Namen sortieren chronologisch, weil log_id monoton steigt.
+ARCHIVE_PATTERN = 'pour_log_*.jsonl.gz'
+_HOT_ROWS_FETCH = 500
+INCREMENTAL_VACUUM_PAGES = 256 # Seiten pro Schritt; dazwischen ist die Schreibsperre frei
+
+_archive_lock = threading.Lock()
+
+
+def _archive_path(folder, first_id, last_id):
+    return os.path.join(folder, f"pour_log_{first_id:010d}-{last_id:010d}.jsonl.gz")
+
+def _write_chunk(path, rows):
+    """Schreibt einen Chunk komprimiert und erst nach fsync unter dem endgültigen Namen."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as out:
+            for log_id, timestamp, recipe_id, recipe_name, size_ml in rows:
+                record = {'log_id': log_id, 'timestamp': timestamp, 'recipe_id': recipe_id,
+                          'recipe_name': recipe_name, 'size_ml': size_ml}
+                out.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+def convert_to_incremental_vacuum():
+    """Stellt auto_vacuum=INCREMENTAL ein; bei bestehenden Datenbanken ist dafür einmalig ein VACUUM nötig.
+
+    Das VACUUM hält die Schreibsperre unter Umständen länger als das Busy-Timeout. Nur aufrufen,
+    solange kein Ausschank verbucht werden kann (beim App-Start, bevor die Datenbank-Stufe fertig ist).
+    Rückgabe: True, wenn die Datenbank danach im INCREMENTAL-Modus ist.
+    """
+    conn = db.create_connection()
+    if conn is None:
+        return False
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return True
+        logger.info("Stelle Datenbank auf auto_vacuum=INCREMENTAL um (einmaliges VACUUM)...")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    except Error as e:
+        logger.error(f"Umstellung auf auto_vacuum=INCREMENTAL fehlgeschlagen: {e}")
+        return False
+    finally:
+        conn.close()
+
+def _incremental_vacuum(conn):
+    """Gibt freie Seiten in kleinen Schritten frei (nur im INCREMENTAL-Modus, sonst nichts)."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logger.debug("auto_vacuum ist nicht INCREMENTAL, freie Seiten bleiben in der Datei.")
+        return
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free_pages > 0:
+        conn.execute(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES})").fetchall() # fetchall: alle Schritte ausführen
+        conn.commit()
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if remaining >= free_pages:
+            break
+        free_pages = remaining
+
+
+def archive_old_pours(retention_days=None, now=None):
+    """Verschiebt Pour-Log-Einträge, die älter als retention_days sind, in komprimierte Archivdateien.
+
+    Die Einträge werden in Chunks gelesen, geschrieben und erst danach gelöscht; zum Schluss gibt
+    ein inkrementelles VACUUM die freien Seiten an das Dateisystem zurück. Die Statistik-Rollups
+    bleiben unverändert. Rückgabe: Anzahl archivierter Einträge oder None bei Fehlern.
+    """
+    config = app_config.get_config()
+    if config is None:
+        return None
+    if retention_days is None:
+        retention_days = config.pour_log_retention_days
+    if not retention_days:
+        logger.debug("Pour-Log-Archivierung deaktiviert (retention_days = 0).")
+        return 0
+    folder = config.pour_log_archive_folder
+    chunk_rows = config.pour_log_archive_chunk_rows
+    cutoff = ((now or datetime.datetime.now()) - datetime.timedelta(days=retention_days)).isoformat(" ")
+
+    with _archive_lock:
+        db.flush_pour_log()
+        conn = db.create_connection()
+        if conn is None:
+            return None
+        archived = 0
+        try:
+            os.makedirs(folder, exist_ok=True)
+            while True:
+                cur = conn.cursor()
+                cur.execute(""" SELECT pl.log_id, CAST(pl.timestamp AS TEXT), pl.recipe_id, r.name, pl.size_ml
+                                FROM pour_log pl LEFT JOIN recipes r ON pl.recipe_id = r.recipe_id
+                                WHERE pl.timestamp < ? ORDER BY pl.log_id LIMIT ? """, (cutoff, chunk_rows))
+                rows = cur.fetchall()
+                conn.commit() # Lesetransaktion beenden
+                if not rows:
+                    break
+                first_id, last_id = rows[0][0], rows[-1][0]
+                _write_chunk(_archive_path(folder, first_id, last_id), rows)
+                # Genau die geschriebenen Zeilen: alle alten Einträge bis einschließlich last_id
+                cur.execute("DELETE FROM pour_log WHERE log_id <= ? AND timestamp < ?", (last_id, cutoff))
+                conn.commit()
+                archived += len(rows)
+                logger.info(f"{len(rows)} Pour-Log-Einträge (ID {first_id}-{last_id}) archiviert.")
+            if archived:
+                _incremental_vacuum(conn)
+        except (Error, OSError) as e:
+            logger.error(f"Fehler beim Archivieren des Pour-Logs: {e}")
+            conn.close()
+            return None
+        conn.close()
+    if archived:
+        logger.info(f"Archivierung abgeschlossen: {archived} Einträge älter als {retention_days} Tage nach {folder} verschoben.")
+    return archived
+
+def archive_in_background():
+    """Startet archive_old_pours() in einem Hintergrund-Thread (z.B. beim App-Start)."""
+    thread = threading.Thread(target=archive_old_pours, name='PourArchive', daemon=True)
+    thread.start()
+    return thread
+
+
+def iter_archive_files(folder=None):
+    if folder is None:
+        config = app_config.get_config()
+        folder = config.pour_log_archive_folder if config else None
+    if not folder:
+        return []
+    return sorted(glob.glob(os.path.join(folder, ARCHIVE_PATTERN)))
+
+def iter_pour_history(since=None):
+    """Iteriert lazy über die gesamte Historie: erst Archivdateien, dann die Einträge in der DB.
+
+    Liefert Tupel (log_id, timestamp, recipe_id, recipe_name, size_ml) wie get_pour_log(),
+    aber chronologisch aufsteigend. since (datetime) überspringt ältere Einträge.
+    """
+    since_key = since.isoformat(" ") if since is not None else None
+    last_archived_id = 0
+    for path in iter_archive_files():
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                last_archived_id = max(last_archived_id, record['log_id'])
+                if since_key is not None and record['timestamp'] < since_key:
+                    continue
+                yield (record['log_id'], datetime.datetime.fromisoformat(record['timestamp']),
+                       record['recipe_id'], record['recipe_name'], record['size_ml'])
+    # Einträge in der DB seitenweise nach log_id (kein offener Cursor zwischen zwei yields);
+    # die log_id-Grenze verhindert Doppelte, falls während des Lesens archiviert wurde
+    last_id = last_archived_id
+    while True:
+        conn = db.create_connection()
+        if conn is None:
+            return
+        try:
+            cur = conn.cursor()
+            cur.execute(""" SELECT pl.log_id, CAST(pl.timestamp AS TEXT), pl.recipe_id, r.name, pl.size_ml
+                            FROM pour_log pl LEFT JOIN recipes r ON pl.recipe_id = r.recipe_id
+                            WHERE pl.log_id > ? AND pl.timestamp >= ? ORDER BY pl.log_id LIMIT ? """,
+                        (last_id, since_key or '', _HOT_ROWS_FETCH))
+            rows = cur.fetchall()
+        except Error as e:
+            logger.error(f"Fehler beim Lesen des Pour-Logs: {e}")
+            rows = []
+        conn.close()
+        if not rows:
+            return
+        for log_id, timestamp, recipe_id, recipe_name, size_ml in rows:
+            yield log_id, datetime.datetime.fromisoformat(timestamp), recipe_id, recipe_name, size_ml
+        last_id = rows[-1][0]
+
+
+if __name__ == '__main__':
+    import log_setup
+    log_setup.setup_logging()
+    # Manuell archivieren, z.B. per cron: python src/pour_archive.py [retention_days]
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    db.initialize_database()
+    sys.exit(0 if archive_old_pours(days) is not None else 1)
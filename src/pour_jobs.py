@@ -0,0 +1,169 @@
+import queue
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger('PourJobs')
+
+
+def _kivy_dispatch(callback):
+    """Führt callback im Kivy-Hauptthread aus (über Clock.schedule_once)."""
+    from kivy.clock import Clock
+    Clock.schedule_once(lambda dt: callback(), 0)
+
+
+class JobHandle:
+    """Handle für einen Hintergrund-Auftrag (Ausschank, Kalibrierung, Reinigung).
+
+    Die Job-Funktion bekommt das Handle übergeben und meldet darüber Fortschritt
+    (report_progress) und prüft, ob abgebrochen wurde (cancelled).
+    """
+
+    def __init__(self, job_id, name, executor, on_progress, on_complete, on_error):
+        self.job_id = job_id
+        self.name = name
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self._executor = executor
+        self._on_progress = on_progress
+        self._on_complete = on_complete
+        self._on_error = on_error
+        self._cancel_hooks = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def report_progress(self, message):
+        """Aus der Job-Funktion aufrufen; on_progress(handle, message) läuft im UI-Thread."""
+        logger.debug(f"Job {self.job_id} ({self.name}): {message}")
+        if self._on_progress is not None:
+            self._executor._dispatch(lambda: self._on_progress(self, message))
+
+    def add_cancel_hook(self, hook):
+        """Registriert eine Funktion, die bei cancel() aufgerufen wird (z.B. PumpRun.cancel)."""
+        with self._lock:
+            if not self.cancelled:
+                self._cancel_hooks.append(hook)
+                return
+        hook()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled or self._done.is_set():
+                return
+            self.cancelled = True
+            hooks = list(self._cancel_hooks)
+        logger.warning(f"Job {self.job_id} ({self.name}) wird abgebrochen.")
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Fehler beim Abbrechen von Job {self.job_id}: {e}")
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+class PourJobExecutor:
+    """Führt Aufträge nacheinander in einem Hintergrund-Thread aus.
+
+    submit() kehrt sofort zurück; Fortschritt, Ergebnis und Fehler werden über den
+    Dispatcher (Standard: Kivy Clock) im UI-Thread gemeldet.
+    """
+
+    def __init__(self, dispatch=None, thread_name='PourJobWorker'):
+        self._dispatch = dispatch or _kivy_dispatch
+        self._thread_name = thread_name
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.current_job = None
+
+    def submit(self, name, job_fn, on_progress=None, on_complete=None, on_error=None):
+        """Stellt job_fn(handle) in die Warteschlange und gibt sofort ein JobHandle zurück.
+
+        on_progress(handle, message), on_complete(handle, result), on_error(handle, exception)
+        werden im UI-Thread aufgerufen.
+        """
+        handle = JobHandle(next(self._ids), name, self, on_progress, on_complete, on_error)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker_loop, name=self._thread_name, daemon=True)
+                self._thread.start()
+        self._queue.put((handle, job_fn))
+        logger.info(f"Job {handle.job_id} ({name}) eingereiht.")
+        return handle
+
+    def is_busy(self):
+        return self.current_job is not None or not self._queue.empty()
+
+    def cancel_all(self):
+        """Bricht den laufenden und alle wartenden Aufträge ab."""
+        if self.current_job is not None:
+            self.current_job.cancel()
+        pending = []
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for item in pending:
+            if item is None:
+                continue
+            item[0].cancel()
+            self._queue.put(item) # Abgebrochene Jobs melden sich trotzdem ab
+
+    def shutdown(self, timeout=5.0):
+        self.cancel_all()
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            handle, job_fn = item
+            self.current_job = handle
+            if handle.cancelled:
+                logger.info(f"Job {handle.job_id} ({handle.name}) vor dem Start abgebrochen.")
+            else:
+                logger.info(f"Job {handle.job_id} ({handle.name}) gestartet.")
+                try:
+                    handle.result = job_fn(handle)
+                except Exception as e:
+                    handle.error = e
+                    logger.exception(f"Fehler in Job {handle.job_id} ({handle.name}): {e}")
+            self.current_job = None
+            handle._done.set()
+            if handle.error is not None:
+                if handle._on_error is not None:
+                    self._dispatch(lambda h=handle: h._on_error(h, h.error))
+            elif handle._on_complete is not None:
+                self._dispatch(lambda h=handle: h._on_complete(h, h.result))
+            logger.info(f"Job {handle.job_id} ({handle.name}) beendet"
+                        f"{' (abgebrochen)' if handle.cancelled else ''}.")
+
+
+_executor = None
+
+def get_executor():
+    """Gemeinsamer Executor für alle Pumpenaufträge (immer nur ein Auftrag gleichzeitig)."""
+    global _executor
+    if _executor is None:
+        _executor = PourJobExecutor()
+    return _executor
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
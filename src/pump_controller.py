@@ -1,56 +1,49 @@
-import RPi.GPIO as GPIO
 import time
-import yaml
-import os
+import heapq
 import logging
+import itertools
+import threading
+from collections import deque
 # NEU: Datenbank-Manager importieren, um Kalibrierung zu lesen
 import database_manager as db
+import app_config
+import gpio_backend
 
-# --- Logging Setup ---
-log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('PumpController')
-logger.setLevel(logging.DEBUG) # DEBUG für Tests
-if not logger.handlers:
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(log_formatter)
-    logger.addHandler(stream_handler)
-# --------------------------------------------------------------------------
 
 # Globale Variable für die Pin-Liste
 PUMP_PINS = []
 PUMP_COUNT = 8 # Feste Anzahl Pumpen
+# GPIO-Backend (RPi.GPIO oder Simulation), wird in load_config() gemäß 'gpio_backend' gewählt
+GPIO = None
+_pins_ready = False # erst nach erfolgreichem setup_pumps() werden Pumpen geschaltet
 
 def load_config():
-    """Lädt die Konfiguration und extrahiert die Pumpen-Pins."""
-    global PUMP_PINS, PUMP_COUNT
-    # Nur einmal laden
+    """Übernimmt Pumpen-Pins und GPIO-Backend aus der gemeinsamen Konfiguration."""
+    global PUMP_PINS, PUMP_COUNT, GPIO
+    # Nur einmal übernehmen (geänderte Pins gelten erst nach einem Neustart)
     if not PUMP_PINS:
-        script_dir = os.path.dirname(__file__)
-        config_path = os.path.join(script_dir, '..', 'config', 'config.yaml')
-        logger.info(f"Lade Konfiguration von: {config_path}")
-        try:
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-                if 'pump_pins' in config and isinstance(config['pump_pins'], list):
-                    PUMP_PINS = config['pump_pins']
-                    PUMP_COUNT = len(PUMP_PINS) # Anzahl aus Config übernehmen
-                    logger.info(f"{PUMP_COUNT} Pumpen-Pins geladen: {PUMP_PINS}")
-                    return True
-                else:
-                    logger.error("Konfigurationsdatei fehlt 'pump_pins' oder es ist keine Liste.")
-                    return False
-        except FileNotFoundError:
-            logger.error(f"Konfigurationsdatei nicht gefunden: {config_path}")
+        config = app_config.get_config()
+        if config is None:
+            logger.error("Keine gültige Konfiguration. Pumpen-Pins nicht geladen.")
             return False
-        except Exception as e:
-            logger.error(f"Fehler beim Laden der Konfiguration: {e}")
+        PUMP_PINS = list(config.pump_pins)
+        PUMP_COUNT = len(PUMP_PINS) # Anzahl aus Config übernehmen
+        logger.info(f"{PUMP_COUNT} Pumpen-Pins geladen: {PUMP_PINS}")
+    if GPIO is None:
+        config = app_config.get_config()
+        try:
+            GPIO = gpio_backend.create_backend(config.gpio_backend, config.simulation_speed)
+        except gpio_backend.GPIOBackendError as e:
+            logger.critical(f"{e} - Pumpen sind gesperrt, es wird nichts ausgeschenkt.")
             return False
-    return True # Wenn PINS schon geladen waren
+    return True
 
 def setup_pumps():
     """Initialisiert die GPIO-Pins für die Pumpen."""
+    global _pins_ready
     if not load_config(): # Sicherstellen, dass Config geladen ist
-         logger.error("Pumpen-Pins nicht geladen. Setup abgebrochen.")
+         logger.error("Pumpen-Pins oder GPIO-Backend nicht verfügbar. Setup abgebrochen.")
          return False
 
     try:
@@ -60,6 +53,7 @@ def setup_pumps():
             logger.debug(f"Setze Pin {pin} als OUTPUT, initial LOW")
             GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
         logger.info("GPIO-Pins für Pumpen erfolgreich initialisiert.")
+        _pins_ready = True
         return True
     except Exception as e:
         # Spezifischer Fehler für RPi.GPIO-Zugriffsprobleme
@@ -69,6 +63,10 @@ def setup_pumps():
              logger.error(f"Fehler beim Initialisieren der GPIO-Pins: {e}")
         return False
 
+def pumps_ready():
+    """True, wenn ein GPIO-Backend aktiv ist und setup_pumps() erfolgreich war."""
+    return GPIO is not None and _pins_ready
+
 def turn_pump_on(pump_index):
     """Schaltet eine bestimmte Pumpe ein."""
     if 0 <= pump_index < len(PUMP_PINS):
@@ -93,74 +91,385 @@ def turn_pump_off(pump_index):
     else:
         logger.warning(f"Ungültiger Pumpenindex: {pump_index}")
 
-def dispense_duration(pump_index, duration_sec):
-    """Lässt eine Pumpe für eine bestimmte Dauer laufen."""
-    if duration_sec <= 0:
-        logger.warning(f"Ungültige Dauer für Pumpe {pump_index}: {duration_sec}s")
-        return
-    if 0 <= pump_index < len(PUMP_PINS):
+# ========== Timing-Engine ==========
+# Ein einziger Thread schaltet alle Pumpen. Schaltzeitpunkte liegen in einem Min-Heap
+# (deadline, seq, pump_index, action, run); der Thread schläft genau bis zur nächsten Deadline.
+
+ACTION_ON = 'on'
+ACTION_OFF = 'off'
+JITTER_WINDOW = 1000 # Anzahl der letzten Schaltvorgänge für die Jitter-Statistik
+
+
+class PumpRun:
+    """Handle für einen laufenden Ausgabeauftrag (eine oder mehrere Pumpen gleichzeitig)."""
+
+    def __init__(self, engine, durations):
+        self._engine = engine
+        self.durations = dict(durations)   # {pump_index: Soll-Laufzeit in s}
+        self.start_times = {}              # {pump_index: monotonic beim Einschalten}
+        self.actual_durations = {}         # {pump_index: Ist-Laufzeit in s}
+        self.cancelled = False
+        self._done = threading.Event()
+
+    def is_running(self, pump_index):
+        return pump_index in self.start_times and pump_index not in self.actual_durations
+
+    def cancel(self):
+        """Schaltet alle Pumpen dieses Auftrags sofort ab."""
+        self._engine.cancel(self)
+
+    def wait(self, timeout=None):
+        """Wartet bis alle Pumpen aus sind. Gibt {pump_index: Ist-Laufzeit} zurück (None bei Timeout)."""
+        if not self._done.wait(timeout):
+            return None
+        return dict(self.actual_durations)
+
+    def done(self):
+        return self._done.is_set()
+
+
+class PumpTimingEngine:
+    """Schaltet Pumpen zu exakten, monotonen Deadlines aus einem einzigen Thread heraus."""
+
+    def __init__(self, clock=time.monotonic, speed=1.0):
+        self._clock = clock
+        self._speed = speed # Backend-Zeit pro Echtzeit-Sekunde (Simulation: z.B. 100)
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._busy_pumps = set()
+        self._lateness = deque(maxlen=JITTER_WINDOW) # Verspätung je Schaltvorgang in s
+        self._event_count = 0
+        self._max_lateness = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name='PumpTimingEngine', daemon=True)
+        self._thread.start()
+        logger.info("Pumpen-Timing-Engine gestartet.")
+
+    def stop(self):
+        """Schaltet alle laufenden Pumpen ab und beendet den Thread."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        logger.info("Pumpen-Timing-Engine gestoppt.")
+
+    def run_pumps(self, durations):
+        """Startet alle Pumpen aus {pump_index: Laufzeit_s} gleichzeitig. Gibt ein PumpRun-Handle zurück.
+
+        None, wenn eine der Pumpen schon von einem anderen Auftrag benutzt wird.
+        """
+        run = PumpRun(self, durations)
+        with self._cond:
+            busy = self._busy_pumps.intersection(run.durations)
+            if busy:
+                logger.error(f"Pumpe(n) {sorted(busy)} laufen bereits. Auftrag abgelehnt.")
+                return None
+            self._busy_pumps.update(run.durations)
+            now = self._clock()
+            for pump_index in run.durations:
+                self._push(now, pump_index, ACTION_ON, run)
+            if not run.durations:
+                run._done.set()
+            self._cond.notify()
+        if not self._running:
+            self.start()
+        return run
+
+    def cancel(self, run):
+        with self._cond:
+            if run.done():
+                return
+            run.cancelled = True
+            now = self._clock()
+            for pump_index in run.durations:
+                self._push(now, pump_index, ACTION_OFF, run)
+            self._cond.notify()
+        logger.warning(f"Ausgabeauftrag für Pumpen {sorted(run.durations)} abgebrochen.")
+
+    def cancel_all(self):
+        with self._cond:
+            runs = {id(event[4]): event[4] for event in self._heap}
+        for run in runs.values():
+            self.cancel(run)
+
+    def _push(self, deadline, pump_index, action, run):
+        heapq.heappush(self._heap, (deadline, next(self._seq), pump_index, action, run))
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._heap:
+                        timeout = self._heap[0][0] - self._clock()
+                        if timeout <= 0:
+                            break
+                        self._cond.wait(timeout / self._speed)
+                    else:
+                        self._cond.wait()
+                if not self._running:
+                    self._shutdown_pumps()
+                    return
+                deadline, _, pump_index, action, run = heapq.heappop(self._heap)
+                self._execute(deadline, pump_index, action, run)
+
+    def _execute(self, deadline, pump_index, action, run):
+        """Wird mit gehaltenem Lock im Engine-Thread aufgerufen."""
         pin = PUMP_PINS[pump_index]
-        logger.info(f"Starte Pumpe {pump_index} (Pin {pin}) für {duration_sec:.2f} Sekunden.")
-        try:
-            GPIO.output(pin, GPIO.HIGH)
-            start_time = time.monotonic()
-            # Warte präziser als time.sleep für kurze Dauern
-            while time.monotonic() - start_time < duration_sec:
-                time.sleep(0.01) # Kurze Pause, um CPU nicht voll auszulasten
-        except Exception as e:
-             logger.error(f"Fehler während dispense_duration für Pumpe {pump_index}: {e}")
-        finally:
-            # Sicherstellen, dass die Pumpe ausgeschaltet wird
-            GPIO.output(pin, GPIO.LOW)
-            actual_duration = time.monotonic() - start_time
-            logger.info(f"Stoppe Pumpe {pump_index} (Pin {pin}) nach {actual_duration:.2f}s (Ziel: {duration_sec:.2f}s).")
-    else:
-        logger.warning(f"Ungültiger Pumpenindex für dispense_duration: {pump_index}")
+        if action == ACTION_ON:
+            if run.cancelled:
+                self._finish_pump(run, pump_index, None)
+                return
+            try:
+                GPIO.output(pin, GPIO.HIGH)
+            except Exception as e:
+                logger.error(f"Fehler beim Einschalten von Pumpe {pump_index} (Pin {pin}): {e}")
+                self._finish_pump(run, pump_index, None)
+                return
+            now = self._clock()
+            self._record_lateness(now - deadline)
+            run.start_times[pump_index] = now
+            # Ausschalt-Deadline relativ zum tatsächlichen Einschaltzeitpunkt
+            self._push(now + run.durations[pump_index], pump_index, ACTION_OFF, run)
+        elif run.is_running(pump_index):
+            try:
+                GPIO.output(pin, GPIO.LOW)
+            except Exception as e:
+                logger.error(f"Fehler beim Ausschalten von Pumpe {pump_index} (Pin {pin}): {e}")
+            now = self._clock()
+            if not run.cancelled:
+                self._record_lateness(now - deadline)
+            self._finish_pump(run, pump_index, now - run.start_times[pump_index])
+        elif pump_index not in run.start_times and pump_index not in run.actual_durations:
+            # Abbruch, bevor die Pumpe überhaupt eingeschaltet wurde
+            self._finish_pump(run, pump_index, None)
 
+    def _shutdown_pumps(self):
+        """Beim Stoppen: alle noch laufenden Pumpen sofort aus, alle Aufträge abschließen."""
+        now = self._clock()
+        while self._heap:
+            _, _, pump_index, _, run = heapq.heappop(self._heap)
+            run.cancelled = True
+            if run.is_running(pump_index):
+                try:
+                    GPIO.output(PUMP_PINS[pump_index], GPIO.LOW)
+                except Exception as e:
+                    logger.error(f"Fehler beim Ausschalten von Pumpe {pump_index}: {e}")
+                self._finish_pump(run, pump_index, now - run.start_times[pump_index])
+            else:
+                self._finish_pump(run, pump_index, None)
 
-def dispense_ml(pump_index, volume_ml): # NEUE Funktion
-    """Gibt eine bestimmte Menge (ml) über eine Pumpe aus, basierend auf Kalibrierung."""
+    def _finish_pump(self, run, pump_index, actual_duration):
+        if pump_index in run.actual_durations:
+            return
+        run.actual_durations[pump_index] = actual_duration if actual_duration is not None else 0.0
+        self._busy_pumps.discard(pump_index)
+        if actual_duration is not None:
+            logger.info(f"Stoppe Pumpe {pump_index} nach {actual_duration:.3f}s (Ziel: {run.durations[pump_index]:.3f}s).")
+        if len(run.actual_durations) == len(run.durations):
+            run._done.set()
+
+    def _record_lateness(self, lateness):
+        lateness = max(0.0, lateness)
+        self._lateness.append(lateness)
+        self._event_count += 1
+        if lateness > self._max_lateness:
+            self._max_lateness = lateness
+
+    def get_stats(self):
+        """Jitter-Statistik der Schaltvorgänge (Verspätung gegenüber der Deadline) in Millisekunden.
+
+        Gemessen auf der Uhr des GPIO-Backends (in der Simulation also in virtueller Zeit).
+        """
+        with self._cond:
+            samples = sorted(self._lateness)
+            event_count = self._event_count
+            max_lateness = self._max_lateness
+            scheduled = len(self._heap)
+        if not samples:
+            return {'events': event_count, 'scheduled': scheduled, 'mean_ms': 0.0, 'p95_ms': 0.0,
+                    'max_recent_ms': 0.0, 'max_ms': max_lateness * 1000}
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return {'events': event_count, 'scheduled': scheduled,
+                'mean_ms': sum(samples) / len(samples) * 1000, 'p95_ms': p95 * 1000,
+                'max_recent_ms': samples[-1] * 1000, 'max_ms': max_lateness * 1000}
+
+
+_timing_engine = None
+
+def get_timing_engine():
+    """Gemeinsame Timing-Engine für alle Pumpen (wird beim ersten Zugriff gestartet).
+
+    None, wenn kein GPIO-Backend konfiguriert werden konnte.
+    """
+    global _timing_engine
+    if _timing_engine is None:
+        if GPIO is None and not load_config():
+            logger.error("Kein GPIO-Backend verfügbar. Timing-Engine nicht gestartet.")
+            return None
+        _timing_engine = PumpTimingEngine(clock=GPIO.monotonic, speed=GPIO.speed)
+        _timing_engine.start()
+    return _timing_engine
+
+def get_timing_stats():
+    """Jitter-Statistik der Timing-Engine oder None, solange die Pumpensteuerung nicht bereit ist."""
+    if _timing_engine is None and not pumps_ready():
+        return None
+    engine = get_timing_engine()
+    return engine.get_stats() if engine is not None else None
+
+def stop_all_pumps():
+    """Not-Aus: bricht alle laufenden Ausgabeaufträge ab."""
+    if _timing_engine is not None:
+        _timing_engine.cancel_all()
+
+
+def dispense_duration(pump_index, duration_sec):
+    """Lässt eine Pumpe für eine bestimmte Dauer laufen (blockiert bis sie aus ist).
+
+    Gibt die tatsächliche Laufzeit in Sekunden zurück oder None bei ungültigen Parametern.
+    """
+    run = start_duration(pump_index, duration_sec)
+    if run is None:
+        return None
+    return run.wait()[pump_index]
+
+
+def calculate_duration(pump_index, volume_ml):
+    """Berechnet die Laufzeit (s) für eine Menge (ml) anhand der Kalibrierung. None bei Fehler."""
     if not (0 <= pump_index < PUMP_COUNT):
-         logger.error(f"Ungültiger Pumpenindex für dispense_ml: {pump_index}")
-         return False
+         logger.error(f"Ungültiger Pumpenindex: {pump_index}")
+         return None
     if volume_ml <= 0:
-        logger.warning(f"Ungültiges Volumen für dispense_ml: {volume_ml}ml")
-        return False # Gebe 0ml nicht aus
+        logger.warning(f"Ungültiges Volumen für Pumpe {pump_index}: {volume_ml}ml")
+        return None # Gebe 0ml nicht aus
 
     # Hole Kalibrierungswert aus der Datenbank
     pump_info = db.get_pump_info(pump_index)
     if pump_info is None:
          logger.error(f"Konnte Pumpeninfo für Index {pump_index} nicht laden.")
-         return False
+         return None
 
     calibration_ml_per_sec = pump_info[4] # Index 4 ist calibration_ml_per_sec
 
     if calibration_ml_per_sec is None or calibration_ml_per_sec <= 0:
         logger.error(f"Keine gültige Kalibrierung für Pumpe {pump_index} gefunden ({calibration_ml_per_sec}). Kann Menge nicht abgeben.")
         # Hier könnte man optional eine Standard-Rate annehmen oder abbrechen
-        return False
+        return None
 
     # Berechne benötigte Dauer
     try:
         duration_sec = float(volume_ml) / calibration_ml_per_sec
         logger.info(f"Berechnete Dauer für {volume_ml:.1f}ml an Pumpe {pump_index} (Rate: {calibration_ml_per_sec:.2f}ml/s): {duration_sec:.2f}s")
+        return duration_sec
     except ZeroDivisionError:
          logger.error(f"Kalibrierung für Pumpe {pump_index} ist Null. Division durch Null.")
-         return False
+         return None
     except Exception as e:
          logger.error(f"Fehler bei Zeitberechnung für Pumpe {pump_index}: {e}")
-         return False
+         return None
+
+
+def dispense_ml(pump_index, volume_ml): # NEUE Funktion
+    """Gibt eine bestimmte Menge (ml) über eine Pumpe aus, basierend auf Kalibrierung."""
+    duration_sec = calculate_duration(pump_index, volume_ml)
+    if duration_sec is None:
+        return False
 
     # Führe dispense_duration aus
     dispense_duration(pump_index, duration_sec)
     return True
 
 
+def start_parallel(plan, durations=None):
+    """Startet die parallele Ausgabe und kehrt sofort zurück.
+
+    Args:
+        plan (dict): {pump_index: volume_ml}
+        durations (dict): optional bereits berechnete Laufzeiten {pump_index: s}
+                          (z.B. aus core.get_pour_plan); dann entfällt die Kalibrierungsabfrage.
+
+    Returns:
+        PumpRun: Handle mit wait()/cancel(), oder None, wenn der Plan ungültig ist
+                 (dann wird keine Pumpe gestartet).
+    """
+    if not pumps_ready():
+        logger.error("GPIO nicht eingerichtet. Keine Pumpe gestartet.")
+        return None
+    precomputed = durations or {}
+    durations = {}
+    for pump_index, volume_ml in plan.items():
+        if not (0 <= pump_index < len(PUMP_PINS)):
+            logger.error(f"Ungültiger Pumpenindex im Ausgabeplan: {pump_index}")
+            return None
+        duration_sec = precomputed.get(pump_index)
+        if duration_sec is None or duration_sec <= 0:
+            duration_sec = calculate_duration(pump_index, volume_ml)
+        if duration_sec is None:
+            logger.error(f"Ausgabeplan ungültig (Pumpe {pump_index}, {volume_ml}ml). Keine Pumpe gestartet.")
+            return None
+        durations[pump_index] = duration_sec
+    if not durations:
+        logger.warning("Leerer Ausgabeplan, nichts zu tun.")
+    else:
+        logger.info(f"Starte parallele Ausgabe an {len(durations)} Pumpen: " +
+                    ", ".join(f"P{p}={d:.2f}s" for p, d in sorted(durations.items())))
+    return get_timing_engine().run_pumps(durations)
+
+
+def dispense_parallel(plan):
+    """Gibt mehrere Zutaten gleichzeitig aus (blockiert bis alle Pumpen aus sind).
+
+    Alle Pumpen werden zusammen eingeschaltet und jede zu ihrer eigenen Deadline wieder
+    ausgeschaltet. Die Gesamtdauer entspricht damit der längsten einzelnen Zutat.
+
+    Args:
+        plan (dict): {pump_index: volume_ml}
+
+    Returns:
+        dict: {pump_index: tatsächliche Laufzeit in s} oder None, wenn der Plan ungültig ist
+              (dann wird keine Pumpe gestartet).
+    """
+    run = start_parallel(plan)
+    if run is None:
+        return None
+    return run.wait()
+
+
+def start_duration(pump_index, duration_sec):
+    """Wie dispense_duration, kehrt aber sofort mit einem PumpRun-Handle zurück (None bei Fehler)."""
+    if not pumps_ready():
+        logger.error("GPIO nicht eingerichtet. Keine Pumpe gestartet.")
+        return None
+    if duration_sec <= 0:
+        logger.warning(f"Ungültige Dauer für Pumpe {pump_index}: {duration_sec}s")
+        return None
+    if not (0 <= pump_index < len(PUMP_PINS)):
+        logger.warning(f"Ungültiger Pumpenindex für start_duration: {pump_index}")
+        return None
+    logger.info(f"Starte Pumpe {pump_index} (Pin {PUMP_PINS[pump_index]}) für {duration_sec:.2f} Sekunden.")
+    return get_timing_engine().run_pumps({pump_index: duration_sec})
+
+
 def cleanup_gpio():
     """Gibt die GPIO-Ressourcen frei."""
     logger.info("Räume GPIO-Pins auf.")
+    global _timing_engine, _pins_ready
+    _pins_ready = False
+    if _timing_engine is not None:
+        _timing_engine.stop()
+        _timing_engine = None
     try:
-         GPIO.cleanup()
+         if GPIO is not None: GPIO.cleanup()
     except Exception as e:
          # Fehler abfangen, falls GPIO nie initialisiert wurde
          logger.warning(f"Fehler beim GPIO Cleanup (evtl. nie initialisiert?): {e}")
@@ -168,6 +477,8 @@ def cleanup_gpio():
 
 # --- Code zum direkten Testen dieses Moduls ---
 if __name__ == "__main__":
+    import log_setup
+    log_setup.setup_logging()
     print("--- Teste Pump Controller Modul (mit dispense_ml) ---")
     logger.setLevel(logging.DEBUG)
 
@@ -0,0 +1,222 @@
+import sys
+import gzip
+import json
+import time
+import logging
+import argparse
+import itertools
+from sqlite3 import Error
+import database_manager as db
+
+logger = logging.getLogger('RecipeBundle')
+
+# Rezept-Bundle: JSON-Lines (optional .gz), ein Rezept pro Zeile:
+# {"name": "Cuba Libre", "description": "...", "instructions": "...", "image_path": "cuba.jpg",
+#  "ingredients": [{"name": "Rum (weiss)", "amount": 50, "unit": "ml"}, ...]}
+# Bilder werden nur als Pfad übertragen, nicht als BLOB.
+IMPORT_BATCH_SIZE = 1000 # Rezepte pro executemany-Runde (alle Runden in einer Transaktion)
+
+ON_DUPLICATE_SKIP = 'skip'
+ON_DUPLICATE_REPLACE = 'replace'
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def _parse_recipe(line):
+    """Prüft eine Bundle-Zeile. Rückgabe: (name, description, image_path, instructions, [(zutat, menge, einheit)])."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Zeile ist kein JSON-Objekt")
+    name = record.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("'name' fehlt")
+    ingredients = []
+    for item in record.get('ingredients') or []:
+        ingredient_name = item.get('name') if isinstance(item, dict) else None
+        if not isinstance(ingredient_name, str) or not ingredient_name.strip():
+            raise ValueError(f"Zutat ohne Namen in Rezept '{name}'")
+        amount = item.get('amount')
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount <= 0:
+            raise ValueError(f"Ungültige Menge für '{ingredient_name}' in Rezept '{name}': {amount!r}")
+        unit = item.get('unit') or 'ml'
+        if not isinstance(unit, str):
+            raise ValueError(f"Ungültige Einheit für '{ingredient_name}' in Rezept '{name}': {unit!r}")
+        ingredients.append((ingredient_name.strip(), float(amount), unit))
+    for field in ('description', 'image_path', 'instructions'):
+        if not isinstance(record.get(field), (str, type(None))):
+            raise ValueError(f"'{field}' in Rezept '{name}' ist kein Text")
+    return (name.strip(), record.get('description'), record.get('image_path'),
+            record.get('instructions'), ingredients)
+
+
+def _import_batch(cur, batch, ingredient_ids, recipe_ids, on_duplicate, stats):
+    """Schreibt eine Runde Rezepte mit je einem executemany pro Tabelle."""
+    # Neue Zutaten anlegen und ihre IDs nachladen
+    new_ingredients = {}
+    for _, _, _, _, ingredients in batch:
+        for ingredient_name, _, _ in ingredients:
+            key = db._nocase(ingredient_name)
+            if key not in ingredient_ids:
+                new_ingredients.setdefault(key, ingredient_name)
+    if new_ingredients:
+        cur.execute("SELECT COALESCE(MAX(ingredient_id), 0) FROM ingredients")
+        max_id = cur.fetchone()[0]
+        cur.executemany("INSERT INTO ingredients(name) VALUES(?)", [(name,) for name in new_ingredients.values()])
+        cur.execute("SELECT ingredient_id, name FROM ingredients WHERE ingredient_id > ?", (max_id,))
+        for ingredient_id, name in cur.fetchall():
+            ingredient_ids[db._nocase(name)] = ingredient_id
+        stats['ingredients_created'] += len(new_ingredients)
+
+    # Rezepte: neue einfügen, vorhandene je nach on_duplicate überspringen oder ersetzen
+    inserts, replacements, accepted = [], [], []
+    seen = set()
+    for recipe in batch:
+        name, description, image_path, instructions, _ = recipe
+        key = db._nocase(name)
+        if key in seen:
+            stats['recipes_skipped'] += 1 # doppelt in derselben Runde
+            continue
+        seen.add(key)
+        if key in recipe_ids:
+            if on_duplicate != ON_DUPLICATE_REPLACE:
+                stats['recipes_skipped'] += 1
+                continue
+            replacements.append((description, image_path, instructions, recipe_ids[key]))
+        else:
+            inserts.append((name, description, image_path, instructions))
+        accepted.append(recipe)
+    if replacements:
+        cur.executemany("UPDATE recipes SET description = ?, image_path = ?, image_blob = NULL, instructions = ? WHERE recipe_id = ?",
+                        replacements)
+        cur.executemany("DELETE FROM recipe_ingredients WHERE recipe_id = ?", [(row[3],) for row in replacements])
+        stats['recipes_replaced'] += len(replacements)
+    if inserts:
+        cur.execute("SELECT COALESCE(MAX(recipe_id), 0) FROM recipes")
+        max_id = cur.fetchone()[0]
+        cur.executemany("INSERT INTO recipes(name, description, image_path, instructions) VALUES(?,?,?,?)", inserts)
+        cur.execute("SELECT recipe_id, name FROM recipes WHERE recipe_id > ?", (max_id,))
+        for recipe_id, name in cur.fetchall():
+            recipe_ids[db._nocase(name)] = recipe_id
+        stats['recipes_imported'] += len(inserts)
+
+    links = [(recipe_ids[db._nocase(name)], ingredient_ids[db._nocase(ingredient_name)], amount, unit)
+             for name, _, _, _, ingredients in accepted
+             for ingredient_name, amount, unit in ingredients]
+    cur.executemany("INSERT INTO recipe_ingredients(recipe_id, ingredient_id, amount, unit) VALUES(?,?,?,?)", links)
+    stats['recipe_ingredients'] += len(links)
+
+
+def import_bundle(path, on_duplicate=ON_DUPLICATE_SKIP, batch_size=IMPORT_BATCH_SIZE):
+    """Importiert ein Rezept-Bundle in einer einzigen Transaktion.
+
+    Zutaten- und Rezeptnamen werden im Speicher (ohne Groß-/Kleinschreibung) aufgelöst, geschrieben
+    wird mit executemany. Fehlerhafte Zeilen werden übersprungen und gezählt; bei jedem anderen
+    Fehler (DB, Datei, Kodierung, abgeschnittenes .gz) wird der gesamte Import zurückgerollt.
+    Rückgabe: Statistik-Dict oder None bei Fehlern.
+    """
+    stats = {'lines': 0, 'recipes_imported': 0, 'recipes_replaced': 0, 'recipes_skipped': 0,
+             'invalid_lines': 0, 'ingredients_created': 0, 'recipe_ingredients': 0}
+    started = time.perf_counter()
+    conn = db.create_connection()
+    if conn is None: return None
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT ingredient_id, name FROM ingredients")
+        ingredient_ids = {db._nocase(name): ingredient_id for ingredient_id, name in cur.fetchall()}
+        cur.execute("SELECT recipe_id, name FROM recipes")
+        recipe_ids = {db._nocase(name): recipe_id for recipe_id, name in cur.fetchall()}
+        with _open(path, 'r') as f:
+            batch = []
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                stats['lines'] += 1
+                try:
+                    batch.append(_parse_recipe(line))
+                except (ValueError, AttributeError, json.JSONDecodeError) as e:
+                    stats['invalid_lines'] += 1
+                    logger.warning(f"{path}:{line_number}: Zeile übersprungen ({e})")
+                    continue
+                if len(batch) >= batch_size:
+                    _import_batch(cur, batch, ingredient_ids, recipe_ids, on_duplicate, stats)
+                    batch = []
+            if batch:
+                _import_batch(cur, batch, ingredient_ids, recipe_ids, on_duplicate, stats)
+        conn.commit()
+    except BaseException as e:
+        # Auch bei unerwarteten Fehlern zurückrollen: die Verbindung ist die gepoolte des Threads,
+        # sonst bliebe die Schreibsperre gehalten und der nächste commit() übernähme einen halben Import.
+        conn.rollback()
+        if not isinstance(e, (Error, OSError, UnicodeDecodeError, EOFError)):
+            raise
+        logger.error(f"Import von '{path}' fehlgeschlagen, nichts übernommen: {e}")
+        return None
+    conn.close()
+    db.invalidate_catalog('ingredients', 'recipes', 'recipe_ingredients')
+    stats['seconds'] = time.perf_counter() - started
+    stats['recipes_per_second'] = (stats['recipes_imported'] + stats['recipes_replaced']) / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    logger.info(f"Import '{path}': {stats['recipes_imported']} neu, {stats['recipes_replaced']} ersetzt, "
+                f"{stats['recipes_skipped']} übersprungen, {stats['invalid_lines']} ungültig, "
+                f"{stats['ingredients_created']} neue Zutaten in {stats['seconds']:.2f}s "
+                f"({stats['recipes_per_second']:.0f} Rezepte/s).")
+    return stats
+
+
+def export_bundle(path):
+    """Schreibt alle Rezepte samt Zutaten als Bundle (Streaming, eine Abfrage). Rückgabe: Statistik-Dict oder None."""
+    sql = """ SELECT r.recipe_id, r.name, r.description, r.image_path, r.instructions, i.name, ri.amount, ri.unit
+              FROM recipes r
+              LEFT JOIN recipe_ingredients ri ON ri.recipe_id = r.recipe_id
+              LEFT JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
+              ORDER BY r.recipe_id, ri.recipe_ingredient_id """
+    started = time.perf_counter()
+    count = 0
+    conn = db.create_connection()
+    if conn is None: return None
+    try:
+        cur = conn.cursor()
+        cur.execute(sql)
+        with _open(path, 'w') as out:
+            rows = itertools.chain.from_iterable(iter(lambda: cur.fetchmany(500), []))
+            for _, group in itertools.groupby(rows, key=lambda row: row[0]):
+                group = list(group)
+                _, name, description, image_path, instructions = group[0][:5]
+                record = {'name': name, 'description': description, 'instructions': instructions,
+                          'image_path': image_path,
+                          'ingredients': [{'name': row[5], 'amount': row[6], 'unit': row[7]}
+                                          for row in group if row[5] is not None]}
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        conn.commit() # Lesetransaktion beenden
+    except (Error, OSError) as e:
+        logger.error(f"Export nach '{path}' fehlgeschlagen: {e}")
+        conn.close()
+        return None
+    conn.close()
+    seconds = time.perf_counter() - started
+    logger.info(f"Export '{path}': {count} Rezepte in {seconds:.2f}s.")
+    return {'recipes_exported': count, 'seconds': seconds}
+
+
+if __name__ == '__main__':
+    import log_setup
+    log_setup.setup_logging()
+    parser = argparse.ArgumentParser(description="Rezept-Bundles (JSON-Lines) importieren/exportieren.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Bundle in die Datenbank laden")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--replace', action='store_true', help="vorhandene Rezepte gleichen Namens ersetzen")
+    export_parser = subparsers.add_parser('export', help="alle Rezepte als Bundle schreiben")
+    export_parser.add_argument('path')
+    args = parser.parse_args()
+
+    db.initialize_database()
+    if args.command == 'import':
+        result = import_bundle(args.path, ON_DUPLICATE_REPLACE if args.replace else ON_DUPLICATE_SKIP)
+    else:
+        result = export_bundle(args.path)
+    sys.exit(0 if result is not None else 1)
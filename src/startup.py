@@ -0,0 +1,112 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger('Startup')
+
+# Gestaffelter Start: das Hauptmenü wird zuerst gezeichnet, Datenbank und GPIO werden im
+# Hintergrund vorbereitet. Wer sie braucht, wartet mit wait_ready() bzw. prüft is_ready().
+STAGE_DATABASE = 'Datenbank'
+STAGE_GPIO = 'GPIO'
+
+_ready = {}  # Stufe -> threading.Event
+_ready_lock = threading.Lock()
+
+
+def _event(name):
+    with _ready_lock:
+        return _ready.setdefault(name, threading.Event())
+
+def set_ready(name):
+    _event(name).set()
+
+def is_ready(name):
+    return _event(name).is_set()
+
+def wait_ready(name, timeout=None):
+    """Blockiert, bis die Stufe fertig ist. Rückgabe: True, wenn sie fertig ist."""
+    return _event(name).wait(timeout)
+
+
+class StartupReport:
+    """Zeitmessung des App-Starts: Stufen (mit Dauer) und Zeitpunkte seit Prozessstart."""
+
+    def __init__(self, process_start=None):
+        self.process_start = process_start if process_start is not None else time.perf_counter()
+        self._entries = [] # (Name, Start seit Prozessstart, Dauer oder None, Thread)
+        self._required = ()
+        self._logged = False
+        self._lock = threading.Lock()
+
+    def _add(self, name, offset, duration):
+        with self._lock:
+            self._entries.append((name, offset, duration, threading.current_thread().name))
+        self._log_if_complete()
+
+    @contextmanager
+    def stage(self, name):
+        """Misst einen Startschritt: with report.stage('KV laden'): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            self._add(name, started - self.process_start, finished - started)
+
+    def mark(self, name):
+        """Merkt sich einen Zeitpunkt (z.B. 'Erstes Bild', 'Menü sichtbar')."""
+        self._add(name, time.perf_counter() - self.process_start, None)
+
+    def log_when_complete(self, *names):
+        """Gibt den Bericht einmalig aus, sobald alle genannten Stufen/Zeitpunkte erfasst sind."""
+        with self._lock:
+            self._required = names
+        self._log_if_complete()
+
+    def _log_if_complete(self):
+        with self._lock:
+            seen = {entry[0] for entry in self._entries}
+            if self._logged or not self._required or not all(name in seen for name in self._required):
+                return
+            self._logged = True
+        logger.info("Startbericht:\n" + "\n".join(self.lines()))
+
+    def lines(self):
+        with self._lock:
+            entries = sorted(self._entries, key=lambda entry: entry[1] + (entry[2] or 0.0))
+        lines = []
+        for name, offset, duration, thread_name in entries:
+            if duration is None:
+                lines.append(f"  {offset * 1000:8.1f}ms  {name}")
+            else:
+                lines.append(f"  {offset * 1000:8.1f}ms  {name}: {duration * 1000:.1f}ms ({thread_name})")
+        return lines
+
+
+report = StartupReport()
+
+def begin(process_start):
+    """Setzt den Prozessstart (so früh wie möglich in main.py gemessen)."""
+    report.process_start = process_start
+
+def run_in_background(stages):
+    """Führt [(Name, Funktion), ...] nacheinander in einem Hintergrund-Thread aus.
+
+    Jede Stufe wird gemessen und danach als fertig markiert - auch bei Fehlern, damit
+    Wartende nicht hängen bleiben. Rückgabe: der Thread.
+    """
+    def run():
+        for name, fn in stages:
+            try:
+                with report.stage(name):
+                    result = fn()
+                if result is False:
+                    logger.warning(f"Startstufe '{name}' meldet einen Fehler.")
+            except Exception as e:
+                logger.exception(f"Startstufe '{name}' fehlgeschlagen: {e}")
+            finally:
+                set_ready(name)
+    thread = threading.Thread(target=run, name='StartupInit', daemon=True)
+    thread.start()
+    return thread
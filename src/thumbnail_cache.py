@@ -0,0 +1,260 @@
+import os
+import glob
+import queue
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import app_config
+import database_manager as db
+
+# Pillow wird für Vorschaubilder benötigt: ohne Pillow zeigt das Menü keine Bilder an
+# (Originale würden sonst im UI-Thread in voller Größe dekodiert).
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+logger = logging.getLogger('ThumbnailCache')
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+IMAGE_FOLDER = os.path.join(PROJECT_ROOT, 'images')
+THUMBNAIL_FOLDER = os.path.join(PROJECT_ROOT, 'cache', 'thumbnails')
+THUMBNAIL_SIZE = 128          # Kantenlänge in Pixeln (Bildschirmgröße der Menü-Vorschau)
+TEXTURE_CACHE_ENTRIES = 64    # Maximale Anzahl Texturen im GPU-Cache
+TEXTURE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+def load_config():
+    """Übernimmt Ordner und Größen für Vorschaubilder aus der gemeinsamen Konfiguration."""
+    global IMAGE_FOLDER, THUMBNAIL_FOLDER, THUMBNAIL_SIZE, TEXTURE_CACHE_ENTRIES
+    config = app_config.get_config()
+    if config is None:
+        return False
+    IMAGE_FOLDER = config.image_folder
+    THUMBNAIL_FOLDER = config.thumbnail_folder
+    THUMBNAIL_SIZE = config.thumbnail_size
+    TEXTURE_CACHE_ENTRIES = config.texture_cache_entries
+    return True
+
+
+# ========== Thumbnail-Erzeugung (Hintergrund-Thread) ==========
+
+_index = {}              # recipe_id -> (content_hash, thumbnail_path)
+_index_version = {}      # recipe_id -> Katalog-Version ('recipes'), mit der der Eintrag geprüft wurde
+_index_lock = threading.Lock()
+_pending = set()
+_callbacks = {}          # recipe_id -> [callback(recipe_id, thumbnail_path)]
+_job_queue = queue.Queue()
+_worker = None
+_stats = {'generated': 0, 'disk_hits': 0, 'failed': 0}
+_pillow_warned = False
+
+
+def _source_signature(recipe_id):
+    """Ermittelt Quelle und Inhalts-Hash des Rezeptbildes, ohne es zu dekodieren.
+
+    Rückgabe: (content_hash, source) mit source = ('blob', recipe_id) oder ('path', dateipfad);
+    None, wenn das Rezept kein Bild hat.
+    """
+    info = db.get_recipe_image_info(recipe_id)
+    if info is None:
+        return None
+    image_path, blob_size = info
+    digest = hashlib.sha1()
+    if blob_size:
+        for chunk in db.iter_recipe_image_chunks(recipe_id):
+            digest.update(chunk)
+        return digest.hexdigest()[:16], ('blob', recipe_id)
+    if image_path:
+        full_path = image_path if os.path.isabs(image_path) else os.path.join(IMAGE_FOLDER, image_path)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            logger.warning(f"Bilddatei für Rezept ID {recipe_id} nicht gefunden: {full_path}")
+            return None
+        # Für Dateien genügt Pfad + Änderungszeit + Größe als Inhaltsschlüssel
+        digest.update(f"{os.path.abspath(full_path)}|{st.st_mtime_ns}|{st.st_size}".encode('utf-8'))
+        return digest.hexdigest()[:16], ('path', full_path)
+    return None
+
+
+def _write_thumbnail(source, target_path):
+    """Dekodiert das Originalbild einmal und schreibt ein verkleinertes PNG (benötigt Pillow)."""
+    kind, ref = source
+    tmp_path = target_path + '.tmp'
+    if kind == 'blob':
+        import io
+        image = PILImage.open(io.BytesIO(db.get_recipe_image_blob(ref) or b''))
+    else:
+        image = PILImage.open(ref)
+    with image:
+        image.draft('RGB', (THUMBNAIL_SIZE, THUMBNAIL_SIZE)) # JPEG: schon beim Dekodieren verkleinern
+        thumb = image.convert('RGBA')
+        thumb.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        thumb.save(tmp_path, format='PNG', optimize=True)
+    os.replace(tmp_path, target_path)
+
+
+def _process(recipe_id):
+    global _pillow_warned
+    if PILImage is None:
+        if not _pillow_warned:
+            _pillow_warned = True
+            logger.warning("Pillow ist nicht installiert - das Menü wird ohne Vorschaubilder angezeigt.")
+        return None
+    signature = _source_signature(recipe_id)
+    if signature is None:
+        return None
+    content_hash, source = signature
+    # Kantenlänge im Namen: ältere Dateien anderer Größe (auch unverkleinerte Kopien) gelten nicht
+    target_path = os.path.join(THUMBNAIL_FOLDER, f"{recipe_id}_{content_hash}_{THUMBNAIL_SIZE}.png")
+    if os.path.exists(target_path):
+        _stats['disk_hits'] += 1
+        return content_hash, target_path
+    os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+    _write_thumbnail(source, target_path)
+    _stats['generated'] += 1
+    # Veraltete Vorschaubilder dieses Rezepts entfernen
+    for old_path in glob.glob(os.path.join(THUMBNAIL_FOLDER, f"{recipe_id}_*.png")):
+        if old_path != target_path:
+            try:
+                os.remove(old_path)
+            except OSError as e:
+                logger.warning(f"Konnte altes Vorschaubild nicht löschen ({old_path}): {e}")
+    logger.debug(f"Vorschaubild für Rezept ID {recipe_id} erzeugt: {target_path}")
+    return content_hash, target_path
+
+
+def _worker_loop():
+    while True:
+        recipe_id = _job_queue.get()
+        if recipe_id is None:
+            break
+        version = db.get_catalog_version('recipes')
+        thumbnail_path = None
+        try:
+            result = _process(recipe_id)
+            if result is not None:
+                thumbnail_path = result[1]
+        except Exception as e:
+            _stats['failed'] += 1
+            logger.error(f"Fehler beim Erzeugen des Vorschaubilds für Rezept ID {recipe_id}: {e}")
+            result = None
+        with _index_lock:
+            if result is not None:
+                _index[recipe_id] = result
+            else:
+                _index.pop(recipe_id, None)
+            _index_version[recipe_id] = version
+            _pending.discard(recipe_id)
+            callbacks = _callbacks.pop(recipe_id, [])
+        for callback in callbacks:
+            try:
+                callback(recipe_id, thumbnail_path)
+            except Exception as e:
+                logger.error(f"Fehler im Thumbnail-Callback für Rezept ID {recipe_id}: {e}")
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        load_config()
+        _worker = threading.Thread(target=_worker_loop, name='ThumbnailWorker', daemon=True)
+        _worker.start()
+
+
+def get_thumbnail_path(recipe_id, callback=None):
+    """Pfad des Vorschaubilds, falls bereits erzeugt und aktuell; sonst None.
+
+    Fehlt das Bild oder hat sich das Rezept seitdem geändert, wird es im Hintergrund erzeugt
+    und callback(recipe_id, thumbnail_path) anschließend aus dem Worker-Thread aufgerufen.
+    """
+    version = db.get_catalog_version('recipes')
+    with _index_lock:
+        if _index_version.get(recipe_id) == version:
+            entry = _index.get(recipe_id)
+            return entry[1] if entry else None
+        if callback is not None:
+            _callbacks.setdefault(recipe_id, []).append(callback)
+        if recipe_id in _pending:
+            return None
+        _pending.add(recipe_id)
+    _ensure_worker()
+    _job_queue.put(recipe_id)
+    return None
+
+
+def prefetch(recipe_ids):
+    """Stellt Vorschaubilder für mehrere Rezepte im Hintergrund bereit."""
+    for recipe_id in recipe_ids:
+        get_thumbnail_path(recipe_id)
+
+
+def stop_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        _job_queue.put(None)
+        _worker.join(timeout=2.0)
+    _worker = None
+
+
+def get_stats():
+    """Zähler des Thumbnail-Generators (zum Tuning)."""
+    with _index_lock:
+        paths = [entry[1] for entry in _index.values()]
+        stats = dict(_stats, indexed=len(paths), pending=len(_pending))
+    stats['bytes_on_disk'] = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+    return stats
+
+
+# ========== Textur-Cache (Kivy, nur im UI-Thread benutzen) ==========
+
+class TextureCache:
+    """LRU-Cache für Kivy-Texturen der Vorschaubilder, begrenzt nach Anzahl und Bytes."""
+
+    def __init__(self, max_entries=None, max_bytes=TEXTURE_CACHE_MAX_BYTES):
+        load_config()
+        self.max_entries = max_entries or TEXTURE_CACHE_ENTRIES
+        self.max_bytes = max_bytes
+        self._textures = OrderedDict() # thumbnail_path -> (texture, size_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+
+    def get(self, thumbnail_path):
+        """Textur für ein (kleines) Vorschaubild; lädt es beim ersten Zugriff."""
+        if not thumbnail_path:
+            return None
+        entry = self._textures.get(thumbnail_path)
+        if entry is not None:
+            self._textures.move_to_end(thumbnail_path)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        # Erst hier importieren, damit das Modul auch ohne Kivy (z.B. im Generator) nutzbar bleibt
+        from kivy.core.image import Image as CoreImage
+        try:
+            texture = CoreImage(thumbnail_path).texture
+        except Exception as e:
+            logger.error(f"Konnte Vorschaubild nicht laden ({thumbnail_path}): {e}")
+            return None
+        size_bytes = texture.width * texture.height * 4
+        self._textures[thumbnail_path] = (texture, size_bytes)
+        self.total_bytes += size_bytes
+        self._evict()
+        return texture
+
+    def _evict(self):
+        while self._textures and (len(self._textures) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, (_, size_bytes) = self._textures.popitem(last=False)
+            self.total_bytes -= size_bytes
+            self.evictions += 1
+
+    def clear(self):
+        self._textures.clear()
+        self.total_bytes = 0
+
+    def get_stats(self):
+        return {'entries': len(self._textures), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'total_bytes': self.total_bytes}
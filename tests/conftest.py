@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+
+# Die Module in src/ importieren sich gegenseitig ohne Paketpräfix (wie beim Start aus src/)
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Neue, initialisierte Datenbank in tmp_path (data/cocktails.db bleibt unberührt)."""
+    import database_manager as db
+    db.close_all_connections()
+    monkeypatch.setattr(db, 'DATABASE_PATH', str(tmp_path / 'cocktails.db'))
+    monkeypatch.setattr(db, 'POUR_LOG_WRITE_BEHIND', False)
+    db.invalidate_catalog()
+    db.initialize_database()
+    yield db
+    db.close_all_connections()
+    db.invalidate_catalog()
+
+
+# Nicht zu schnell: Verspätungen durch Thread-Wechsel zählen in virtueller Zeit speed-fach
+SIMULATION_SPEED = 10.0
+
+@pytest.fixture
+def simulated_pumps(fresh_db, monkeypatch):
+    """pump_controller mit SimulatedGPIOBackend (virtuelle Uhr, 10x Echtzeit) auf fresh_db."""
+    import gpio_backend
+    import pump_controller as pc
+    backend = gpio_backend.SimulatedGPIOBackend(speed=SIMULATION_SPEED)
+    monkeypatch.setattr(pc, 'GPIO', backend)
+    monkeypatch.setattr(pc, '_timing_engine', None)
+    monkeypatch.setattr(pc, '_pins_ready', False)
+    assert pc.setup_pumps()
+    yield backend
+    pc.cleanup_gpio()
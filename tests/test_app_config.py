@@ -0,0 +1,89 @@
+import os
+import pytest
+import yaml
+import app_config
+
+VALID = {'pump_pins': [17, 18, 27], 'database_path': 'data/test.db'}
+
+
+def _parse(**overrides):
+    raw = dict(VALID)
+    raw.update(overrides)
+    return app_config.parse_config(raw)
+
+
+def test_minimal_config_gets_defaults():
+    config = _parse()
+    assert config.pump_pins == (17, 18, 27)
+    assert config.database_path == os.path.join(app_config.PROJECT_ROOT, 'data/test.db')
+    assert config.glass_sizes == {'Medium': 200.0}
+    assert config.default_glass_size == 'Medium'
+    assert config.gpio_backend == 'rpi'
+    assert config.log_level == 'INFO' and config.log_rotation == 'size'
+    assert not config.pour_log_write_behind
+
+
+def test_valid_values_are_kept():
+    config = _parse(glass_sizes={'Klein': 150, 'Groß': 300}, gpio_backend='Simulated', simulation_speed=20,
+                    pour_log={'write_behind': True, 'batch_size': 5, 'buffer_size': 50, 'retention_days': 90},
+                    logging={'level': 'debug', 'levels': {'kivy': 'warning'}, 'rotation': 'time', 'when': 'midnight'},
+                    technician_pin=4711)
+    assert config.glass_sizes == {'Klein': 150.0, 'Groß': 300.0}
+    assert config.default_glass_size == 'Klein'
+    assert config.glass_volume('Groß') == 300.0 and config.glass_volume('XXL', 123.0) == 123.0
+    assert config.gpio_backend == 'simulated' and config.simulation_speed == 20.0
+    assert (config.pour_log_write_behind, config.pour_log_batch_size, config.pour_log_buffer_size,
+            config.pour_log_retention_days) == (True, 5, 50, 90)
+    assert config.log_level == 'DEBUG' and config.log_levels == {'kivy': 'WARNING'}
+    assert config.log_rotation == 'time'
+    assert config.technician_pin == '4711'
+
+
+@pytest.mark.parametrize('overrides', [
+    {'pump_pins': []},
+    {'pump_pins': [17, 17]},
+    {'pump_pins': [17, 'x']},
+    {'pump_pins': [True]},
+    {'database_path': 42},
+    {'glass_sizes': {'Medium': 0}},
+    {'glass_sizes': [200]},
+    {'gpio_backend': 'pigpio'},
+    {'simulation_speed': -1},
+    {'simulation_speed': True},
+    {'thumbnail_size': 0},
+    {'pour_log': {'write_behind': 'yes'}},
+    {'pour_log': {'batch_size': 50, 'buffer_size': 10}},
+    {'pour_log': {'retention_days': -1}},
+    {'logging': {'level': 'LOUD'}},
+    {'logging': {'levels': {'kivy': 'LOUD'}}},
+    {'logging': {'rotation': 'weekly'}},
+    {'logging': {'max_bytes': 0}},
+])
+def test_invalid_values_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        _parse(**overrides)
+
+
+@pytest.mark.parametrize('key', ['pump_pins', 'database_path'])
+def test_missing_required_key_is_rejected(key):
+    raw = {k: v for k, v in VALID.items() if k != key}
+    with pytest.raises(ValueError):
+        app_config.parse_config(raw)
+
+
+def test_not_a_dictionary_is_rejected():
+    with pytest.raises(ValueError):
+        app_config.parse_config(['pump_pins'])
+
+
+def test_invalid_file_keeps_last_valid_config(tmp_path, monkeypatch):
+    path = tmp_path / 'config.yaml'
+    monkeypatch.setattr(app_config, 'CONFIG_PATH', str(path))
+    monkeypatch.setattr(app_config, '_config', None)
+    monkeypatch.setattr(app_config, '_config_mtime', None)
+    path.write_text(yaml.safe_dump(dict(VALID, technician_pin='1111')))
+    assert app_config.get_config().technician_pin == '1111'
+
+    path.write_text(yaml.safe_dump(dict(VALID, pump_pins=[])))
+    os.utime(path, ns=(0, 1)) # andere Änderungszeit erzwingen
+    assert app_config.get_config().technician_pin == '1111'
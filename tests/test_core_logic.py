@@ -0,0 +1,100 @@
+import pytest
+import core_logic as core
+
+TARGETS_ML = (100.0, 200.0, 600.0, 800.0)
+
+# (Zutat, Pumpe, Kalibrierung ml/s, Restmenge ml); Pumpe None = nicht zugewiesen
+PUMPS = [('Rum', 0, 10.0, 500.0), ('Cola', 1, 10.0, 1000.0), ('Limette', 2, 10.0, 30.0),
+         ('Gin', 3, None, 500.0), ('Wodka', 4, 10.0, 0.0), ('Zucker', 5, 10.0, 100.0), ('Tonic', None, None, None)]
+RECIPES = {
+    'Cuba Libre': [('Rum', 50, 'ml'), ('Cola', 150, 'ml'), ('Limette', 10, 'ml')],
+    'Rum Cola': [('Rum', 40, 'ml'), ('Cola', 160, 'ml')],
+    'Gin Tonic': [('Gin', 50, 'ml'), ('Tonic', 150, 'ml')],   # Tonic an keiner Pumpe
+    'Gin pur': [('Gin', 40, 'ml')],                           # Pumpe nicht kalibriert
+    'Wodka pur': [('Wodka', 40, 'ml')],                       # Pumpe leer
+    'Rum pur': [('Rum', 40, 'ml')],                           # reicht bis 500 ml
+    'Caipi': [('Rum', 50, 'ml'), ('Limette', 20, 'ml'), ('Zucker', 2, 'TL')],
+    'Leer': [],
+}
+
+
+@pytest.fixture
+def catalog(fresh_db):
+    ingredient_ids = {}
+    for name, pump_index, calibration, volume in PUMPS:
+        ingredient_ids[name] = fresh_db.add_ingredient(name)
+        if pump_index is not None:
+            fresh_db.assign_ingredient_to_pump(pump_index, ingredient_ids[name])
+            fresh_db.update_pump_volume(pump_index, volume)
+            if calibration:
+                fresh_db.update_pump_calibration(pump_index, calibration)
+    for recipe_name, ingredients in RECIPES.items():
+        recipe_id = fresh_db.add_recipe(recipe_name)
+        for name, amount, unit in ingredients:
+            fresh_db.add_ingredient_to_recipe(recipe_id, ingredient_ids[name], amount, unit)
+    return fresh_db
+
+
+def _plan_pourable(db, target_volume_ml):
+    """Referenz: Ausgabeplan je Rezept und check_plan_availability()."""
+    pourable = set()
+    for recipe_id, *_ in db.get_all_recipes():
+        plan = core.get_pour_plan(recipe_id, target_volume_ml)
+        if plan is not None and core.check_plan_availability(plan)[0]:
+            pourable.add(recipe_id)
+    return pourable
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def index(request, catalog, monkeypatch):
+    if request.param == 'numpy':
+        numpy = pytest.importorskip('numpy')
+        monkeypatch.setattr(core, 'np', numpy)
+    else:
+        monkeypatch.setattr(core, 'np', None)
+    return core.AvailabilityIndex([row[0] for row in catalog.get_all_recipes()], catalog.get_all_recipe_ingredient_rows())
+
+
+def test_makeable_matches_get_available_recipes(catalog, index):
+    assigned, _ = core._pump_stock()
+    expected = {row[0] for row in core.get_available_recipes()}
+    assert index.makeable(assigned) == expected
+    names = {row[0]: row[1] for row in catalog.get_all_recipes()}
+    assert {names[recipe_id] for recipe_id in expected} == {'Cuba Libre', 'Rum Cola', 'Gin pur', 'Wodka pur', 'Rum pur', 'Caipi'}
+
+
+@pytest.mark.parametrize('target_volume_ml', TARGETS_ML)
+def test_pourable_matches_check_plan_availability(catalog, index, target_volume_ml):
+    _, available_ml = core._pump_stock()
+    assert index.pourable(target_volume_ml, available_ml) == _plan_pourable(catalog, target_volume_ml)
+
+
+def test_pourable_depends_on_stock(catalog, index):
+    names = {row[1]: row[0] for row in catalog.get_all_recipes()}
+    _, available_ml = core._pump_stock()
+    assert names['Cuba Libre'] in index.pourable(200.0, available_ml)
+    assert names['Cuba Libre'] not in index.pourable(800.0, available_ml) # 40 ml Limette, nur 30 da
+    assert names['Caipi'] in index.pourable(100.0, available_ml)
+    assert names['Caipi'] not in index.pourable(200.0, available_ml)
+
+
+@pytest.mark.parametrize('target_volume_ml', TARGETS_ML)
+def test_tracker_states_match_index(catalog, target_volume_ml):
+    assigned, available_ml = core._pump_stock()
+    tracker = core.get_availability_tracker()
+    tracker.refresh(target_volume_ml)
+    index = core.get_availability_index()
+    assert set(tracker.states) == index.makeable(assigned)
+    assert {recipe_id for recipe_id, ok in tracker.states.items() if ok} == _plan_pourable(catalog, target_volume_ml)
+
+
+def test_tracker_diff_after_stock_change(catalog):
+    names = {row[1]: row[0] for row in catalog.get_all_recipes()}
+    tracker = core.get_availability_tracker()
+    tracker.refresh(200.0)
+    catalog.update_pump_volume(2, 5.0) # Limette fast leer
+    diff = tracker.refresh(200.0)
+    assert not diff.full
+    assert names['Cuba Libre'] in diff.changed
+    assert tracker.states[names['Cuba Libre']] is False
+    assert {recipe_id for recipe_id, ok in tracker.states.items() if ok} == _plan_pourable(catalog, 200.0)
@@ -0,0 +1,24 @@
+import app_config
+
+
+def test_fresh_database_has_default_settings(fresh_db):
+    config = app_config.get_config()
+    assert fresh_db.get_setting('TechnicianPIN') == config.technician_pin
+    assert fresh_db.get_setting('SelectedGlassSize') == config.default_glass_size
+    assert fresh_db.get_setting(fresh_db.CATALOG_REVISION_KEY) is not None
+
+
+def test_initialize_keeps_existing_settings(fresh_db):
+    fresh_db.set_setting('TechnicianPIN', '9999')
+    fresh_db.initialize_database()
+    assert fresh_db.get_setting('TechnicianPIN') == '9999'
+
+
+def _pour_log_ids(db):
+    return [row[0] for row in db.create_connection().execute("SELECT log_id FROM pour_log ORDER BY log_id")]
+
+
+def test_add_pour_log_entry_returns_new_log_id(fresh_db):
+    first = fresh_db.add_pour_log_entry(None, 200.0)
+    second = fresh_db.add_pour_log_entry(None, 300.0)
+    assert [first, second] == _pour_log_ids(fresh_db)
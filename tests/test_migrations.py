@@ -0,0 +1,106 @@
+import sqlite3
+import pytest
+import database_manager as db
+
+
+def _names(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """Datenbank im Stand vor den Migrationen (Basisschema, user_version 0) mit etwas Inhalt."""
+    path = str(tmp_path / 'baseline.db')
+    conn = sqlite3.connect(path)
+    db._migration_base_schema(conn.cursor())
+    conn.execute("INSERT INTO ingredients(name) VALUES('Rum')")
+    conn.execute("INSERT INTO recipes(name) VALUES('Rum pur')")
+    conn.execute("INSERT INTO recipe_ingredients(recipe_id, ingredient_id, amount) VALUES(1, 1, 40)")
+    conn.execute("INSERT INTO settings(key, value) VALUES('TechnicianPIN', '4711')")
+    conn.execute("INSERT INTO pour_log(timestamp, recipe_id, size_ml) VALUES('2024-01-01 20:00:00', 1, 200)")
+    conn.commit()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+    db.close_all_connections()
+    monkeypatch.setattr(db, 'DATABASE_PATH', path)
+    db.invalidate_catalog()
+    yield path
+    db.close_all_connections()
+    db.invalidate_catalog()
+
+
+def _assert_current_schema(conn):
+    assert db.get_schema_version(conn) == db.SCHEMA_VERSION
+    tables = _names(conn, 'table')
+    assert {'ingredients', 'recipes', 'recipe_ingredients', 'pumps', 'settings', 'pour_log'} <= tables
+    assert {'pour_stats_recipe_hourly', 'pour_stats_recipe_daily', 'pour_stats_ingredient_daily'} <= tables
+    assert {'idx_recipe_ingredients_recipe', 'idx_recipe_ingredients_ingredient',
+            'idx_pumps_assigned_ingredient', 'idx_pour_log_timestamp'} <= _names(conn, 'index')
+    triggers = _names(conn, 'trigger')
+    for table in db._CATALOG_REVISION_TABLES:
+        for event in ('insert', 'update', 'delete'):
+            assert f"trg_catalog_revision_{table}_{event}" in triggers
+
+
+def test_upgrade_from_user_version_0_keeps_data(baseline_db):
+    db.initialize_database()
+    conn = db.create_connection()
+    _assert_current_schema(conn)
+    assert db.get_all_recipes()[0][1] == 'Rum pur'
+    assert db.get_ingredients_for_recipe(1) == [('Rum', 40.0, 'ml')]
+    assert conn.execute("SELECT COUNT(*) FROM pour_log").fetchone()[0] == 1
+    assert db.get_setting('TechnicianPIN') == '4711' # vorhandene Einstellung bleibt
+    assert db.get_setting('SelectedGlassSize') is not None # fehlende Standardeinstellung ergänzt
+    assert db.get_catalog_revision() is not None
+
+
+def test_fresh_database_gets_current_schema_and_defaults(fresh_db):
+    _assert_current_schema(fresh_db.create_connection())
+    assert fresh_db.get_setting('TechnicianPIN') is not None
+    assert fresh_db.get_setting('SelectedGlassSize') is not None
+    assert len(fresh_db.get_all_pumps_info()) == fresh_db.PUMP_COUNT
+
+
+def test_catalog_revision_triggers(fresh_db):
+    before = fresh_db.get_catalog_revision()
+    recipe_id = fresh_db.add_recipe('Test')
+    fresh_db.update_pump_calibration(0, 12.5)
+    fresh_db.create_connection().execute("DELETE FROM recipes WHERE recipe_id = ?", (recipe_id,))
+    assert fresh_db.get_catalog_revision() == before + 3
+
+
+def test_pour_does_not_change_catalog_revision(fresh_db):
+    fresh_db.update_pump_volume(0, 1000.0)
+    before = fresh_db.get_catalog_revision()
+    assert fresh_db.commit_pour(None, 200.0, {0: 150.0}) is not None
+    fresh_db.update_pump_volume(1, 500.0) # Nachfüllen ist ebenfalls keine Katalogänderung
+    assert fresh_db.get_catalog_revision() == before
+
+
+def test_upgrade_from_version_4_replaces_pump_update_trigger(fresh_db):
+    conn = fresh_db.create_connection()
+    conn.execute("DROP TRIGGER trg_catalog_revision_pumps_update")
+    conn.execute(f""" CREATE TRIGGER trg_catalog_revision_pumps_update AFTER UPDATE ON pumps
+                      BEGIN
+                          UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE key = '{fresh_db.CATALOG_REVISION_KEY}';
+                      END """)
+    conn.execute("PRAGMA user_version = 4")
+    conn.commit()
+    assert fresh_db.migrate_database(conn)
+    _assert_current_schema(conn)
+    before = fresh_db.get_catalog_revision()
+    fresh_db.update_pump_volume(0, 500.0)
+    assert fresh_db.get_catalog_revision() == before
+
+
+def test_migrations_are_idempotent(fresh_db):
+    conn = fresh_db.create_connection()
+    assert fresh_db.migrate_database(conn)
+    fresh_db.initialize_database()
+    _assert_current_schema(conn)
+
+
+def test_newer_schema_is_refused(fresh_db):
+    conn = fresh_db.create_connection()
+    conn.execute(f"PRAGMA user_version = {fresh_db.SCHEMA_VERSION + 1}")
+    assert not fresh_db.migrate_database(conn)
@@ -0,0 +1,91 @@
+import os
+import datetime
+import dataclasses
+import pytest
+import app_config
+import pour_archive
+
+NOW = datetime.datetime(2024, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def archive(fresh_db, tmp_path, monkeypatch):
+    """Archivordner in tmp_path, drei Einträge pro Archivdatei. Rückgabe: Ordner."""
+    folder = str(tmp_path / 'archive')
+    config = dataclasses.replace(app_config.get_config(), pour_log_archive_folder=folder,
+                                 pour_log_archive_chunk_rows=3, pour_log_retention_days=30)
+    monkeypatch.setattr(app_config, 'get_config', lambda: config)
+    return folder
+
+
+def _add_pours(db, days_ago, count, recipe_id=None):
+    conn = db.create_connection()
+    for i in range(count):
+        timestamp = NOW - datetime.timedelta(days=days_ago, minutes=count - i)
+        conn.execute("INSERT INTO pour_log(timestamp, recipe_id, size_ml) VALUES(?,?,?)",
+                     (timestamp.isoformat(" "), recipe_id, 200.0))
+    conn.commit()
+
+def _hot_ids(db):
+    return [row[0] for row in db.create_connection().execute("SELECT log_id FROM pour_log ORDER BY log_id")]
+
+
+def test_old_pours_are_moved_in_chunks(fresh_db, archive):
+    recipe_id = fresh_db.add_recipe('Cuba Libre')
+    _add_pours(fresh_db, 60, 7, recipe_id)
+    _add_pours(fresh_db, 1, 2, recipe_id)
+
+    assert pour_archive.archive_old_pours(now=NOW) == 7
+    files = [os.path.basename(path) for path in pour_archive.iter_archive_files()]
+    assert files == ['pour_log_0000000001-0000000003.jsonl.gz', 'pour_log_0000000004-0000000006.jsonl.gz',
+                     'pour_log_0000000007-0000000007.jsonl.gz']
+    assert not [name for name in os.listdir(archive) if name.endswith('.tmp')]
+    assert _hot_ids(fresh_db) == [8, 9]
+
+    history = list(pour_archive.iter_pour_history())
+    assert [row[0] for row in history] == list(range(1, 10)) # jeder Eintrag genau einmal, chronologisch
+    assert all(row[3] == 'Cuba Libre' and row[4] == 200.0 for row in history)
+    assert history[0][1] == NOW - datetime.timedelta(days=60, minutes=7)
+
+    # Zweiter Lauf findet nichts mehr
+    assert pour_archive.archive_old_pours(now=NOW) == 0
+    assert len(pour_archive.iter_archive_files()) == 3
+
+
+def test_history_since_skips_older_entries(fresh_db, archive):
+    _add_pours(fresh_db, 60, 4)
+    _add_pours(fresh_db, 1, 2)
+    pour_archive.archive_old_pours(now=NOW)
+    since = NOW - datetime.timedelta(days=60, minutes=2)
+    assert [row[0] for row in pour_archive.iter_pour_history(since=since)] == [3, 4, 5, 6]
+    assert [row[0] for row in pour_archive.iter_pour_history(since=NOW - datetime.timedelta(days=2))] == [5, 6]
+
+
+def test_rows_are_deleted_only_after_their_chunk_is_written(fresh_db, archive, monkeypatch):
+    _add_pours(fresh_db, 60, 7)
+    write_chunk = pour_archive._write_chunk
+    def failing_second_chunk(path, rows):
+        if pour_archive.iter_archive_files():
+            raise OSError("Datenträger voll")
+        write_chunk(path, rows)
+    monkeypatch.setattr(pour_archive, '_write_chunk', failing_second_chunk)
+
+    assert pour_archive.archive_old_pours(now=NOW) is None
+    assert len(pour_archive.iter_archive_files()) == 1
+    assert _hot_ids(fresh_db) == [4, 5, 6, 7]
+    assert [row[0] for row in pour_archive.iter_pour_history()] == list(range(1, 8))
+
+
+def test_archiving_disabled_or_nothing_old(fresh_db, archive):
+    _add_pours(fresh_db, 60, 2)
+    assert pour_archive.archive_old_pours(retention_days=0, now=NOW) == 0
+    assert pour_archive.archive_old_pours(retention_days=90, now=NOW) == 0
+    assert pour_archive.iter_archive_files() == []
+    assert _hot_ids(fresh_db) == [1, 2]
+
+
+def test_archiving_returns_free_pages_in_incremental_mode(fresh_db, archive):
+    assert pour_archive.convert_to_incremental_vacuum()
+    _add_pours(fresh_db, 60, 2000)
+    assert pour_archive.archive_old_pours(now=NOW) == 2000
+    assert fresh_db.create_connection().execute("PRAGMA freelist_count").fetchone()[0] == 0
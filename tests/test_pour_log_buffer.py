@@ -0,0 +1,85 @@
+import time
+import pytest
+
+
+@pytest.fixture
+def write_behind(fresh_db, monkeypatch):
+    """Pour-Log im Write-Behind-Modus; Flush nur über batch_size, nicht über das Intervall."""
+    monkeypatch.setattr(fresh_db, 'POUR_LOG_WRITE_BEHIND', True)
+    monkeypatch.setattr(fresh_db, 'POUR_LOG_FLUSH_INTERVAL_S', 60.0)
+    monkeypatch.setattr(fresh_db, 'POUR_LOG_BATCH_SIZE', 100)
+    monkeypatch.setattr(fresh_db, 'POUR_LOG_BUFFER_SIZE', 500)
+    assert fresh_db._pour_log_buffer == []
+    yield fresh_db
+    fresh_db.stop_pour_log_writer()
+    del fresh_db._pour_log_buffer[:]
+
+
+def _logged_rows(db):
+    return db.create_connection().execute("SELECT COUNT(*) FROM pour_log").fetchone()[0]
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_entries_are_buffered_until_batch_size(write_behind, monkeypatch):
+    monkeypatch.setattr(write_behind, 'POUR_LOG_BATCH_SIZE', 3)
+    recipe_id = write_behind.add_recipe('Cuba Libre')
+    assert write_behind.add_pour_log_entry(recipe_id, 200.0) is True
+    assert write_behind.add_pour_log_entry(recipe_id, 200.0) is True
+    assert _logged_rows(write_behind) == 0
+
+    write_behind.add_pour_log_entry(recipe_id, 300.0)
+    assert _wait_for(lambda: _logged_rows(write_behind) == 3)
+    assert _wait_for(lambda: write_behind._pour_log_buffer == [])
+    assert write_behind.get_recipe_totals() == [(recipe_id, 'Cuba Libre', 3, pytest.approx(700.0))]
+
+
+def test_full_buffer_is_written_by_the_caller(write_behind, monkeypatch):
+    monkeypatch.setattr(write_behind, 'POUR_LOG_BUFFER_SIZE', 2)
+    for _ in range(3):
+        write_behind.add_pour_log_entry(None, 200.0)
+    assert _logged_rows(write_behind) == 2
+    assert len(write_behind._pour_log_buffer) == 1
+
+
+def test_get_pour_log_includes_pending_entries(write_behind):
+    recipe_id = write_behind.add_recipe('Mojito')
+    write_behind.add_pour_log_entry(recipe_id, 200.0)
+    assert write_behind.flush_pour_log() == 1
+    time.sleep(0.01) # eindeutige Reihenfolge der Zeitstempel
+    write_behind.add_pour_log_entry(recipe_id, 300.0)
+
+    rows = write_behind.get_pour_log()
+    assert [(log_id is None, name, size_ml) for log_id, _, _, name, size_ml in rows] == \
+        [(True, 'Mojito', 300.0), (False, 'Mojito', 200.0)]
+    assert len(write_behind.get_pour_log(limit=1)) == 1
+
+
+def test_commit_pour_buffers_log_entry_but_debits_at_once(write_behind):
+    write_behind.update_pump_volume(0, 700.0)
+    log_id, volumes = write_behind.commit_pour(None, 200.0, {0: 50.0})
+    assert log_id is None
+    assert volumes == {0: pytest.approx(650.0)}
+    assert _logged_rows(write_behind) == 0
+    assert len(write_behind.get_pour_log()) == 1
+
+
+def test_stop_drains_buffer(write_behind):
+    recipe_id = write_behind.add_recipe('Gin Tonic')
+    for size_ml in (200.0, 300.0):
+        write_behind.add_pour_log_entry(recipe_id, size_ml)
+    assert _logged_rows(write_behind) == 0
+
+    write_behind.stop_pour_log_writer()
+    assert _logged_rows(write_behind) == 2
+    assert write_behind._pour_log_buffer == []
+    assert write_behind.get_recipe_totals() == [(recipe_id, 'Gin Tonic', 2, pytest.approx(500.0))]
+    # Danach wird wieder gepuffert (neuer Flusher beim nächsten Eintrag)
+    write_behind.add_pour_log_entry(recipe_id, 200.0)
+    assert len(write_behind._pour_log_buffer) == 1
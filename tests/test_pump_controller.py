@@ -0,0 +1,127 @@
+import pytest
+import pump_controller as pc
+
+# Zulässige Verspätung eines Schaltvorgangs in virtueller Zeit (10x Echtzeit: 0.5s = 50ms real).
+# Zu früh darf nie geschaltet werden: die Ausschalt-Deadline ist Einschaltzeit + Laufzeit.
+TOLERANCE_S = 0.5
+
+
+def _assert_duration(actual, target):
+    assert target <= actual < target + TOLERANCE_S
+
+
+def _calibrate(db, pumps, ml_per_sec=10.0):
+    for pump_index in pumps:
+        assert db.update_pump_calibration(pump_index, ml_per_sec)
+
+
+def test_dispense_parallel_runs_each_pump_for_its_own_duration(fresh_db, simulated_pumps):
+    _calibrate(fresh_db, (0, 1))
+    actual = pc.dispense_parallel({0: 20.0, 1: 50.0}) # 2s und 5s bei 10 ml/s
+
+    _assert_duration(actual[0], 2.0)
+    _assert_duration(actual[1], 5.0)
+    # Die Pin-Wechsel des Backends bestätigen die gemessenen Laufzeiten
+    on_durations = simulated_pumps.get_on_durations()
+    assert on_durations[pc.PUMP_PINS[0]] == pytest.approx(actual[0], abs=0.05)
+    assert on_durations[pc.PUMP_PINS[1]] == pytest.approx(actual[1], abs=0.05)
+    # Beide Pumpen starten gemeinsam und sind danach aus
+    switched_on = [timestamp for timestamp, _, value in simulated_pumps.get_transitions() if value == simulated_pumps.HIGH]
+    assert max(switched_on) - min(switched_on) < TOLERANCE_S
+    assert simulated_pumps.get_pin_state(pc.PUMP_PINS[0]) == simulated_pumps.LOW
+    assert simulated_pumps.get_pin_state(pc.PUMP_PINS[1]) == simulated_pumps.LOW
+
+
+def test_precomputed_durations_skip_calibration(fresh_db, simulated_pumps):
+    run = pc.start_parallel({2: 30.0}, durations={2: 1.5}) # Pumpe 2 ist nicht kalibriert
+    _assert_duration(run.wait(timeout=2.0)[2], 1.5)
+
+
+def test_cancel_switches_all_pumps_off(fresh_db, simulated_pumps):
+    _calibrate(fresh_db, (0, 1))
+    run = pc.start_parallel({0: 100.0, 1: 200.0}) # 10s und 20s
+    simulated_pumps.clock.sleep(1.0)
+    run.cancel()
+    actual = run.wait(timeout=2.0)
+
+    assert actual is not None and run.cancelled
+    assert all(duration < 5.0 for duration in actual.values())
+    assert simulated_pumps.get_pin_state(pc.PUMP_PINS[0]) == simulated_pumps.LOW
+    assert simulated_pumps.get_pin_state(pc.PUMP_PINS[1]) == simulated_pumps.LOW
+
+
+def test_busy_pump_rejects_second_run(fresh_db, simulated_pumps):
+    engine = pc.get_timing_engine()
+    first = engine.run_pumps({0: 10.0})
+    assert engine.run_pumps({0: 1.0}) is None
+    first.cancel()
+    assert first.wait(timeout=2.0) is not None
+    assert engine.run_pumps({0: 0.5}).wait(timeout=2.0) is not None
+
+
+def test_invalid_plan_starts_no_pump(fresh_db, simulated_pumps):
+    _calibrate(fresh_db, (0,))
+    assert pc.start_parallel({0: 20.0, 1: 20.0}) is None # Pumpe 1 ohne Kalibrierung
+    assert pc.start_parallel({len(pc.PUMP_PINS): 20.0}) is None
+    assert simulated_pumps.get_transitions() == []
+
+
+def test_no_pumps_before_setup(fresh_db, monkeypatch):
+    monkeypatch.setattr(pc, '_pins_ready', False)
+    assert not pc.pumps_ready()
+    assert pc.start_parallel({0: 20.0}, durations={0: 2.0}) is None
+    assert pc.start_duration(0, 2.0) is None
+
+
+def _assign(db, pump_index, name, volume_ml):
+    ingredient_id = db.add_ingredient(name)
+    assert db.assign_ingredient_to_pump(pump_index, ingredient_id)
+    assert db.update_pump_volume(pump_index, volume_ml)
+    return ingredient_id
+
+
+def test_commit_pour_debits_stock_and_logs(fresh_db):
+    rum = _assign(fresh_db, 0, 'Rum', 700.0)
+    cola = _assign(fresh_db, 1, 'Cola', 1000.0)
+    recipe_id = fresh_db.add_recipe('Cuba Libre')
+
+    log_id, volumes = fresh_db.commit_pour(recipe_id, 200.0, {0: 50.0, 1: 150.0})
+    second_id, _ = fresh_db.commit_pour(recipe_id, 200.0, {0: 50.0, 1: 150.0})
+
+    ids = [row[0] for row in fresh_db.create_connection().execute("SELECT log_id FROM pour_log ORDER BY log_id")]
+    assert [log_id, second_id] == ids
+    assert volumes == {0: pytest.approx(650.0), 1: pytest.approx(850.0)}
+    assert fresh_db.get_pump_info(0)[3] == pytest.approx(600.0)
+    assert fresh_db.get_recipe_totals() == [(recipe_id, 'Cuba Libre', 2, pytest.approx(400.0))]
+    usage = {ingredient_id: total_ml for ingredient_id, _, total_ml in fresh_db.get_ingredient_usage()}
+    assert usage == {rum: pytest.approx(100.0), cola: pytest.approx(300.0)}
+
+
+def test_commit_pour_without_log_entry_only_debits(fresh_db):
+    _assign(fresh_db, 0, 'Rum', 700.0)
+    log_id, volumes = fresh_db.commit_pour(None, 200.0, {0: 20.0}, log_entry=False)
+    assert log_id is None
+    assert volumes == {0: pytest.approx(680.0)}
+    assert fresh_db.create_connection().execute("SELECT COUNT(*) FROM pour_log").fetchone()[0] == 0
+
+
+def test_commit_pour_rejects_invalid_pump(fresh_db):
+    assert fresh_db.commit_pour(None, 200.0, {fresh_db.PUMP_COUNT: 10.0}) is None
+
+
+def test_timing_engine_without_backend(monkeypatch):
+    import gpio_backend
+    def unavailable(*args):
+        raise gpio_backend.GPIOBackendError("RPi.GPIO nicht installiert")
+    monkeypatch.setattr(gpio_backend, 'create_backend', unavailable)
+    monkeypatch.setattr(pc, 'GPIO', None)
+    monkeypatch.setattr(pc, '_timing_engine', None)
+    monkeypatch.setattr(pc, '_pins_ready', False)
+    assert pc.get_timing_engine() is None
+    assert pc.get_timing_stats() is None
+
+
+def test_timing_stats_after_a_run(fresh_db, simulated_pumps):
+    pc.start_duration(0, 0.5).wait(timeout=2.0)
+    stats = pc.get_timing_stats()
+    assert stats['events'] == 2 and stats['scheduled'] == 0
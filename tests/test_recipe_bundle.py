@@ -0,0 +1,121 @@
+import gzip
+import json
+import pytest
+import recipe_bundle
+
+
+def _write_bundle(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+    return str(path)
+
+def _recipe(name, *ingredients, **fields):
+    return dict(fields, name=name, ingredients=[{'name': n, 'amount': a, 'unit': 'ml'} for n, a in ingredients])
+
+def _recipe_names(db):
+    return sorted(row[1] for row in db.get_all_recipes())
+
+
+def test_export_import_round_trip(fresh_db, tmp_path):
+    source = _write_bundle(tmp_path / 'in.jsonl', [
+        _recipe('Cuba Libre', ('Rum', 50), ('Cola', 150), description='Klassiker', image_path='cuba.jpg'),
+        _recipe('Screwdriver', ('Wodka', 40), ('Orangensaft', 160), instructions='Auf Eis'),
+    ])
+    stats = recipe_bundle.import_bundle(source)
+    assert stats['recipes_imported'] == 2
+    assert stats['ingredients_created'] == 4
+    assert stats['recipe_ingredients'] == 4
+
+    exported = str(tmp_path / 'out.jsonl.gz')
+    assert recipe_bundle.export_bundle(exported)['recipes_exported'] == 2
+    with gzip.open(exported, 'rt', encoding='utf-8') as f:
+        records = {record['name']: record for record in map(json.loads, f)}
+    assert records['Cuba Libre']['description'] == 'Klassiker'
+    assert records['Cuba Libre']['image_path'] == 'cuba.jpg'
+    assert records['Screwdriver']['instructions'] == 'Auf Eis'
+    assert sorted((i['name'], i['amount']) for i in records['Screwdriver']['ingredients']) == \
+        [('Orangensaft', 160.0), ('Wodka', 40.0)]
+
+    # Das exportierte Bundle lässt sich wieder einlesen (alles schon vorhanden -> übersprungen)
+    stats = recipe_bundle.import_bundle(exported)
+    assert stats['recipes_skipped'] == 2
+    assert stats['recipes_imported'] == 0
+
+
+def test_duplicates_are_skipped_or_replaced(fresh_db, tmp_path):
+    recipe_bundle.import_bundle(_write_bundle(tmp_path / 'a.jsonl', [_recipe('Mojito', ('Rum', 40))]))
+    update = _write_bundle(tmp_path / 'b.jsonl', [
+        _recipe('mojito', ('Rum', 50), ('Limettensaft', 20), description='neu'),
+        _recipe('MOJITO', ('Rum', 60)), # doppelt in derselben Datei
+    ])
+
+    stats = recipe_bundle.import_bundle(update)
+    assert stats['recipes_skipped'] == 2
+    recipe_id = fresh_db.get_recipe_by_name('Mojito')[0]
+    assert fresh_db.get_ingredients_for_recipe(recipe_id) == [('Rum', 40.0, 'ml')]
+
+    stats = recipe_bundle.import_bundle(update, on_duplicate=recipe_bundle.ON_DUPLICATE_REPLACE)
+    assert stats['recipes_replaced'] == 1
+    assert stats['recipes_skipped'] == 1
+    assert _recipe_names(fresh_db) == ['Mojito']
+    assert sorted(fresh_db.get_ingredients_for_recipe(recipe_id)) == [('Limettensaft', 20.0, 'ml'), ('Rum', 50.0, 'ml')]
+
+
+@pytest.mark.parametrize('line', [
+    'kein json',
+    '[1, 2]',
+    json.dumps({'description': 'ohne Namen'}),
+    json.dumps(_recipe('Ohne Menge', ('Rum', 0))),
+    json.dumps(_recipe('Objekt-Beschreibung', ('Rum', 40), description={'text': 'x'})),
+    json.dumps(_recipe('Zahl als Bild', ('Rum', 40), image_path=7)),
+    json.dumps({'name': 'Listen-Einheit', 'ingredients': [{'name': 'Rum', 'amount': 40, 'unit': ['ml']}]}),
+])
+def test_invalid_lines_are_counted_not_fatal(fresh_db, tmp_path, line):
+    path = _write_bundle(tmp_path / 'bad.jsonl', [_recipe('Gut', ('Rum', 40)), line])
+    stats = recipe_bundle.import_bundle(path)
+    assert stats['invalid_lines'] == 1
+    assert stats['recipes_imported'] == 1
+    assert _recipe_names(fresh_db) == ['Gut']
+
+
+def _assert_rolled_back(db):
+    conn = db.create_connection()
+    assert not conn.in_transaction
+    assert _recipe_names(db) == []
+    # Schreibsperre ist wieder frei
+    db.set_setting('SelectedGlassSize', '300')
+
+
+def test_undecodable_line_rolls_back_earlier_batches(fresh_db, tmp_path):
+    path = tmp_path / 'latin1.jsonl'
+    path.write_bytes(json.dumps(_recipe('Erster', ('Rum', 40))).encode('utf-8') + b'\n'
+                     + json.dumps(_recipe('Zweiter', ('Rum', 40))).encode('utf-8') + b'\n'
+                     + b'{"name": "Caf\xe9"}\n')
+    assert recipe_bundle.import_bundle(str(path), batch_size=1) is None
+    _assert_rolled_back(fresh_db)
+
+
+def test_truncated_gzip_rolls_back(fresh_db, tmp_path):
+    path = tmp_path / 'bundle.jsonl.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for i in range(200):
+            f.write(json.dumps(_recipe(f'Rezept {i}', ('Rum', 40), description='x' * 200)) + '\n')
+    path.write_bytes(path.read_bytes()[:-100])
+    assert recipe_bundle.import_bundle(str(path), batch_size=10) is None
+    _assert_rolled_back(fresh_db)
+
+
+def test_unexpected_error_rolls_back_and_propagates(fresh_db, tmp_path, monkeypatch):
+    original = recipe_bundle._import_batch
+    calls = []
+    def failing_batch(*args):
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("Abbruch")
+        original(*args)
+    monkeypatch.setattr(recipe_bundle, '_import_batch', failing_batch)
+    path = _write_bundle(tmp_path / 'in.jsonl', [_recipe('A', ('Rum', 40)), _recipe('B', ('Rum', 40))])
+    with pytest.raises(RuntimeError):
+        recipe_bundle.import_bundle(path, batch_size=1)
+    _assert_rolled_back(fresh_db)